@@ -1,13 +1,17 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, g
 from flask_cors import CORS
 import sys
 import os
 import pandas as pd
+import numpy as np
 import time
 import json
 import random
+import re
 from dotenv import load_dotenv
-from gemini_tryon import GeminiTryOnGenerator
+from gemini_tryon import GeminiTryOnGenerator, LocalStubBackend
+from tryon_jobs import TryOnJobQueue, QueueFullError
+from image_cache import GeneratedImageCache
 
 # .env dosyasını yükle
 load_dotenv()
@@ -18,58 +22,245 @@ CORS(app)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODELS_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'models'))
 sys.path.insert(0, MODELS_DIR)
+from result_cache import ResultCache, artifact_version, cache_seed, all_cache_stats
+import catalog_snapshot
+from catalog_snapshot import snapshot_info
+import catalog
+import catalog_updates
+import outfit_composer
+import style_model
+import facet_index
+from fast_json import ItemCards, json_response, dumps, obj
+from routes.recommend import recommend_bp, ranked_search, flag
+
+# /api/stats, /api/search/batch, /api/combinations/<id> (TF-IDF / vektör araması ve facet'ler)
+app.register_blueprint(recommend_bp)
 
 DATASET_IMAGES_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'frontend', 'public', 'images'))
 GENERATED_DIR = os.path.join(BASE_DIR, 'static', 'generated')
 os.makedirs(GENERATED_DIR, exist_ok=True)
 BASE_MODEL_PATH = os.path.join(BASE_DIR, 'static', 'models', 'base_model.jpg')
+# Sanal manken işlerinin durum dosyaları: tüm worker süreçleri okur (iş hangi süreçte çalışırsa çalışsın)
+TRYON_STATE_DIR = os.getenv('TRYON_STATE_DIR', os.path.join(BASE_DIR, 'job_state'))
 
 # API KEY GÜVENLİK KONTROLÜ
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
+# 'stub' = Gemini yerine yerel taklit backend (yük testi için, ağ/ücret yok)
+TRYON_BACKEND = os.getenv("TRYON_BACKEND", "gemini")
+if not GOOGLE_API_KEY and TRYON_BACKEND != "stub":
     print("🚨 HATA: .env dosyası bulunamadı veya API Key eksik!")
 
+# --- ARAMA SÖZLÜKLERİ ---
+CATEGORY_MAP = {
+    'etek': ['skirt', 'midi skirt', 'mini skirt', 'maxi skirt'],
+    'şort': ['shorts', 'denim shorts', 'bermuda'],
+    'pantolon': ['trousers', 'pants', 'jeans', 'leggings', 'joggers', 'denim'],
+    'elbise': ['dress', 'gown', 'sundress'],
+    'tişört': ['t-shirt', 'tee', 'top', 'crop top'],
+    'gömlek': ['shirt', 'blouse'],
+    'kazak': ['sweater', 'cardigan', 'jumper'],
+    'mont': ['coat', 'jacket', 'blazer'],
+    'ayakkabı': ['shoes', 'heels', 'boots', 'sneakers'],
+    'çanta': ['bag', 'handbag', 'purse']
+}
+
+COLOR_FAMILIES = {
+    'mavi': ['blue', 'navy', 'teal', 'azure', 'indigo'], 
+    'kırmızı': ['red', 'maroon', 'crimson'], 
+    'yeşil': ['green', 'olive', 'emerald'], 
+    'sarı': ['yellow', 'gold'],
+    'pembe': ['pink', 'rose', 'fuchsia'], 
+    'mor': ['purple', 'violet', 'lavender'],
+    'beyaz': ['white', 'cream'], 
+    'siyah': ['black'], 
+    'gri': ['grey', 'gray']
+}
+
 # --- VERİ YÜKLEME ---
+# items_df: paylaşılan kataloğun (models/catalog.py) küçük harfli görünümü
 items_df = None
-POOL_TOPS = []
-POOL_BOTTOMS = []
-POOL_SHOES = []
+# Havuzlar: grup adı -> {'rows': satır dizisi, 'id_index': item_id indeksi, 'id_rows': id'nin havuzdaki satırı}
 # Montları ayrı tutuyoruz ki etek üstüne mont önermesin
-POOL_OUTERWEAR = [] 
-
-def determine_detailed_category(cat_name):
-    """
-    Ürünleri kategorize ederken senin orijinal geniş listeni kullanıyoruz.
-    Böylece hiçbir ayakkabı dışarıda kalmayacak.
-    """
-    cat = str(cat_name).lower()
-    
+POOL_GROUPS = ('top', 'bottom', 'shoes', 'outerwear')
+POOLS = {}
+
+# --- ARAMA İNDEKSİ (load_data içinde kurulur) ---
+# *_TERM_POSTINGS: CATEGORY_MAP / COLOR_FAMILIES terimi -> terimi içeren satırların sıralı dizisi
+# TOKEN_VOCAB / TOKEN_OFFSETS / TOKEN_ROWS: isim+kategori kelimelerinin CSR posting listeleri
+CATEGORY_TERM_POSTINGS = {}
+COLOR_TERM_POSTINGS = {}
+TOKEN_VOCAB = None
+TOKEN_OFFSETS = None
+TOKEN_ROWS = None
+
+# strict_business_search sonuç önbelleği: sorgu -> (ilk 40 satır, facet sayıları); katalog değişince boşaltılır
+BUSINESS_SEARCH_CACHE = ResultCache('strict_business_search')
+
+# --- KATEGORİ GRUPLARI ---
+# Öncelik sırasıyla: bir kategori ilk eşleşen gruba girer (dış giyim > üst > alt > ayakkabı)
+# Ürünleri kategorize ederken senin orijinal geniş listeni kullanıyoruz.
+# Böylece hiçbir ayakkabı dışarıda kalmayacak.
+CATEGORY_GROUP_KEYS = [
     # 1. DIŞ GİYİM (Montlar)
-    outerwear_keys = ['mont', 'kaban', 'ceket', 'jacket', 'coat', 'blazer', 'yelek', 'vest', 'hırka', 'cardigan', 'kimono', 'poncho', 'outerwear']
-    if any(k in cat for k in outerwear_keys): return 'outerwear'
-
+    ('outerwear', ['mont', 'kaban', 'ceket', 'jacket', 'coat', 'blazer', 'yelek', 'vest', 'hırka', 'cardigan', 'kimono', 'poncho', 'outerwear']),
     # 2. ÜST GİYİM
-    top_keys = ['tişört', 'gömlek', 'kazak', 'bluz', 'top', 'shirt', 'sweater', 'crop', 'bustier', 'hoodie', 'sweatshirt', 't-shirt', 'tank', 'body', 'tunic', 'polo', 'knitwear', 'süveter']
-    if any(k in cat for k in top_keys): return 'top'
-
+    ('top', ['tişört', 'gömlek', 'kazak', 'bluz', 'top', 'shirt', 'sweater', 'crop', 'bustier', 'hoodie', 'sweatshirt', 't-shirt', 'tank', 'body', 'tunic', 'polo', 'knitwear', 'süveter']),
     # 3. ALT GİYİM
-    bottom_keys = ['pantolon', 'etek', 'şort', 'jean', 'tayt', 'skirt', 'shorts', 'trousers', 'pants', 'denim', 'leggings', 'joggers', 'tulum', 'jumpsuit', 'salopet', 'bottom']
-    if any(k in cat for k in bottom_keys): return 'bottom'
-
+    ('bottom', ['pantolon', 'etek', 'şort', 'jean', 'tayt', 'skirt', 'shorts', 'trousers', 'pants', 'denim', 'leggings', 'joggers', 'tulum', 'jumpsuit', 'salopet', 'bottom']),
     # 4. AYAKKABI & ÇANTA (Senin orijinal geniş listen)
     # Bu liste sayesinde havuzun dolması garanti altına alınıyor.
-    shoe_keys = [
+    ('shoes', [
         'ayakkabı', 'bot', 'çizme', 'shoes', 'boots', 'heels', 'sandalet', 'terlik', 
         'sneakers', 'sandals', 'flat', 'pump', 'loafer', 'wedge', 'platform', 
         'babet', 'stiletto', 'footwear', 'ankle', 'espadrille', 'mule', 'slipper',
         'çanta', 'bag', 'handbag', 'purse', 'clutch', 'takı', 'accessories'
-    ]
-    if any(k in cat for k in shoe_keys): return 'shoes'
-    
+    ])
+]
+# Her grup için tek derlenmiş desen (anahtar kelimelerden herhangi biri geçiyor mu)
+CATEGORY_GROUP_PATTERNS = [(group, re.compile('|'.join(map(re.escape, keys)))) for group, keys in CATEGORY_GROUP_KEYS]
+
+def determine_detailed_category(cat_name):
+    """Tek bir kategori adının grubu ('outerwear', 'top', 'bottom', 'shoes' veya 'other')."""
+    cat = str(cat_name).lower()
+    for group, pattern in CATEGORY_GROUP_PATTERNS:
+        if pattern.search(cat): return group
     return 'other'
 
+def classify_categories(categories):
+    """
+    determine_detailed_category'nin sütun hali: desenler sadece benzersiz kategori adlarına
+    uygulanır, sonuç kodlarla satırlara geri dağıtılır.
+    """
+    codes, uniques = pd.factorize(pd.Series(categories), use_na_sentinel=False)
+    names = pd.Series([str(c).lower() for c in uniques], dtype=object)
+    conditions = [names.str.contains(pattern, regex=True).to_numpy() for _, pattern in CATEGORY_GROUP_PATTERNS]
+    groups = np.select(conditions, [group for group, _ in CATEGORY_GROUP_PATTERNS], default='other')
+    return groups[codes]
+
+def build_search_index():
+    """
+    strict_business_search için ters indeks kurar.
+    Sorgu anında 74k satır üzerinde substring taraması yerine posting listeleri birleştirilir.
+    """
+    global CATEGORY_TERM_POSTINGS, COLOR_TERM_POSTINGS, TOKEN_VOCAB, TOKEN_OFFSETS, TOKEN_ROWS
+
+    # Kaldırılan ürünler (tombstone) indekse girmez
+    active = catalog.active_mask()
+
+    def term_rows(term, columns):
+        mask = np.zeros(len(items_df), dtype=bool)
+        for col in columns:
+            mask |= items_df[col].str.contains(term, regex=False).to_numpy()
+        return np.flatnonzero(mask if active is None else mask & active)
+
+    CATEGORY_TERM_POSTINGS = {}
+    for tr_cat, en_cats in CATEGORY_MAP.items():
+        for term in [tr_cat] + en_cats:
+            CATEGORY_TERM_POSTINGS[term] = term_rows(term, ['category', 'name'])
+
+    COLOR_TERM_POSTINGS = {}
+    for tr_color, en_colors in COLOR_FAMILIES.items():
+        for term in [tr_color] + en_colors:
+            COLOR_TERM_POSTINGS[term] = term_rows(term, ['color', 'name'])
+
+    # İsim + kategori kelimeleri (her satır-kelime çifti bir kez)
+    indexed = items_df if active is None else items_df[active]
+    # Snapshot sütunları Categorical olabilir; birleştirme için str'ye açılır
+    tokens = (indexed['name'].astype(str) + ' ' + indexed['category'].astype(str)).str.split().explode().dropna()
+    pairs = pd.DataFrame({'row': tokens.index.to_numpy(), 'token': tokens.to_numpy()}).drop_duplicates()
+    codes, vocab = pd.factorize(pairs['token'])
+    order = np.argsort(codes, kind='stable')
+    TOKEN_VOCAB = pd.Series(vocab)
+    TOKEN_ROWS = pairs['row'].to_numpy()[order]
+    TOKEN_OFFSETS = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=len(vocab)), out=TOKEN_OFFSETS[1:])
+
+def union_postings(postings):
+    if not postings: return np.array([], dtype=np.int64)
+    return np.unique(np.concatenate(postings))
+
+def contains_scan(query_lower):
+    """İsim veya kategori içinde query_lower geçen aktif satırlar (doğrudan str.contains taraması)."""
+    mask = np.zeros(len(items_df), dtype=bool)
+    for col in ('name', 'category'):
+        mask |= items_df[col].astype(str).str.contains(query_lower, regex=False).to_numpy()
+    active = catalog.active_mask()
+    return np.flatnonzero(mask if active is None else mask & active)
+
+def token_search(query_lower):
+    """
+    İsim veya kategori içinde query_lower geçen satırlar (str.contains ile aynı sonuç).
+    Sorgu eski yoldaki gibi olduğu gibi aranır: baştaki / sondaki ve tekrarlı boşluklar kırpılmaz.
+    Sorgudaki her kelime, satırın kelimelerinden birinin parçası olmak zorundadır;
+    bu adaylar posting listeleriyle bulunur. Sorgu tek bir kelimeden ibaret değilse
+    (birden çok kelime veya boşluk içeriyorsa) adaylar tam sorguyla doğrulanır.
+    """
+    words = query_lower.split()
+    # Sadece boşluktan oluşan sorgunun kelimesi yok; nadir olduğu için doğrudan taranır
+    if not words: return contains_scan(query_lower)
+
+    rows = None
+    for word in words:
+        matching = np.flatnonzero(TOKEN_VOCAB.str.contains(word, regex=False).to_numpy())
+        word_rows = union_postings([TOKEN_ROWS[TOKEN_OFFSETS[t]:TOKEN_OFFSETS[t + 1]] for t in matching])
+        rows = word_rows if rows is None else np.intersect1d(rows, word_rows, assume_unique=True)
+        if len(rows) == 0: return rows
+
+    if query_lower != words[0]:
+        names = items_df['name'].iloc[rows].tolist()
+        categories = items_df['category'].iloc[rows].tolist()
+        rows = np.array([r for r, name, category in zip(rows.tolist(), names, categories)
+                         if query_lower in name or query_lower in category], dtype=np.int64)
+    return rows
+
+def web_item(item):
+    """Ürün kaydının görsel yolunu frontend'in /images/ yoluna çevirir."""
+    if 'image' in item and item['image']:
+        if not str(item['image']).startswith('/images/'):
+            item['image'] = f"/images/{os.path.basename(str(item['image']))}"
+    return item
+
+def card_frame(df):
+    """Hazır kartların sütunları: uygulama görünümündeki ürün kaydı, görsel frontend yolunda."""
+    cards = df.copy()
+    if 'image' in cards:
+        cards['image'] = [web_item({'image': image})['image'] for image in cards['image'].tolist()]
+    return cards
+
+# Satır numarası -> hazır ürün kartı JSON'u (arama / kombin yanıtları; load_data içinde kurulur)
+ITEM_CARDS = ItemCards('app_cards', lambda: items_df, card_frame)
+
+def build_pools():
+    """Kombin havuzlarını satır indeks dizileri olarak kurar (ürün başına sözlük tutulmaz)."""
+    global POOLS
+    groups = classify_categories(items_df['category'])
+    ids = items_df['item_id'].to_numpy()
+    active = catalog.active_mask()
+    POOLS = {}
+    for group in POOL_GROUPS:
+        rows = np.flatnonzero(groups == group if active is None else (groups == group) & active)
+        # Aynı id havuzda birden fazlaysa son satır geçerli
+        last = ~pd.Index(ids[rows]).duplicated(keep='last')
+        POOLS[group] = {'rows': rows, 'id_index': pd.Index(ids[rows][last]), 'id_rows': rows[last]}
+
+def build_catalog_indexes():
+    """Paylaşılan kataloğun görünümünü, arama indeksini ve havuzları (yeniden) kurar."""
+    global items_df
+    # Modellerle aynı katalog; sadece değişen sütunlar (küçük harf, dosya adı, str id) ayrı tutulur
+    items_df = catalog.view(
+        text_columns=('name', 'category', 'color'), missing='', lower=True,
+        image=catalog.derived_column('image', lambda x: os.path.basename(str(x)) if pd.notnull(x) else x, 'basename'),
+        item_id=catalog.derived_column('item_id', str, 'str')
+    )
+    build_search_index()
+    build_pools()
+    outfit_composer.build_slots({group: POOLS[group]['rows'] for group in POOL_GROUPS})
+    BUSINESS_SEARCH_CACHE.set_version((artifact_version([catalog_snapshot.csv_path('items')]), catalog.REVISION))
+
+def on_catalog_change(event):
+    build_catalog_indexes()
+
 def load_data():
-    global items_df, POOL_TOPS, POOL_BOTTOMS, POOL_SHOES, POOL_OUTERWEAR
     print("--- [SİSTEM] Başlatılıyor... ---")
     
     try:
@@ -80,79 +271,73 @@ def load_data():
 
     csv_path = os.path.join(MODELS_DIR, 'data', 'items_processed.csv')
     
-    if os.path.exists(csv_path):
-        items_df = pd.read_csv(csv_path)
-        items_df['image'] = items_df['image'].apply(lambda x: os.path.basename(str(x)) if pd.notnull(x) else x)
-        items_df['name'] = items_df['name'].fillna('').astype(str).str.lower()
-        items_df['category'] = items_df['category'].fillna('').astype(str).str.lower()
-        items_df['color'] = items_df['color'].fillna('').astype(str).str.lower()
-        items_df['item_id'] = items_df['item_id'].astype(str)
-        
-        # Havuzları Sıfırla
-        POOL_TOPS = []
-        POOL_BOTTOMS = []
-        POOL_SHOES = []
-        POOL_OUTERWEAR = []
-        
-        # Havuzları Doldur
-        for _, row in items_df.iterrows():
-            item = row.to_dict()
-            if 'image' in item and item['image']:
-                if not str(item['image']).startswith('/images/'):
-                    item['image'] = f"/images/{os.path.basename(str(item['image']))}"
-            
-            # Kategori belirle
-            group = determine_detailed_category(item['category'])
+    if os.path.exists(csv_path) or snapshot_info('items') is not None:
+        catalog.load_catalog()
+        # TF-IDF araması, facet sayıları (/api/stats) ve varsa vektör indeksi
+        style_model.load_style_model()
+        if not facet_index.GLOBAL_COUNTS: facet_index.build_facets()
+        build_catalog_indexes()
+        catalog.on_change('app', on_catalog_change)
+        # Kartlar 'app' dinleyicisinden sonra güncellenir (yeni görünümü okur)
+        ITEM_CARDS.build()
+        # Yeniden başlatmadan önce yapılmış ürün ekleme / kaldırma işlemleri günlükten uygulanır
+        applied = catalog_updates.sync()
+        if applied: print(f"🔄 Katalog günlüğünden {applied} değişiklik uygulandı.")
             
-            if group == 'top': POOL_TOPS.append(item)
-            elif group == 'bottom': POOL_BOTTOMS.append(item)
-            elif group == 'shoes': POOL_SHOES.append(item)
-            elif group == 'outerwear': POOL_OUTERWEAR.append(item)
-            
-        print(f"📊 HAVUZ DURUMU: Üst: {len(POOL_TOPS)}, Alt: {len(POOL_BOTTOMS)}, Dış: {len(POOL_OUTERWEAR)}, Ayakkabı: {len(POOL_SHOES)}")
+        print(f"📊 HAVUZ DURUMU: Üst: {len(POOLS['top']['rows'])}, Alt: {len(POOLS['bottom']['rows'])}, "
+              f"Dış: {len(POOLS['outerwear']['rows'])}, Ayakkabı: {len(POOLS['shoes']['rows'])}")
         print(f"✅ Sistem Hazır! Toplam {len(items_df)} ürün yüklendi.")
     else:
         print("❌ KRİTİK HATA: Veri dosyası (CSV) bulunamadı!")
 
 load_data()
+# Çok worker'lı sunucuda (gunicorn --preload) fork'tan önce: yüklenen nesneler paylaşılan sayfalarda kalsın
+catalog.freeze()
 
 try:
-    try_on_engine = GeminiTryOnGenerator(api_key=GOOGLE_API_KEY)
+    if TRYON_BACKEND == "stub":
+        print("⚠️ Sanal manken yerel taklit backend ile çalışıyor (Gemini çağrılmayacak).")
+        try_on_engine = GeminiTryOnGenerator(backend=LocalStubBackend.from_env())
+    else:
+        try_on_engine = GeminiTryOnGenerator(api_key=GOOGLE_API_KEY)
 except Exception as e:
     print(f"❌ Gemini Başlatma Hatası: {e}")
     try_on_engine = None
 
-# --- ARAMA MANTIĞI (Düzeltilmiş Hali) ---
-CATEGORY_MAP = {
-    'etek': ['skirt', 'midi skirt', 'mini skirt', 'maxi skirt'],
-    'şort': ['shorts', 'denim shorts', 'bermuda'],
-    'pantolon': ['trousers', 'pants', 'jeans', 'leggings', 'joggers', 'denim'],
-    'elbise': ['dress', 'gown', 'sundress'],
-    'tişört': ['t-shirt', 'tee', 'top', 'crop top'],
-    'gömlek': ['shirt', 'blouse'],
-    'kazak': ['sweater', 'cardigan', 'jumper'],
-    'mont': ['coat', 'jacket', 'blazer'],
-    'ayakkabı': ['shoes', 'heels', 'boots', 'sneakers'],
-    'çanta': ['bag', 'handbag', 'purse']
-}
-
-COLOR_FAMILIES = {
-    'mavi': ['blue', 'navy', 'teal', 'azure', 'indigo'], 
-    'kırmızı': ['red', 'maroon', 'crimson'], 
-    'yeşil': ['green', 'olive', 'emerald'], 
-    'sarı': ['yellow', 'gold'],
-    'pembe': ['pink', 'rose', 'fuchsia'], 
-    'mor': ['purple', 'violet', 'lavender'],
-    'beyaz': ['white', 'cream'], 
-    'siyah': ['black'], 
-    'gri': ['grey', 'gray']
-}
+# Sanal manken iş kuyruğu: istek thread'i Gemini çağrısını beklemez.
+# Worker thread'ler her süreçte ilk istekte başlar (--preload ile fork sonrası da çalışır);
+# iş durumu TRYON_STATE_DIR'de tutulduğu için sorgu başka bir worker'a düşse de iş bulunur.
+TRYON_PROMPT = "A high-quality full body studio photo of a fashion model wearing this outfit. Professional lighting, white background."
+MAX_LONG_POLL_SECONDS = 30
+generated_images = GeneratedImageCache(GENERATED_DIR, url_prefix='/static/generated')
+try_on_jobs = TryOnJobQueue(try_on_engine, GENERATED_DIR, url_prefix='/static/generated',
+                            image_cache=generated_images, state_dir=TRYON_STATE_DIR) if try_on_engine else None
 
 def strict_business_search(query):
-    if not query: return []
-    if items_df is None: return []
+    """Sorgunun ilk 40 sonucunun satır numaraları (kartlar ITEM_CARDS'tan)."""
+    return business_search(query)[0]
+
+def business_search(query):
+    """
+    (ilk 40 sonucun satır numaraları, tüm sonuç kümesinin facet sayıları).
+    Facet'ler arama modelinin bitset indeksiyle (style_model.FILTER_INDEX) sayılır; model
+    yüklenmemişse None.
+    """
+    if not query: return [], None
+    if items_df is None: return [], None
 
     query_lower = query.lower()
+    return BUSINESS_SEARCH_CACHE.get_or_compute(query_lower, lambda: _strict_business_search(query_lower))
+
+def result_facets(rows):
+    """Satır kümesinin kategori / renk / sezon sayıları (facet_index.query_facets, filtresiz)."""
+    index = style_model.FILTER_INDEX
+    if index is None or index.n != len(items_df): return None
+    mask = np.zeros(index.n, dtype=bool)
+    mask[rows] = True
+    return facet_index.query_facets(index, index.from_mask(mask), {})
+
+def _strict_business_search(query_lower):
     target_categories = []
     target_colors = []
     
@@ -164,46 +349,41 @@ def strict_business_search(query):
         if tr_color in query_lower:
             target_colors.extend([tr_color] + en_colors)
 
-    results_df = items_df.copy()
-    
-    # Kategori Filtresi (Hem Kategori Hem İsim Sütununda Ara)
-    if target_categories:
-        results_df = results_df[
-            results_df['category'].apply(lambda x: any(cat in str(x).lower() for cat in target_categories)) |
-            results_df['name'].apply(lambda x: any(cat in str(x).lower() for cat in target_categories))
-        ]
-        
-    # Renk Filtresi
-    if target_colors:
-        results_df = results_df[
-            results_df['color'].apply(lambda x: any(c in str(x).lower() for c in target_colors)) |
-            results_df['name'].apply(lambda x: any(c in str(x).lower() for c in target_colors))
-        ]
-    
-    # Düz Metin Araması (Eğer yukarıdakiler boşsa)
-    if results_df.empty and not target_categories and not target_colors:
-         results_df = items_df[
-            items_df['name'].str.contains(query_lower, na=False) |
-            items_df['category'].str.contains(query_lower, na=False)
-        ]
-
-    final_items = []
-    for _, row in results_df.head(40).iterrows():
-        item = row.to_dict()
-        if 'image' in item: item['image'] = f"/images/{os.path.basename(str(item['image']))}"
-        final_items.append(item)
-    return final_items
+    # Kategori (kategori + isim) ve Renk (renk + isim) filtreleri posting listeleriyle
+    if target_categories or target_colors:
+        rows = None
+        if target_categories:
+            rows = union_postings([CATEGORY_TERM_POSTINGS[t] for t in target_categories])
+        if target_colors:
+            color_rows = union_postings([COLOR_TERM_POSTINGS[t] for t in target_colors])
+            rows = color_rows if rows is None else np.intersect1d(rows, color_rows, assume_unique=True)
+    else:
+        # Düz Metin Araması
+        rows = token_search(query_lower)
+
+    return rows[:40].tolist(), result_facets(rows)
 
 # --- ROUTES ---
-@app.route('/api/search', methods=['POST'])
+# Arama ve kombin yanıtları hazır kartlardan kurulur; GET ile istenen sayfalar ETag / 304 alır
+@app.route('/api/search', methods=['GET', 'POST'])
 def search():
-    data = request.json
-    return jsonify({'items': strict_business_search(data.get('query', '')), 'total': 0})
-
-@app.route('/api/combinations', methods=['POST'])
+    """
+    {"query", "mode", "facets", ...}
+    mode verilmezse (veya 'keyword') iş kuralı araması: ilk 40 sonuç (strict_business_search).
+    mode 'lexical' / 'dense' / 'hybrid' ise TF-IDF / vektör araması (routes/recommend.py ranked_search).
+    facets (varsayılan true): tüm sonuç kümesinin kategori / renk / sezon sayıları.
+    """
+    data = (request.args if request.method == 'GET' else request.json) or {}
+    if data.get('mode', 'keyword') != 'keyword': return ranked_search(data)
+    rows, facets = business_search(data.get('query', ''))
+    fields = {'items': ITEM_CARDS.array(rows), 'total': 0}
+    if facets is not None and flag(data.get('facets'), True): fields['facets'] = facets
+    return json_response(obj(**fields))
+
+@app.route('/api/combinations', methods=['GET', 'POST'])
 def combinations():
     try:
-        data = request.json
+        data = request.args if request.method == 'GET' else request.json
         item_id = str(data.get('item_id'))
 
         found_item = items_df[items_df['item_id'] == item_id]
@@ -226,67 +406,172 @@ def combinations():
         except: pass
 
         # Senaryoları Belirle
-        target_pool_1 = [] 
-        target_pool_2 = [] 
-        
         if selected_group == 'bottom': 
             # Etek/Pantolon seçilirse -> Üst + Ayakkabı
-            target_pool_1 = POOL_TOPS
-            target_pool_2 = POOL_SHOES
+            target_pool_1, target_pool_2 = 'top', 'shoes'
         elif selected_group == 'top': 
             # Üst seçilirse -> Alt + Ayakkabı
-            target_pool_1 = POOL_BOTTOMS
-            target_pool_2 = POOL_SHOES
+            target_pool_1, target_pool_2 = 'bottom', 'shoes'
         elif selected_group == 'outerwear':
             # Mont seçilirse -> Alt + Ayakkabı
-            target_pool_1 = POOL_BOTTOMS
-            target_pool_2 = POOL_SHOES
+            target_pool_1, target_pool_2 = 'bottom', 'shoes'
         else:
             # Ayakkabı seçilirse -> Üst + Alt
-            target_pool_1 = POOL_TOPS
-            target_pool_2 = POOL_BOTTOMS
+            target_pool_1, target_pool_2 = 'top', 'bottom'
+
+        # Rastgele tamamlama ürün başına sabit tohumla yapılır; aynı ürün hep aynı listeyi alır
+        rnd = random.Random(cache_seed(('combinations', item_id)))
+        ids = items_df['item_id'].to_numpy()
 
         # 8 Ürüne Tamamlama Fonksiyonu (Garantili)
-        def get_strictly_8_items(source_pool, count=8):
+        def get_strictly_8_items(group, count=8):
+            pool = POOLS[group]
+            source_pool = pool['rows']
             selected = []
-            pool_map = {item['item_id']: item for item in source_pool}
             
-            # 1. Önce AI önerilerinden varsa ekle
-            for ai_id in ai_recommendations_ids:
-                if len(selected) >= count: break
-                if ai_id in pool_map and ai_id != item_id:
-                    selected.append(pool_map[ai_id])
+            # 1. Önce AI önerilerinden havuzda olanları ekle
+            if ai_recommendations_ids:
+                positions = pool['id_index'].get_indexer(ai_recommendations_ids)
+                for ai_id, pos in zip(ai_recommendations_ids, positions):
+                    if len(selected) >= count: break
+                    if pos >= 0 and ai_id != item_id:
+                        selected.append(pool['id_rows'][pos])
             
             # 2. Eksik varsa havuzdan rastgele tamamla
             missing = count - len(selected)
-            if missing > 0 and source_pool:
-                excluded_ids = set([x['item_id'] for x in selected] + [item_id])
-                candidates = [x for x in source_pool if x['item_id'] not in excluded_ids]
+            if missing > 0 and len(source_pool):
+                excluded_ids = list(set(ids[selected].tolist() + [item_id]))
+                candidates = source_pool[~np.isin(ids[source_pool], excluded_ids)].tolist()
                 
                 if candidates:
                     take_n = min(missing, len(candidates))
-                    random_picks = random.sample(candidates, take_n)
+                    random_picks = rnd.sample(candidates, take_n)
                     selected.extend(random_picks)
             
             # 3. Havuz çok küçükse ve yine de yetmediyse (Acil Durum)
             while len(selected) < count and len(source_pool) > 0:
-                item = random.choice(source_pool)
-                selected.append(item)
+                selected.append(rnd.choice(source_pool))
 
             return selected[:count]
 
         list_1 = get_strictly_8_items(target_pool_1, count=8)
         list_2 = get_strictly_8_items(target_pool_2, count=8)
-        
-        return jsonify({'recommendations': list_1 + list_2})
+
+        return json_response(obj(recommendations=ITEM_CARDS.array(list_1 + list_2)))
 
     except Exception as e:
         print(f"❌ Kombin Hatası: {e}")
         return jsonify({'recommendations': []})
 
+def recommendation_cards(rows, scores, reasons, matches=None):
+    """Öneri dizilerinden hazır kart dizisi; skor, neden (ve eşleşme sayısı) karta eklenir."""
+    extras = [{'score': score, 'reason': reason} for score, reason in zip(scores.tolist(), reasons.tolist())]
+    if matches is not None:
+        for extra, count in zip(extras, matches.tolist()): extra['matches'] = count
+    return ITEM_CARDS.array(rows.tolist(), extras)
+
+@app.route('/api/combinations/batch', methods=['POST'])
+def combinations_batch():
+    """
+    Sepet / gardırop için toplu kombin önerisi:
+    {"item_ids": [...], "limit": 8, "season": null, "aggregate": false, "exclude_items": true}
+    Kaynak ürünler tek seferde çözülür ve birlikte puanlanır; bir ürün sadece en uyumlu olduğu
+    kaynağın listesinde yer alır. aggregate=true ise listenin çoğuna uyan ürünler ayrıca sıralanır.
+    """
+    try:
+        from combin_model import get_combin_recommendations_batch, resolve_rows, MAX_BATCH_ITEMS
+        data = request.json or {}
+        raw_ids = data.get('item_ids') or []
+        if not isinstance(raw_ids, list) or not raw_ids:
+            return jsonify({'error': 'item_ids listesi gerekli'}), 400
+        if len(raw_ids) > MAX_BATCH_ITEMS:
+            return jsonify({'error': f'En fazla {MAX_BATCH_ITEMS} ürün gönderilebilir'}), 400
+        try: limit = int(data.get('limit', 8))
+        except (TypeError, ValueError): return jsonify({'error': 'limit sayı olmalı'}), 400
+
+        model_ids = []
+        for raw_id in raw_ids:
+            try: model_ids.append(int(raw_id))
+            except (TypeError, ValueError): model_ids.append(raw_id)
+
+        batch = get_combin_recommendations_batch(
+            model_ids, top_k=limit, enforce_season=data.get('season'),
+            exclude_sources=data.get('exclude_items', True), aggregate=data.get('aggregate', False), records=False)
+
+        # Kaynakların kategori grupları tek seferde
+        rows = resolve_rows(model_ids)
+        groups = np.full(len(rows), 'other', dtype=object)
+        found = rows >= 0
+        if found.any(): groups[found] = classify_categories(items_df['category'].iloc[rows[found]].to_numpy())
+
+        results = [obj(
+            item_id=str(raw_id),
+            found=result['found'],
+            group=group if result['found'] else None,
+            recommendations=recommendation_cards(*result['recommendations'])
+        ) for raw_id, result, group in zip(raw_ids, batch['results'], groups.tolist())]
+
+        fields = {'count': len(results), 'results': b'[' + b','.join(results) + b']'}
+        if batch['aggregated'] is not None:
+            fields['aggregated'] = recommendation_cards(*batch['aggregated'])
+        return json_response(obj(**fields))
+
+    except Exception as e:
+        print(f"❌ Toplu Kombin Hatası: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/outfits', methods=['POST'])
+def outfits():
+    """
+    Tam kombin önerisi: {"item_id", "count" (varsayılan 10), "outerwear" (true/false), "season"}
+    Her kombin üst / alt / ayakkabı (+ dış giyim) içerir; ürün çiftlerinin uyumu birlikte
+    puanlanır (bkz. models/outfit_composer.py).
+    """
+    try:
+        data = request.json or {}
+        if data.get('item_id') is None:
+            return jsonify({'error': 'item_id gerekli'}), 400
+        try: model_input_id = int(data['item_id'])
+        except (TypeError, ValueError): model_input_id = data['item_id']
+        try: count = int(data.get('count', 10))
+        except (TypeError, ValueError): return jsonify({'error': 'count sayı olmalı'}), 400
+
+        composed = outfit_composer.compose_outfits(
+            model_input_id, count=count, outerwear=data.get('outerwear'), season=data.get('season'))
+
+        results = [obj(score=outfit['score'], items=ITEM_CARDS.array(
+            list(outfit['rows'].values()), [{'slot': slot} for slot in outfit['rows']])) for outfit in composed]
+        return json_response(obj(
+            source_item_id=str(data['item_id']), count=len(results), outfits=b'[' + b','.join(results) + b']'))
+
+    except Exception as e:
+        print(f"❌ Kombin Oluşturma Hatası: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def job_response(job):
+    """İş durumunu API yanıtına çevirir (bitmiş işler eski yanıt biçimiyle uyumlu)."""
+    body = dict(job)
+    body['status_url'] = f"/api/generate-outfit/{job['job_id']}"
+    if job['status'] == 'success':
+        return jsonify(body), 200
+    if job['status'] == 'error':
+        code = 503 if job['error'] == 'overloaded' else 500
+        return jsonify(body), code
+    return jsonify(body), 202
+
+def long_poll_seconds(value):
+    try: return min(float(value or 0), MAX_LONG_POLL_SECONDS)
+    except (TypeError, ValueError): return 0.0
+
 @app.route('/api/generate-outfit', methods=['POST'])
 def generate_outfit():
-    if not try_on_engine: return jsonify({"status": "error", "message": "Gemini aktif değil."}), 500
+    """
+    İşi kuyruğa ekler ve hemen 202 + job_id döner.
+    İstekte "wait" (saniye) verilirse iş o süre içinde biterse sonuç doğrudan döner.
+    """
+    if not try_on_jobs: return jsonify({"status": "error", "message": "Gemini aktif değil."}), 500
+    if not os.path.exists(BASE_MODEL_PATH):
+        return jsonify({"status": "error", "message": "Manken görseli bulunamadı (static/models/base_model.jpg)."}), 503
     try:
         data = request.json
         web_paths = data.get('products', [])
@@ -295,36 +580,117 @@ def generate_outfit():
         
         if not real_paths: return jsonify({"status": "error", "message": "Resim bulunamadı."}), 404
 
-        filename = f"kombin_{int(time.time())}.png"
-        path = os.path.join(GENERATED_DIR, filename)
-        
-        print(f"🤖 [Gemini] Görüntü işleniyor... (Lütfen bekleyiniz)")
-
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                success = try_on_engine.generate_try_on_image(
-                    model_image_path=BASE_MODEL_PATH, 
-                    clothing_image_paths=real_paths, 
-                    output_path=path, 
-                    aspect_ratio="3:4", 
-                    prompt_text="A high-quality full body studio photo of a fashion model wearing this outfit. Professional lighting, white background."
-                )
-                if success:
-                    return jsonify({"status": "success", "image_url": f"/static/generated/{filename}"})
-                else:
-                    time.sleep(2)
-            except Exception as e:
-                if "503" in str(e) or "overloaded" in str(e).lower():
-                    time.sleep(4)
-                else:
-                    return jsonify({"status": "error", "message": str(e)}), 500
-
-        return jsonify({"status": "error", "message": "Sunucular çok yoğun."}), 503
+        try:
+            job = try_on_jobs.submit(
+                model_image_path=BASE_MODEL_PATH,
+                clothing_image_paths=real_paths,
+                aspect_ratio="3:4",
+                prompt_text=TRYON_PROMPT
+            )
+        except QueueFullError as e:
+            response = jsonify({"status": "error", "message": f"Sunucular çok yoğun, lütfen tekrar deneyin. {e}"})
+            response.headers['Retry-After'] = '10'
+            return response, 429
+
+        if job['cached']: print(f"♻️ [Gemini] Önbellekten döndü: {job['image_url']}")
+        else: print(f"🤖 [Gemini] İş kuyruğa alındı: {job['job_id']}")
+
+        wait = long_poll_seconds(data.get('wait'))
+        if wait > 0: job = try_on_jobs.wait(job['job_id'], wait)
+        return job_response(job)
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/generate-outfit/stats', methods=['GET'])
+def generate_outfit_stats():
+    if not try_on_jobs: return jsonify({"status": "error", "message": "Gemini aktif değil."}), 500
+    return jsonify({**try_on_jobs.stats(), 'backend': TRYON_BACKEND, 'generator': try_on_engine.stats()})
+
+@app.route('/api/generate-outfit/<job_id>', methods=['GET'])
+def generate_outfit_status(job_id):
+    """İş durumu. ?wait=N ile iş bitene kadar en fazla N saniye bekler (uzun sorgulama)."""
+    if not try_on_jobs: return jsonify({"status": "error", "message": "Gemini aktif değil."}), 500
+    wait = long_poll_seconds(request.args.get('wait'))
+    job = try_on_jobs.wait(job_id, wait) if wait > 0 else try_on_jobs.get(job_id)
+    if job is None: return jsonify({"status": "error", "message": "İş bulunamadı."}), 404
+    return job_response(job)
+
+@app.route('/api/memory', methods=['GET'])
+def memory_stats():
+    """Bu worker sürecinin bellek kullanımı (her worker kendi RSS/PSS değerini döner)."""
+    return jsonify(catalog.memory_usage())
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(all_cache_stats())
+
+# --- KATALOG YÖNETİMİ ---
+# Ürün ekleme / kaldırma yeniden başlatma gerektirmez; diğer worker'lar değişikliği
+# ortak günlükten en geç CATALOG_SYNC_INTERVAL saniye içinde alır.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Katalog indekslerini okumayan yollar; uzun sorgulama (try-on) okuma kilidini tutup
+# katalog değişikliklerini bekletmesin
+CATALOG_FREE_PATHS = ('/api/admin/', '/api/generate-outfit', '/images/', '/static/')
+
+@app.before_request
+def sync_catalog():
+    if items_df is None: return
+    catalog_updates.maybe_sync()
+    if request.path.startswith(CATALOG_FREE_PATHS): return
+    # İstek boyunca dinleyiciler indeksleri değiştirmez (catalog.begin_read)
+    catalog.begin_read()
+    g.catalog_read = True
+
+@app.teardown_request
+def release_catalog(error=None):
+    if g.pop('catalog_read', False): catalog.end_read()
+
+def admin_error():
+    """ADMIN_TOKEN tanımlı değilse yönetim API'si kapalıdır."""
+    if not ADMIN_TOKEN:
+        return jsonify({"status": "error", "message": "Yönetim API'si kapalı (ADMIN_TOKEN tanımlı değil)."}), 403
+    if request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({"status": "error", "message": "Yetkisiz."}), 403
+    return None
+
+@app.route('/api/admin/items', methods=['POST'])
+def admin_add_items():
+    """Gövde: {"items": [{"item_id", "name", "category", "color", "season", "image", ...}]}"""
+    error = admin_error()
+    if error: return error
+    try:
+        result = catalog_updates.add_items((request.json or {}).get('items', []))
+        print(f"✅ Kataloğa {result['added']} ürün eklendi ({result['seconds']} sn).")
+        return jsonify({"status": "success", **result})
+    except catalog_updates.CatalogUpdateError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+@app.route('/api/admin/items/retire', methods=['POST'])
+def admin_retire_items():
+    """Gövde: {"item_ids": [...]}"""
+    error = admin_error()
+    if error: return error
+    try:
+        result = catalog_updates.retire_items((request.json or {}).get('item_ids', []))
+        print(f"✅ Katalogdan {result['retired']} ürün kaldırıldı ({result['seconds']} sn).")
+        return jsonify({"status": "success", **result})
+    except catalog_updates.CatalogUpdateError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+@app.route('/api/admin/compact', methods=['POST'])
+def admin_compact():
+    error = admin_error()
+    if error: return error
+    return jsonify({"status": "success", **catalog_updates.compact_now()})
+
+@app.route('/api/admin/catalog', methods=['GET'])
+def admin_catalog_stats():
+    error = admin_error()
+    if error: return error
+    return jsonify(catalog_updates.stats())
+
 @app.route('/images/<path:filename>')
 def serve_images(filename): return send_from_directory(DATASET_IMAGES_DIR, filename)
 @app.route('/static/generated/<path:filename>')
@@ -0,0 +1,79 @@
+"""
+load_data'daki kategori gruplama adımının karşılaştırmalı ölçümü.
+
+Eski yöntem (iterrows + row.to_dict + her satırda dört any() taraması) ile
+classify_categories (benzersiz kategorilerde derlenmiş desenler + kodlarla geri dağıtım)
+aynı katalog üzerinde çalıştırılır; sonuçların birebir aynı olduğu doğrulanır.
+
+Kullanım:
+    python bench_categories.py --rows 74852 --repeat 3
+"""
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import app
+
+def legacy_determine_detailed_category(cat_name):
+    """Eski satır bazlı sınıflandırma (anahtar kelime listeleriyle any() taraması)."""
+    cat = str(cat_name).lower()
+    for group, keys in app.CATEGORY_GROUP_KEYS:
+        if any(k in cat for k in keys): return group
+    return 'other'
+
+def legacy_groups(df):
+    """Eski load_data döngüsü: her satır sözlüğe çevrilip tek tek sınıflandırılır."""
+    groups = []
+    for _, row in df.iterrows():
+        item = row.to_dict()
+        if 'image' in item and item['image']:
+            if not str(item['image']).startswith('/images/'):
+                item['image'] = f"/images/{os.path.basename(str(item['image']))}"
+        groups.append(legacy_determine_detailed_category(item['category']))
+    return np.array(groups)
+
+def per_row_groups(df):
+    """Sadece sınıflandırma, satır başına (sözlük oluşturmadan)."""
+    return np.array([legacy_determine_detailed_category(c) for c in df['category'].tolist()])
+
+def vectorized_groups(df):
+    return app.classify_categories(df['category'])
+
+def timed(func, df, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def run(rows=None, repeat=3):
+    df = app.items_df
+    if rows and rows > len(df):
+        df = pd.concat([df] * (rows // len(df) + 1), ignore_index=True).iloc[:rows]
+    print(f"🔄 {len(df)} satır, {df['category'].nunique()} benzersiz kategori")
+
+    results = {}
+    for name, func in (('iterrows + to_dict + any()', legacy_groups),
+                       ('satır başına any()', per_row_groups),
+                       ('classify_categories', vectorized_groups)):
+        seconds, groups = timed(func, df, repeat)
+        results[name] = (seconds, groups)
+
+    reference_seconds, reference = results['iterrows + to_dict + any()']
+    for name, (seconds, groups) in results.items():
+        same = np.array_equal(groups, reference)
+        print(f"{name:<28} {seconds * 1000:>10.1f} ms  x{reference_seconds / seconds:>7.1f}  {'✅ aynı' if same else '❌ FARKLI'}")
+
+    counts = pd.Series(reference).value_counts().to_dict()
+    print(f"📊 Gruplar: {counts}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kategori gruplama benchmark'ı.")
+    parser.add_argument('--rows', type=int, default=None, help="Katalog bu satır sayısına çoğaltılır")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
@@ -0,0 +1,140 @@
+"""
+Hazır ürün kartları ve hızlı JSON yanıt yolu.
+
+Ürün kartları (arama / kombin yanıtlarındaki ürün nesneleri) yüklemede bir kez JSON'a
+çevrilip satır numarasıyla saklanır; yanıtlar bu parçaların birleştirilmesiyle kurulur,
+istek anında to_dict / iterrows / jsonify yapılmaz. Katalog değişince (catalog.on_change)
+sadece eklenen satırlar yeniden çevrilir.
+
+json_response:
+    - ETag (gövdenin özeti); GET isteklerinde If-None-Match eşleşirse 304 döner
+    - Accept-Encoding'e göre brotli (paket kuruluysa) veya gzip; sıkıştırılmış gövdeler
+      ETag ile önbellekte tutulur, tekrar eden sayfalar yeniden sıkıştırılmaz
+
+orjson kuruluysa kodlayıcı olarak o, değilse standart json kullanılır.
+"""
+import os
+import gzip
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+from flask import Response, request
+
+import catalog
+from result_cache import ResultCache
+
+try:
+    import orjson
+except ImportError:  # Standart json ile aynı çıktı (daha yavaş)
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Sadece gzip sunulur
+    brotli = None
+
+# Bu boyuttan küçük gövdeler sıkıştırılmaz
+MIN_COMPRESS_BYTES = int(os.getenv('MIN_COMPRESS_BYTES', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSED_CACHE = ResultCache('compressed_responses', max_mb=float(os.getenv('COMPRESSED_CACHE_MAX_MB', '32')))
+
+def _default(value):
+    if isinstance(value, np.generic): return value.item()
+    if isinstance(value, np.ndarray): return value.tolist()
+    raise TypeError(f"JSON'a çevrilemeyen tip: {type(value).__name__}")
+
+def dumps(value):
+    """JSON bytes (boşluksuz, UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+def _fragments(cards_df):
+    """Kart DataFrame'inin her satırı için JSON nesnesi; boş değerler null olur."""
+    columns = list(cards_df.columns)
+    values = [[None if pd.isna(v) else v for v in cards_df[col].tolist()] if cards_df[col].hasnans
+              else cards_df[col].tolist() for col in columns]
+    return [dumps(dict(zip(columns, row))) for row in zip(*values)]
+
+class ItemCards:
+    """
+    Satır numarası -> hazır JSON nesnesi.
+
+    Args:
+        name: catalog.on_change kayıt adı
+        frame: Güncel ürün DataFrame'ini döndüren fonksiyon (katalog satır sırasıyla)
+        render: DataFrame -> kart DataFrame'i (sütunlar JSON alanları olur)
+    """
+    def __init__(self, name, frame, render):
+        self.name = name
+        self.frame = frame
+        self.render = render
+        self.cards = []
+
+    def build(self):
+        """Tüm kartları çevirir ve katalog değişikliklerine abone olur."""
+        self.cards = _fragments(self.render(self.frame()))
+        catalog.on_change(self.name, self.update)
+
+    def update(self, event):
+        """Eklenen satırlar çevrilir; sıkıştırmada kartlar kalan satırlara göre seçilir."""
+        if event['op'] == 'add':
+            self.cards = self.cards + _fragments(self.render(self.frame().iloc[event['start']:]))
+        elif event['op'] == 'compact':
+            cards = self.cards
+            self.cards = [cards[i] for i in np.flatnonzero(event['keep']).tolist()]
+
+    def array(self, rows, extras=None):
+        """
+        Satırların kartlarından JSON dizisi (bytes).
+
+        Args:
+            extras: Satır başına karta eklenecek alanlar (ör. [{'score': 9.1}, ...])
+        """
+        cards = self.cards
+        if extras is None:
+            return b'[' + b','.join([cards[r] for r in rows]) + b']'
+        return b'[' + b','.join([
+            cards[r][:-1] + b',' + dumps(extra)[1:] if extra else cards[r]
+            for r, extra in zip(rows, extras)
+        ]) + b']'
+
+def obj(**fields):
+    """
+    Alanları hazır JSON (bytes) veya normal değer olan bir JSON nesnesi kurar:
+    obj(items=cards.array(rows), total=0)
+    """
+    parts = [dumps(key) + b':' + (value if isinstance(value, bytes) else dumps(value)) for key, value in fields.items()]
+    return b'{' + b','.join(parts) + b'}'
+
+def _negotiate():
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+def _compress(body, encoding):
+    if encoding == 'br': return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def json_response(body, status=200):
+    """
+    JSON gövdesinden (bytes) yanıt: ETag / 304 ve içerik sıkıştırma.
+    """
+    etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+    encoding = _negotiate() if status == 200 and len(body) >= MIN_COMPRESS_BYTES else None
+    tag = f"{etag}-{encoding}" if encoding else etag
+
+    if status == 200 and request.method in ('GET', 'HEAD') and (
+            request.if_none_match.contains(etag) or request.if_none_match.contains(tag)):
+        response = Response(status=304)
+    else:
+        if encoding:
+            body = COMPRESSED_CACHE.get_or_compute(tag, lambda: _compress(body, encoding))
+        response = Response(body, status=status, mimetype='application/json')
+        if encoding: response.headers['Content-Encoding'] = encoding
+    response.set_etag(tag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
@@ -1,22 +1,189 @@
 import os
-from google import genai
-from google.genai import types
-from PIL import Image
+import io
+import time
+import random
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageOps
+
+# Gönderilecek görsellerin sınırları (.env ile değiştirilebilir)
+MAX_CLOTHING_SIDE = int(os.getenv('TRYON_MAX_CLOTHING_SIDE', '1024'))
+MAX_MODEL_SIDE = int(os.getenv('TRYON_MAX_MODEL_SIDE', '1536'))
+JPEG_QUALITY = int(os.getenv('TRYON_JPEG_QUALITY', '90'))
+PREPARED_FORMAT = 'JPEG'
+PREPARED_CACHE_SIZE = int(os.getenv('TRYON_PREPARED_CACHE_SIZE', '256'))
+
+def prepare_image(path, max_side):
+    """
+    Görseli API'ye gönderilecek hale getirir: EXIF yönü düzeltilir, şeffaf alanlar beyaza
+    basılır, uzun kenar max_side'a küçültülür ve JPEG olarak kodlanır.
+    (jpeg_bytes, orijinal dosya boyutu) döner.
+    """
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        if max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format=PREPARED_FORMAT, quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue(), os.path.getsize(path)
+
+class PreparedImageCache:
+    """
+    Hazırlanmış (küçültülmüş + kodlanmış) görseller için LRU önbellek.
+    Anahtar (yol, mtime, boyut, max_side) olduğundan dosya değişince eski kayıt kullanılmaz.
+    """
+    def __init__(self, max_entries=PREPARED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, max_side):
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, max_side)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = prepare_image(path, max_side)
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(len(data) for data, _ in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+# =========================================
+# ÜRETİM BACKEND'LERİ
+# generate_image(contents, aspect_ratio, resolution) -> .save(path) metodu olan görsel veya None
+# contents: [prompt metni, JPEG bytes, JPEG bytes, ...]
+# =========================================
+class GeminiBackend:
+    """Gerçek Gemini API'si (google-genai paketi sadece bu backend seçilince yüklenir)."""
+    def __init__(self, api_key, model_name="gemini-3-pro-image-preview"):
+        if not api_key:
+            raise ValueError("API Key bulunamadı! Lütfen geçerli bir Google API Key girin.")
+        from google import genai
+        from google.genai import types
+        self.types = types
+        self.client = genai.Client(api_key=api_key)
+        self.model_name = model_name
+
+    def generate_image(self, contents, aspect_ratio, resolution):
+        types = self.types
+        contents = [types.Part.from_bytes(data=part, mime_type='image/jpeg') if isinstance(part, bytes) else part
+                    for part in contents]
+        response = self.client.models.generate_content(
+            model=self.model_name,
+            contents=contents,
+            config=types.GenerateContentConfig(
+                response_modalities=['IMAGE'],
+                image_config=types.ImageConfig(
+                    aspect_ratio=aspect_ratio,
+                    image_size=resolution
+                ),
+            )
+        )
+        for part in response.parts:
+            if image := part.as_image():
+                return image
+        return None
+
+class LocalStubBackend:
+    """
+    Ağa çıkmadan Gemini'yi taklit eden yerel backend (yük testi / kapasite planlama için).
+    - Gecikme log-normal dağılır (medyan latency sn, yayılım sigma)
+    - overload_rate oranında 503 (overloaded), failure_rate oranında kalıcı hata fırlatır
+    - empty_rate oranında görsel döndürmez
+    - Aksi halde istenen en-boy oranında düz renkli bir görsel döndürür
+    """
+    SIZES = {'1K': 1024, '2K': 2048, '4K': 4096}
+
+    def __init__(self, latency=18.4, sigma=0.3, overload_rate=0.1, failure_rate=0.0, empty_rate=0.0, seed=None):
+        self.model_name = "local-stub"
+        self.latency = latency
+        self.sigma = sigma
+        self.overload_rate = overload_rate
+        self.failure_rate = failure_rate
+        self.empty_rate = empty_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        seed = os.getenv('TRYON_STUB_SEED')
+        return cls(latency=float(os.getenv('TRYON_STUB_LATENCY', '18.4')),
+                   sigma=float(os.getenv('TRYON_STUB_SIGMA', '0.3')),
+                   overload_rate=float(os.getenv('TRYON_STUB_OVERLOAD_RATE', '0.1')),
+                   failure_rate=float(os.getenv('TRYON_STUB_FAILURE_RATE', '0')),
+                   empty_rate=float(os.getenv('TRYON_STUB_EMPTY_RATE', '0')),
+                   seed=int(seed) if seed else None)
+
+    def generate_image(self, contents, aspect_ratio, resolution):
+        with self._lock:
+            delay = self._rng.lognormvariate(0, self.sigma) * self.latency if self.latency > 0 else 0
+            outcome = self._rng.random()
+            color = tuple(self._rng.randrange(256) for _ in range(3))
+        time.sleep(delay)
+
+        if outcome < self.overload_rate:
+            raise RuntimeError("503 UNAVAILABLE: The model is overloaded. Please try again later. (stub)")
+        outcome -= self.overload_rate
+        if outcome < self.failure_rate:
+            raise RuntimeError("400 INVALID_ARGUMENT: Request rejected. (stub)")
+        outcome -= self.failure_rate
+        if outcome < self.empty_rate:
+            return None
+
+        w, h = (int(x) for x in aspect_ratio.split(':'))
+        long_side = self.SIZES.get(resolution, 1024)
+        scale = long_side / max(w, h)
+        return Image.new('RGB', (max(1, round(w * scale)), max(1, round(h * scale))), color)
 
 class GeminiTryOnGenerator:
-    def __init__(self, api_key):
+    def __init__(self, api_key=None, backend=None):
         """
         Gemini istemcisini başlatır.
+        backend verilirse (örn. LocalStubBackend) API anahtarı gerekmez.
         """
-        if not api_key:
-            raise ValueError("API Key bulunamadı! Lütfen geçerli bir Google API Key girin.")
-        
         print("--- [GeminiTryOn] İstemci Başlatılıyor... ---")
-        self.client = genai.Client(api_key=api_key)
+        self.backend = backend or GeminiBackend(api_key)
         # Model adı
-        self.model_name = "gemini-3-pro-image-preview"
+        self.model_name = self.backend.model_name
+        # Manken her istekte aynı olduğundan kodlanmış hali bellekte kalır
+        self.prepared_images = PreparedImageCache()
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.bytes_sent = 0
+        self.source_bytes = 0
+        self.last_request = None
         print("--- [GeminiTryOn] İstemci Hazır ✅ ---")
 
+    def cache_settings(self):
+        """Üretilen görseli etkileyen hazırlama ayarları (GeneratedImageCache anahtarına girer)."""
+        return {'model_side': MAX_MODEL_SIDE, 'clothing_side': MAX_CLOTHING_SIDE,
+                'format': PREPARED_FORMAT, 'quality': JPEG_QUALITY}
+
     def generate_try_on_image(self, 
                               model_image_path, 
                               clothing_image_paths, 
@@ -26,57 +193,69 @@ class GeminiTryOnGenerator:
                               resolution="2K"):
         """
         Manken ve kıyafet görsellerini alıp giydirilmiş fotoğrafı üretir.
+        Görsel kaydedilirse True, API görsel döndürmezse False döner. Eksik giriş ValueError
+        fırlatır; backend hataları (503 / 400 ...) olduğu gibi yukarı iletilir, tekrar deneme
+        kararını çağıran taraf (TryOnJobQueue) verir.
         """
         print(f"--- [GeminiTryOn] Görüntü Üretiliyor... (Bu işlem 10-30sn sürebilir) ---")
-        try:
-            # 1. Görselleri Hazırla
-            contents = []
-            contents.append(prompt_text)
-            
-            # Manken
-            if os.path.exists(model_image_path):
-                contents.append(Image.open(model_image_path))
+        # 1. Görselleri Hazırla (önbellekten veya küçültülüp JPEG'e çevrilerek)
+        prepare_start = time.perf_counter()
+        contents = [prompt_text]
+        sent_bytes, source_bytes = len(prompt_text.encode('utf-8')), 0
+
+        # Manken
+        if os.path.exists(model_image_path):
+            data, original_size = self.prepared_images.get(model_image_path, MAX_MODEL_SIDE)
+            contents.append(data)
+            sent_bytes += len(data)
+            source_bytes += original_size
+        else:
+            raise ValueError(f"Manken resmi bulunamadı: {model_image_path}")
+
+        # Kıyafetler
+        for cloth_path in clothing_image_paths:
+            if os.path.exists(cloth_path):
+                data, original_size = self.prepared_images.get(cloth_path, MAX_CLOTHING_SIDE)
+                contents.append(data)
+                sent_bytes += len(data)
+                source_bytes += original_size
             else:
-                 print(f"HATA: Manken resmi bulunamadı: {model_image_path}")
-                 return False
-
-            # Kıyafetler
-            for cloth_path in clothing_image_paths:
-                if os.path.exists(cloth_path):
-                    contents.append(Image.open(cloth_path))
-                else:
-                    print(f"UYARI: Kıyafet resmi atlandı (bulunamadı): {cloth_path}")
-            
-            if len(contents) < 3:
-                 print("HATA: Yeterli görsel sağlanmadı.")
-                 return False
-
-            # 2. İsteği Gönder
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=contents,
-                config=types.GenerateContentConfig(
-                    response_modalities=['IMAGE'],
-                    image_config=types.ImageConfig(
-                        aspect_ratio=aspect_ratio,
-                        image_size=resolution
-                    ),
-                )
-            )
+                print(f"UYARI: Kıyafet resmi atlandı (bulunamadı): {cloth_path}")
+        
+        if len(contents) < 3:
+            raise ValueError("Yeterli görsel sağlanmadı.")
+
+        prepare_ms = (time.perf_counter() - prepare_start) * 1000
+        with self._stats_lock:
+            self.requests_sent += 1
+            self.bytes_sent += sent_bytes
+            self.source_bytes += source_bytes
+            self.last_request = {'bytes_sent': sent_bytes, 'source_bytes': source_bytes,
+                                 'images': len(contents) - 1, 'prepare_ms': round(prepare_ms, 1)}
+        print(f"--- [GeminiTryOn] {len(contents) - 1} görsel hazırlandı: {sent_bytes / 1024:.0f} KB gönderiliyor "
+              f"(orijinal {source_bytes / 1024:.0f} KB, {prepare_ms:.0f} ms) ---")
+
+        # 2. İsteği Gönder
+        image = self.backend.generate_image(contents, aspect_ratio, resolution)
+
+        # 3. Sonucu Kaydet
+        if image:
+            image.save(output_path)
+            print(f"--- [GeminiTryOn] BAŞARILI! Görsel kaydedildi: {output_path} 🎉 ---")
+            return True
 
-            # 3. Sonucu Kaydet
-            for part in response.parts:
-                if image := part.as_image():
-                    image.save(output_path)
-                    print(f"--- [GeminiTryOn] BAŞARILI! Görsel kaydedildi: {output_path} 🎉 ---")
-                    return True
-            
-            print("--- [GeminiTryOn] HATA: API görsel döndürmedi. ---")
-            return False
+        print("--- [GeminiTryOn] HATA: API görsel döndürmedi. ---")
+        return False
 
-        except Exception as e:
-            print(f"--- [GeminiTryOn] KRİTİK HATA: {e} ---")
-            return False
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'requests_sent': self.requests_sent,
+                'bytes_sent': self.bytes_sent,
+                'source_bytes': self.source_bytes,
+                'last_request': self.last_request,
+                'prepared_images': self.prepared_images.stats()
+            }
 
 # =========================================
 # TEST ALANI
@@ -94,11 +273,15 @@ if __name__ == "__main__":
 
     generator = GeminiTryOnGenerator(api_key=MY_API_KEY)
 
-    basarili = generator.generate_try_on_image(
-        model_image_path=manken_resmi,
-        clothing_image_paths=kiyafetler,
-        output_path=sonuc_dosyasi
-    )
+    try:
+        basarili = generator.generate_try_on_image(
+            model_image_path=manken_resmi,
+            clothing_image_paths=kiyafetler,
+            output_path=sonuc_dosyasi
+        )
+    except Exception as e:
+        print(f"--- [GeminiTryOn] KRİTİK HATA: {e} ---")
+        basarili = False
 
     if basarili:
         print("✅ Test başarıyla tamamlandı.")
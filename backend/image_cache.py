@@ -0,0 +1,134 @@
+import os
+import time
+import hashlib
+import threading
+
+# GENERATED_DIR için disk bütçesi (.env ile değiştirilebilir)
+DEFAULT_MAX_MB = float(os.getenv('GENERATED_MAX_MB', '512'))
+
+class GeneratedImageCache:
+    """
+    Üretilen manken görselleri için içerik adresli disk önbelleği.
+    Dosya adı; manken görseli, kıyafet görselleri (sıralı özetleri), prompt, en-boy oranı,
+    çözünürlük ve görsel hazırlama ayarlarından (boyut sınırları, format, kalite) türetilen
+    SHA-256 özetidir. Aynı kombin tekrar istendiğinde Gemini'ye gidilmeden mevcut dosyanın
+    URL'i döner. Klasör boyutu max_mb'yi aşınca en uzun süredir kullanılmayan görseller silinir.
+    """
+    def __init__(self, directory, url_prefix='/static/generated', max_mb=DEFAULT_MAX_MB):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._digests = {}   # path -> (mtime_ns, size, sha256)
+        self._files = {}     # dosya adı -> [boyut, son erişim]
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.png') and '.tmp' not in entry.name:
+                st = entry.stat()
+                self._files[entry.name] = [st.st_size, st.st_mtime]
+                self._bytes += st.st_size
+
+    def file_digest(self, path):
+        """Dosya içeriğinin SHA-256 özeti; (mtime, boyut) değişmedikçe tekrar okunmaz."""
+        st = os.stat(path)
+        with self._lock:
+            cached = self._digests.get(path)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                return cached[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self._digests[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def make_key(self, model_image_path, clothing_image_paths, prompt_text, aspect_ratio, resolution, settings=None):
+        """
+        Args:
+            settings: Üreticinin görsel hazırlama ayarları (GeminiTryOnGenerator.cache_settings);
+                      ayarlar değişince eski görseller kullanılmaz
+        """
+        h = hashlib.sha256()
+        h.update(self.file_digest(model_image_path).encode())
+        for digest in sorted(self.file_digest(p) for p in clothing_image_paths):
+            h.update(b'|' + digest.encode())
+        for part in (prompt_text or '', aspect_ratio or '', resolution or ''):
+            h.update(b'|' + str(part).encode('utf-8'))
+        for name, value in sorted((settings or {}).items()):
+            h.update(f"|{name}={value}".encode('utf-8'))
+        return h.hexdigest()
+
+    def filename(self, key):
+        return f"{key}.png"
+
+    def path_for(self, key):
+        return os.path.join(self.directory, self.filename(key))
+
+    def url_for(self, key):
+        return f"{self.url_prefix}/{self.filename(key)}"
+
+    def lookup(self, key):
+        """Önbellekte varsa görselin URL'i, yoksa None."""
+        name = self.filename(key)
+        with self._lock:
+            entry = self._files.get(name)
+            if entry is not None and not os.path.exists(os.path.join(self.directory, name)):
+                # Dosya dışarıdan silinmiş
+                self._bytes -= entry[0]
+                del self._files[name]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entry[1] = time.time()
+            self.hits += 1
+        return self.url_for(key)
+
+    def store(self, key, tmp_path):
+        """Geçici dosyadaki üretilmiş görseli önbelleğe taşır ve disk bütçesini uygular."""
+        name = self.filename(key)
+        final_path = os.path.join(self.directory, name)
+        os.replace(tmp_path, final_path)
+        size = os.path.getsize(final_path)
+        with self._lock:
+            old = self._files.get(name)
+            if old: self._bytes -= old[0]
+            self._files[name] = [size, time.time()]
+            self._bytes += size
+            self._evict(keep=name)
+        return self.url_for(key)
+
+    def _evict(self, keep):
+        if self._bytes <= self.max_bytes: return
+        for name, (size, _) in sorted(self._files.items(), key=lambda x: x[1][1]):
+            if self._bytes <= self.max_bytes: break
+            if name == keep: continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            del self._files[name]
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'files': len(self._files),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
@@ -0,0 +1,220 @@
+"""
+Sanal manken hattı için yük testi.
+
+Çalışan Flask uygulamasına N eşzamanlı istemciyle /api/generate-outfit istekleri gönderir;
+üretim hızı, gecikme yüzdelikleri (p50/p95/p99), tekrar deneme sayıları ve worker
+doluluğunu raporlar. Gemini'ye gitmeden denemek için sunucu yerel taklit backend ile başlatılır:
+
+    TRYON_BACKEND=stub TRYON_STUB_LATENCY=2 TRYON_STUB_OVERLOAD_RATE=0.2 python app.py
+    python load_test.py --clients 8 --duration 60
+
+Not: Aynı kombin tekrar istenirse görsel önbellekten döner (cached); istemciler bu yüzden
+her istekte rastgele ürünler seçer.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.request
+import urllib.error
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGES_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'frontend', 'public', 'images'))
+SEED_QUERIES = ['elbise', 'pantolon', 'gömlek', 'etek', 'mont', 'ayakkabı', 'kazak', 'tişört']
+
+def http_json(method, url, payload=None, timeout=60):
+    """(durum kodu, JSON gövde, başlıklar) döndürür; HTTP hataları da yanıt olarak döner."""
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read() or b'{}'), dict(resp.headers)
+    except urllib.error.HTTPError as e:
+        try: body = json.loads(e.read() or b'{}')
+        except ValueError: body = {}
+        return e.code, body, dict(e.headers)
+
+def product_images(base_url, images_dir):
+    """İsteklerde kullanılacak ürün görsellerinin web yolları."""
+    if os.path.isdir(images_dir):
+        names = [n for n in os.listdir(images_dir) if n.lower().endswith(('.jpg', '.jpeg', '.png'))]
+        if names: return [f"/images/{n}" for n in names]
+
+    # Görsel klasörü bu makinede yoksa sunucudan arama ile topla
+    images = set()
+    for query in SEED_QUERIES:
+        _, body, _ = http_json('POST', f"{base_url}/api/search", {'query': query})
+        images.update(item['image'] for item in body.get('items', []) if item.get('image'))
+    return sorted(images)
+
+class LoadTest:
+    def __init__(self, base_url, images, clients, duration, requests_per_client, wait, min_items, max_items, seed):
+        self.base_url = base_url.rstrip('/')
+        self.images = images
+        self.clients = clients
+        self.duration = duration
+        self.requests_per_client = requests_per_client
+        self.wait = wait
+        self.min_items = min_items
+        self.max_items = max_items
+        self.seed = seed
+
+        self.results = []   # her istek için sonuç sözlüğü
+        self.samples = []   # /stats örnekleri
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def _client(self, index):
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        deadline = time.monotonic() + self.duration if self.duration else None
+        sent = 0
+        while not self._done.is_set():
+            if deadline and time.monotonic() >= deadline: break
+            if self.requests_per_client and sent >= self.requests_per_client: break
+            sent += 1
+
+            products = rng.sample(self.images, min(len(self.images), rng.randint(self.min_items, self.max_items)))
+            start = time.perf_counter()
+            code, body, headers = http_json('POST', f"{self.base_url}/api/generate-outfit",
+                                            {'products': products, 'wait': self.wait}, timeout=self.wait + 30)
+            while code == 202:
+                code, body, headers = http_json('GET', f"{self.base_url}/api/generate-outfit/{body['job_id']}?wait={self.wait}",
+                                                timeout=self.wait + 30)
+            latency = time.perf_counter() - start
+
+            with self._lock:
+                self.results.append({
+                    'code': code,
+                    'status': body.get('status'),
+                    'latency': latency,
+                    'attempts': body.get('attempts', 0),
+                    'cached': bool(body.get('cached')),
+                    'queued_ms': (body.get('timings') or {}).get('queued_ms'),
+                    'message': body.get('message'),
+                    'error': body.get('error')
+                })
+
+            if code == 429:
+                # Sunucunun geri basıncına uy
+                retry_after = float(headers.get('Retry-After', 1))
+                self._done.wait(min(retry_after, 5) * rng.uniform(0.5, 1.0))
+
+    def _sampler(self, interval):
+        while not self._done.wait(interval):
+            code, body, _ = http_json('GET', f"{self.base_url}/api/generate-outfit/stats", timeout=10)
+            if code == 200:
+                with self._lock:
+                    self.samples.append(body)
+
+    def run(self, sample_interval=0.5):
+        sampler = threading.Thread(target=self._sampler, args=(sample_interval,), daemon=True)
+        threads = [threading.Thread(target=self._client, args=(i,), daemon=True) for i in range(self.clients)]
+        before = http_json('GET', f"{self.base_url}/api/generate-outfit/stats", timeout=10)[1]
+
+        start = time.perf_counter()
+        sampler.start()
+        for t in threads: t.start()
+        try:
+            for t in threads: t.join()
+        except KeyboardInterrupt:
+            print("\n⚠️ Durduruluyor...")
+        self._done.set()
+        elapsed = time.perf_counter() - start
+
+        after = http_json('GET', f"{self.base_url}/api/generate-outfit/stats", timeout=10)[1]
+        return self.report(elapsed, before, after)
+
+    def report(self, elapsed, before, after):
+        results = self.results
+        success = [r for r in results if r['code'] == 200]
+        generated = [r for r in success if not r['cached']]
+        codes = {}
+        for r in results: codes[r['code']] = codes.get(r['code'], 0) + 1
+
+        def percentiles(values):
+            if not values: return None
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {'p50': round(p50, 3), 'p95': round(p95, 3), 'p99': round(p99, 3), 'max': round(max(values), 3)}
+
+        # Başarısız işler türüne göre: overloaded (tekrar denenip bitti) / empty / permanent (ilk denemede)
+        failures = {}
+        for r in results:
+            if r['status'] == 'error' and r['error']: failures[r['error']] = failures.get(r['error'], 0) + 1
+        before_failures, after_failures = before.get('failures') or {}, after.get('failures') or {}
+
+        busy = [s['busy_workers'] / s['workers'] for s in self.samples if s.get('workers')]
+        depth = [s['queue_depth'] for s in self.samples]
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'clients': self.clients,
+            'requests': len(results),
+            'status_codes': codes,
+            'succeeded': len(success),
+            'cached': len(success) - len(generated),
+            'throughput_per_s': round(len(success) / elapsed, 3) if elapsed else 0.0,
+            'latency_s': percentiles([r['latency'] for r in generated]),
+            'queue_wait_s': percentiles([r['queued_ms'] / 1000 for r in generated if r['queued_ms'] is not None]),
+            'retries': sum(max(0, r['attempts'] - 1) for r in results),
+            'retried_succeeded': sum(1 for r in generated if r['attempts'] > 1),
+            'server_retries': after.get('retries', 0) - before.get('retries', 0),
+            'failures': failures,
+            'server_failures': {kind: after_failures.get(kind, 0) - before_failures.get(kind, 0) for kind in after_failures},
+            'saturation': {
+                'workers': after.get('workers'),
+                'mean_busy_ratio': round(float(np.mean(busy)), 3) if busy else None,
+                'all_busy_ratio': round(float(np.mean([b >= 1 for b in busy])), 3) if busy else None,
+                'mean_queue_depth': round(float(np.mean(depth)), 2) if depth else None,
+                'max_queue_depth': max(depth) if depth else None
+            }
+        }
+
+def print_report(report):
+    print("\n===== YÜK TESTİ SONUCU =====")
+    print(f"Süre: {report['elapsed_s']} sn | İstemci: {report['clients']} | İstek: {report['requests']}")
+    print(f"Durum kodları: {report['status_codes']}")
+    print(f"Başarılı: {report['succeeded']} (önbellekten: {report['cached']}) | Hız: {report['throughput_per_s']} görsel/sn")
+    if report['latency_s']:
+        lat = report['latency_s']
+        print(f"Gecikme (sn): p50={lat['p50']} p95={lat['p95']} p99={lat['p99']} max={lat['max']}")
+    if report['queue_wait_s']:
+        q = report['queue_wait_s']
+        print(f"Kuyrukta bekleme (sn): p50={q['p50']} p95={q['p95']} p99={q['p99']}")
+    print(f"Tekrar deneme: {report['retries']} (sunucu sayacı: {report['server_retries']}) | "
+          f"tekrar denenip başarılı olan: {report['retried_succeeded']}")
+    failures = report['failures']
+    print(f"Başarısız: yoğunluk (503, denemeler tükendi) {failures.get('overloaded', 0)}, "
+          f"kalıcı hata (tekrar denenmedi) {failures.get('permanent', 0)}, görsel dönmedi {failures.get('empty', 0)} "
+          f"(sunucu sayacı: {report['server_failures']})")
+    sat = report['saturation']
+    print(f"Worker doluluğu: ort. %{(sat['mean_busy_ratio'] or 0) * 100:.0f}, tamamen dolu %{(sat['all_busy_ratio'] or 0) * 100:.0f} "
+          f"| Kuyruk: ort. {sat['mean_queue_depth']}, en fazla {sat['max_queue_depth']} ({sat['workers']} worker)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sanal manken hattı için yük testi.")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--clients', type=int, default=4, help="Eşzamanlı istemci sayısı")
+    parser.add_argument('--duration', type=float, default=60, help="Test süresi (sn, 0 = sınırsız)")
+    parser.add_argument('--requests', type=int, default=0, help="İstemci başına en fazla istek (0 = sınırsız)")
+    parser.add_argument('--wait', type=float, default=25, help="Uzun sorgulama süresi (sn)")
+    parser.add_argument('--min-items', type=int, default=2)
+    parser.add_argument('--max-items', type=int, default=3)
+    parser.add_argument('--images-dir', default=DEFAULT_IMAGES_DIR)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help="Raporu JSON olarak yazdır")
+    args = parser.parse_args()
+
+    images = product_images(args.url.rstrip('/'), args.images_dir)
+    if not images:
+        print("❌ Ürün görseli bulunamadı.")
+        raise SystemExit(1)
+
+    print(f"🔄 {args.clients} istemci ile yük testi başlıyor ({len(images)} ürün görseli)...")
+    test = LoadTest(args.url, images, args.clients, args.duration, args.requests, args.wait,
+                    args.min_items, args.max_items, args.seed)
+    report = test.run()
+    if args.json: print(json.dumps(report, indent=2, ensure_ascii=False))
+    else: print_report(report)
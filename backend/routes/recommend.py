@@ -1,11 +1,15 @@
 from flask import Blueprint, request, jsonify
 import sys
 import os
+import pandas as pd
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../models'))
 
-from style_model import search_by_text
-from combin_model import get_combin_recommendations
+import style_model
+from style_model import search_page, search_by_text_batch, search_facets, search_mode
+from facet_index import global_facets
+from combin_model import get_combin_recommendations_batch
+from fast_json import ItemCards, json_response, dumps, obj
 
 recommend_bp = Blueprint('recommend', __name__)
 
@@ -42,65 +46,155 @@ CATEGORY_KEYWORDS = {
     'elbise': 'all-body', 'dress': 'all-body'
 }
 
-@recommend_bp.route('/api/search', methods=['POST'])
-def search():
+# Tek istekte kabul edilen en fazla sorgu sayısı
+MAX_BATCH_QUERIES = 100
+
+def flag(value, default=False):
+    """JSON gövdesindeki bool veya sorgu dizesindeki 'true' / 'false' değeri."""
+    if value is None: return default
+    if isinstance(value, str): return value.strip().lower() not in ('', '0', 'false', 'no')
+    return bool(value)
+
+def detect_query_intent(query):
+    """Sorgudaki renk ve kategori anahtar kelimelerini bulur, sorguyu zenginleştirir."""
+    query_lower = query.lower()
+    detected_color = None
+    detected_category = None
+    
+    for color_key in COLOR_HARMONY.keys():
+        if color_key in query_lower:
+            detected_color = color_key
+            break
+    
+    for keyword, category in sorted(CATEGORY_KEYWORDS.items(), key=lambda x: len(x[0]), reverse=True):
+        if keyword in query_lower:
+            detected_category = category
+            break
+    
+    enriched_query = query
+    if 'kot' in query_lower or 'jean' in query_lower or 'denim' in query_lower:
+        enriched_query += ' jeans denim'
+    
+    return enriched_query, detected_color, detected_category
+
+def harmony_colors(detected_color, has_color_keyword):
+    """Renk anahtar kelimesi varsa izin verilen renkler (COLOR_HARMONY); 'karışık' bu listelerde yok."""
+    if has_color_keyword and detected_color:
+        return COLOR_HARMONY.get(detected_color)
+    return None
+
+def search_card_frame(df):
+    """Arama kartı alanları; skor istek anında karta eklenir."""
+    ids = df['item_id'].map(int)
+    return pd.DataFrame({
+        'item_id': ids,
+        'name': df['name'].map(str),
+        'category': df['category'].map(str),
+        'color': df['color'].map(str),
+        'season': df['season'].map(str),
+        'image': [f"/images/{item_id}.jpg" for item_id in ids.tolist()]
+    })
+
+# Satır numarası -> hazır arama kartı (ilk aramada kurulur; modeller uygulama tarafından yüklenir)
+SEARCH_CARDS = ItemCards('search_cards', lambda: style_model.items_df, search_card_frame)
+
+def search_cards():
+    if not SEARCH_CARDS.cards: SEARCH_CARDS.build()
+    return SEARCH_CARDS
+
+def search_items(results):
+    """
+    Arama sonuçlarının hazır kartlarından JSON dizisi (filtreler zaten puanlama maskesinde uygulandı).
+    Sonuç satırlarının indeksi katalog satır numarasıdır.
+    """
+    if results.empty: return b'[]'
+    scores = results['similarity_score'].astype(float).tolist()
+    return search_cards().array(results.index.tolist(), [{'score': score} for score in scores])
+
+def ranked_search(data):
+    """
+    TF-IDF / vektör araması; app.py'deki /api/search "mode" verildiğinde buraya yönlendirir.
+    {"query", "season", "limit", "has_color_keyword", "mode", "cursor", "facets"}
+    mode: 'lexical', 'dense' veya 'hybrid'; yanıttaki mode fiilen kullanılan moddur.
+    Yanıttaki next_cursor bir sonraki sayfa için "cursor" olarak gönderilir (son sayfada null).
+    facets (varsayılan true): tüm sonuç kümesinin kategori / renk / sezon sayıları.
+    """
     try:
-        data = request.json
         query = data.get('query', '')
         season = data.get('season')
-        has_color_keyword = data.get('has_color_keyword', False)
-        top_k = data.get('limit', 8)
+        has_color_keyword = flag(data.get('has_color_keyword'))
+        try: top_k = int(data.get('limit', 8))
+        except (TypeError, ValueError): return jsonify({'error': 'limit sayı olmalı'}), 400
         
         if not query:
             return jsonify({'error': 'Query gerekli'}), 400
         
-        query_lower = query.lower()
-        detected_color = None
-        detected_category = None
+        enriched_query, detected_color, detected_category = detect_query_intent(query)
         
-        for color_key in COLOR_HARMONY.keys():
-            if color_key in query_lower:
-                detected_color = color_key
-                break
+        filters = {
+            'season': season,
+            'category': detected_category,
+            'colors': harmony_colors(detected_color, has_color_keyword),
+            'mode': data.get('mode')
+        }
+        try:
+            results, next_cursor = search_page(query=enriched_query, limit=top_k, cursor=data.get('cursor'), **filters)
+            facets = search_facets(enriched_query, **filters) if flag(data.get('facets'), True) else None
+            mode = search_mode(filters['mode'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        for keyword, category in sorted(CATEGORY_KEYWORDS.items(), key=lambda x: len(x[0]), reverse=True):
-            if keyword in query_lower:
-                detected_category = category
-                break
+        # mode: kullanılan arama modu (vektör indeksi yoksa 'lexical')
+        response = {'success': True, 'count': len(results), 'mode': mode, 'items': search_items(results),
+                    'next_cursor': next_cursor}
+        if facets is not None: response['facets'] = facets
+        return json_response(obj(**response))
         
-        enriched_query = query
-        if 'kot' in query_lower or 'jean' in query_lower or 'denim' in query_lower:
-            enriched_query += ' jeans denim'
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@recommend_bp.route('/api/search/batch', methods=['POST'])
+def search_batch():
+    """
+    Toplu arama: {"queries": [{"query": ..., "season": ..., "limit": ..., "has_color_keyword": ...}, ...]}
+    Tüm sorgular tek bir seyrek matris çarpımıyla puanlanır.
+    """
+    try:
+        data = request.json
+        queries = data.get('queries', [])
         
-        results = search_by_text(
-            query=enriched_query,
-            top_k=top_k * 10,
-            season=season,
-            category=detected_category
-        )
+        if not queries:
+            return jsonify({'error': 'queries gerekli'}), 400
+        if len(queries) > MAX_BATCH_QUERIES:
+            return jsonify({'error': f'En fazla {MAX_BATCH_QUERIES} sorgu gönderilebilir'}), 400
         
-        items = []
-        for _, row in results.iterrows():
-            if detected_category and row['category'] != detected_category:
-                continue
-            if has_color_keyword and detected_color:
-                if row['color'] == 'karışık': continue
-                if detected_color in COLOR_HARMONY:
-                    harmonious = COLOR_HARMONY[detected_color]
-                    if row['color'] not in harmonious: continue
-            
-            items.append({
-                'item_id': int(row['item_id']),
-                'name': str(row['name']),
-                'category': str(row['category']),
-                'color': str(row['color']),
-                'season': str(row['season']),
-                'score': float(row['similarity_score']),
-                'image': f"/images/{int(row['item_id'])}.jpg"
+        specs = []
+        intents = []
+        for entry in queries:
+            if isinstance(entry, str): entry = {'query': entry}
+            query = entry.get('query', '')
+            top_k = entry.get('limit', 8)
+            enriched_query, detected_color, detected_category = detect_query_intent(query)
+            specs.append({
+                'query': enriched_query,
+                'top_k': top_k,
+                'season': entry.get('season'),
+                'category': detected_category,
+                'colors': harmony_colors(detected_color, flag(entry.get('has_color_keyword'))),
+                'mode': entry.get('mode')
             })
-            if len(items) >= top_k: break
+            intents.append(query)
+        
+        batch_results = search_by_text_batch(specs)
         
-        return jsonify({'success': True, 'count': len(items), 'items': items})
+        responses = []
+        for results, query in zip(batch_results, intents):
+            if not query:
+                responses.append(obj(query=query, error='Query gerekli', count=0, items=[]))
+                continue
+            responses.append(obj(query=query, count=len(results), items=search_items(results)))
+        
+        return json_response(obj(success=True, count=len(responses), results=b'[' + b','.join(responses) + b']'))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -112,45 +206,40 @@ def get_combinations(item_id):
         source_category = request.args.get('source_category')
         top_k = int(request.args.get('limit', 8))
         
-        results = get_combin_recommendations(
-            item_id=item_id,
+        # Tek kaynaklı toplu çağrı: öneriler satır dizileri olarak döner, kartlar hazır JSON'dan kurulur
+        batch = get_combin_recommendations_batch(
+            [item_id],
             top_k=top_k,
             enforce_season=source_season,
-            source_category=source_category
+            source_category=source_category,
+            exclude_sources=False,
+            records=False
         )
-        
-        items = []
-        for _, row in results.iterrows():
-            items.append({
-                'item_id': int(row['item_id']),
-                'name': str(row['name']),
-                'category': str(row['category']),
-                'color': str(row['color']),
-                'season': str(row['season']),
-                'score': float(row['score']),
-                'reason': str(row['reason']),
-                'image': f"/images/{int(row['item_id'])}.jpg"
-            })
-        
-        return jsonify({
-            'success': True,
-            'count': len(items),
-            'source_item_id': item_id,
-            'recommendations': items
-        })
+        if not batch['results']: return json_response(obj(success=True, count=0, source_item_id=item_id, recommendations=[]))
+        rows, scores, reasons = batch['results'][0]['recommendations']
+        items = search_cards().array(rows.tolist(), [{'score': score, 'reason': reason}
+                                                     for score, reason in zip(scores.tolist(), reasons.tolist())])
+
+        return json_response(obj(
+            success=True,
+            count=len(rows),
+            source_item_id=item_id,
+            recommendations=items
+        ))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @recommend_bp.route('/api/stats', methods=['GET'])
 def get_stats():
+    """Genel facet sayıları (yüklemede hesaplanır, katalog değişikliklerinde güncellenir)."""
     try:
-        from style_model import items_df
-        return jsonify({
-            'total_items': len(items_df),
-            'categories': items_df['category'].value_counts().to_dict(),
-            'colors': items_df['color'].value_counts().to_dict(),
-            'seasons': items_df['season'].value_counts().to_dict()
-        })
+        facets = global_facets()
+        return json_response(dumps({
+            'total_items': facets['total'],
+            'categories': facets['category'],
+            'colors': facets['color'],
+            'seasons': facets['season']
+        }))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, '..', 'models'))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+NAMES = ['slim jean', 'wool sweater', 'leather boots', 'floral dress', 'denim jacket', 'cotton shirt']
+CATEGORIES = ['pantolon', 'kazak', 'ayakkabı', 'elbise', 'ceket', 'gömlek', 'Tişört', 'ŞORT']
+COLORS = ['siyah', 'beyaz', 'mavi', 'kırmızı', 'karışık', np.nan]
+SEASONS = ['yaz', 'kış', 'dört mevsim', 'ilkbahar']
+
+def make_items(n=300, start_id=1000):
+    """Tekrarlanan değerli küçük bir katalog (models/tests/conftest.py ile aynı desen)."""
+    rows = np.arange(n)
+    return pd.DataFrame({
+        'item_id': start_id + rows,
+        'name': [f"{NAMES[i % len(NAMES)]} {COLORS[i % 5]}" for i in rows],
+        'category': [CATEGORIES[i % len(CATEGORIES)] for i in rows],
+        'color': [COLORS[i % len(COLORS)] for i in rows],
+        'season': [SEASONS[i % len(SEASONS)] for i in rows],
+        'image': [f"images/{start_id + i}.jpg" for i in rows],
+    })
+
+@pytest.fixture
+def serve_catalog(monkeypatch, tmp_path):
+    """
+    serve(df=None, active=None): df'i (verilmezse make_items()) paylaşılan katalog yapar ve uygulamanın arama indekslerini,
+    stil modelini, facet sayılarını ve kartlarını bu katalogdan kurar; app modülünü döndürür.
+    """
+    monkeypatch.setenv('TRYON_BACKEND', 'stub')
+    import app
+    import catalog
+    import catalog_updates
+    import embedding_index
+    import facet_index
+    import outfit_composer
+    import style_model
+    from routes import recommend
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    saved = {
+        app: ('items_df', 'POOLS', 'CATEGORY_TERM_POSTINGS', 'COLOR_TERM_POSTINGS', 'TOKEN_VOCAB', 'TOKEN_OFFSETS', 'TOKEN_ROWS'),
+        style_model: ('items_df', 'vectorizer', 'tfidf_matrix', 'search_matrix', 'search_matrix_t', 'FILTER_INDEX',
+                      'ACTIVE_BITS', 'SEARCH_MODE'),
+        facet_index: ('GLOBAL_COUNTS', 'TOTAL'),
+        embedding_index: ('INDEX',),
+        app.ITEM_CARDS: ('cards',),
+        recommend.SEARCH_CARDS: ('cards',),
+    }
+    for owner, names in saved.items():
+        for name in names: monkeypatch.setattr(owner, name, getattr(owner, name))
+    monkeypatch.setattr(outfit_composer, 'build_slots', lambda pools: None)
+    monkeypatch.setattr(catalog_updates, 'JOURNAL_PATH', str(tmp_path / 'catalog_journal.jsonl'))
+
+    def serve(df=None, active=None):
+        df = make_items() if df is None else df.copy()
+        df['text'] = catalog_updates.item_text(df)
+        monkeypatch.setattr(catalog, 'items_df', df)
+        monkeypatch.setattr(catalog, 'ACTIVE', np.ones(len(df), dtype=bool) if active is None else active)
+        monkeypatch.setattr(catalog, 'ORIGIN', np.arange(len(df), dtype=np.int64))
+        monkeypatch.setattr(catalog, 'REVISION', 0)
+        monkeypatch.setattr(catalog, 'COMPACTION', 0)
+        monkeypatch.setattr(catalog, 'JOURNAL_OFFSET', 0)
+        monkeypatch.setattr(catalog, 'LISTENERS', {})
+        monkeypatch.setattr(catalog, 'DERIVED_COLUMNS', {})
+        embedding_index.INDEX = None
+
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2)).fit(df['text'])
+        style_model.items_df = catalog.items_df
+        style_model.vectorizer = vectorizer
+        style_model.tfidf_matrix = vectorizer.transform(df['text'])
+        style_model.SEARCH_MODE = 'lexical'
+        style_model.build_search_matrix()
+        style_model.SEARCH_CACHE.clear()
+        catalog.on_change('style_model', style_model.on_catalog_change)
+        facet_index.build_facets()
+
+        app.build_catalog_indexes()
+        catalog.on_change('app', app.on_catalog_change)
+        app.ITEM_CARDS.build()
+        recommend.SEARCH_CARDS.build()
+        return app
+
+    yield serve
+    style_model.SEARCH_CACHE.clear()
+    app.BUSINESS_SEARCH_CACHE.clear()
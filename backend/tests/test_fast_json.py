@@ -0,0 +1,100 @@
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+import catalog
+import fast_json
+from fast_json import ItemCards, json_response, dumps, obj
+
+SMALL = dumps({'items': [1, 2, 3]})
+LARGE = dumps({'items': [{'item_id': str(i), 'name': f'ürün {i}'} for i in range(200)]})
+
+@pytest.fixture
+def client():
+    app = Flask('fast_json_test')
+
+    @app.route('/small', methods=['GET', 'POST'])
+    def small():
+        return json_response(SMALL)
+
+    @app.route('/large', methods=['GET', 'POST'])
+    def large():
+        return json_response(LARGE)
+
+    fast_json.COMPRESSED_CACHE.clear()
+    return app.test_client()
+
+def test_small_body_is_not_compressed(client):
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == SMALL
+    assert response.headers['ETag'].strip('"')
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+def test_large_body_is_gzipped_when_accepted(client, monkeypatch):
+    monkeypatch.setattr(fast_json, 'brotli', None)
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == LARGE
+    assert response.headers['ETag'].strip('"').endswith('-gzip')
+
+    plain = client.get('/large')
+    assert 'Content-Encoding' not in plain.headers and plain.data == LARGE
+    assert plain.headers['ETag'] != response.headers['ETag']
+
+def test_brotli_is_preferred_when_installed(client):
+    brotli = pytest.importorskip('brotli')
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data) == LARGE
+
+def test_matching_etag_returns_304_for_get_only(client):
+    for path, headers in (('/small', {}), ('/large', {'Accept-Encoding': 'gzip'})):
+        etag = client.get(path, headers=headers).headers['ETag']
+        not_modified = client.get(path, headers={**headers, 'If-None-Match': etag})
+        assert not_modified.status_code == 304 and not_modified.data == b''
+        assert not_modified.headers['ETag'] == etag
+        assert client.head(path, headers={**headers, 'If-None-Match': etag}).status_code == 304
+        assert client.post(path, headers={**headers, 'If-None-Match': etag}).status_code == 200
+        assert client.get(path, headers={**headers, 'If-None-Match': '"other"'}).status_code == 200
+
+def test_plain_etag_matches_compressed_request(client):
+    # Sıkıştırılmamış yanıttan alınan ETag, gzip kabul eden istekte de geçerlidir
+    etag = client.get('/large').headers['ETag']
+    assert client.get('/large', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+
+def test_obj_and_dumps_embed_prebuilt_json():
+    body = obj(items=b'[{"a":1}]', total=np.int64(3), score=np.float32(0.5), name='şal', empty=None)
+    assert json.loads(body) == {'items': [{'a': 1}], 'total': 3, 'score': 0.5, 'name': 'şal', 'empty': None}
+
+@pytest.fixture
+def cards(monkeypatch):
+    monkeypatch.setattr(catalog, 'LISTENERS', {})
+    frame = {'df': pd.DataFrame({'item_id': ['1', '2', '3'], 'name': ['a', None, 'c'], 'price': [1.5, np.nan, 3.0]})}
+    cards = ItemCards('test_cards', lambda: frame['df'], lambda df: df)
+    cards.build()
+    return cards, frame
+
+def test_item_cards_render_rows_and_extras(cards):
+    cards, _ = cards
+    assert json.loads(cards.array([2, 0])) == [{'item_id': '3', 'name': 'c', 'price': 3.0},
+                                               {'item_id': '1', 'name': 'a', 'price': 1.5}]
+    assert json.loads(cards.array([1])) == [{'item_id': '2', 'name': None, 'price': None}]
+    assert json.loads(cards.array([0, 1], [{'score': 9.5}, None])) == [
+        {'item_id': '1', 'name': 'a', 'price': 1.5, 'score': 9.5}, {'item_id': '2', 'name': None, 'price': None}]
+    assert cards.array([]) == b'[]'
+
+def test_item_cards_follow_catalog_changes(cards):
+    cards, frame = cards
+    frame['df'] = pd.concat([frame['df'], pd.DataFrame({'item_id': ['4'], 'name': ['d'], 'price': [4.0]})],
+                            ignore_index=True)
+    catalog.LISTENERS['test_cards']({'op': 'add', 'start': 3, 'count': 1})
+    assert json.loads(cards.array([3]))[0]['item_id'] == '4'
+
+    catalog.LISTENERS['test_cards']({'op': 'compact', 'keep': np.array([False, True, True, True])})
+    assert [card['item_id'] for card in json.loads(cards.array(range(3)))] == ['2', '3', '4']
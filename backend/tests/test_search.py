@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import catalog
+
+NAMES = ['Slim  Jean', ' jean jacket', 'blue jeans', 'jean', 'denim  shirt  ', 'wool sweater', np.nan,
+         'jean\tskirt', 'slim jean', 'Mini  skirt']
+CATEGORIES = ['pantolon', 'ceket', 'pantolon', ' etek  ', 'gömlek', 'kazak', 'etek', 'etek', 'pantolon', 'mini  etek']
+
+@pytest.fixture
+def search_app(serve_catalog):
+    """Boşluk içeren isimlerden oluşan küçük katalog; bir ürün kaldırılmış."""
+    n = len(NAMES)
+    df = pd.DataFrame({'item_id': np.arange(100, 100 + n), 'name': NAMES, 'category': CATEGORIES,
+                       'color': ['siyah'] * n, 'season': ['yaz'] * n, 'image': [f"images/{i}.jpg" for i in range(n)]})
+    active = np.ones(n, dtype=bool)
+    active[-2] = False  # Kaldırılmış ürün sonuçlara girmez
+    return serve_catalog(df, active)
+
+def contains_rows(app, query_lower):
+    """Eski düz metin araması: isim veya kategoride str.contains (kaldırılanlar hariç)."""
+    mask = (app.items_df['name'].str.contains(query_lower, regex=False) |
+            app.items_df['category'].str.contains(query_lower, regex=False)).to_numpy()
+    return np.flatnonzero(mask & catalog.ACTIVE).tolist()
+
+@pytest.mark.parametrize('query', ['jean', ' jean', 'jean ', ' jean ', 'slim  jean', 'slim jean', 'slim   jean',
+                                   'n  s', 'ean', 'jean\tskirt', 'jean skirt', 'shirt  ', '  ', ' ', 'mini  ',
+                                   'i  e', 'etek  ', 'jacket'])
+def test_token_search_matches_substring_search(search_app, query):
+    assert search_app.token_search(query).tolist() == contains_rows(search_app, query)
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+import app
+import catalog
+import catalog_updates
+import embedding_index
+import style_model
+from routes import recommend
+
+@pytest.fixture
+def client(serve_catalog):
+    return serve_catalog().app.test_client()
+
+def value_counts(rows, col):
+    """Pandas ile beklenen facet sayıları (NaN hariç)."""
+    counts = catalog.items_df[col].iloc[rows].value_counts()
+    return {k: int(v) for k, v in counts.items()}
+
+def test_single_search_rule(client):
+    rules = [r for r in client.application.url_map.iter_rules() if r.rule == '/api/search']
+    assert len(rules) == 1
+    assert {'GET', 'POST'} <= rules[0].methods
+
+def test_keyword_search_returns_facets_over_all_matches(client):
+    rows = app.token_search('jean')
+    assert len(rows) > 40  # facet'ler 40 sonuçla sınırlı kalmamalı
+
+    data = client.post('/api/search', json={'query': 'jean'}).get_json()
+    assert len(data['items']) == 40
+    assert data['facets']['total'] == len(rows)
+    for col in ('category', 'color', 'season'):
+        assert data['facets'][col] == value_counts(rows, col)
+
+def test_keyword_search_get_and_facets_flag(client):
+    data = client.get('/api/search?query=jean&facets=false').get_json()
+    assert 'facets' not in data
+    assert len(data['items']) == 40
+
+def test_stats_returns_global_counts(client):
+    response = client.get('/api/stats')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['total_items'] == len(catalog.items_df)
+    assert data['categories'] == value_counts(np.arange(len(catalog.items_df)), 'category')
+
+def open_small_index():
+    """Sunulan katalog için bellekte LSA vektör indeksi (embedding_index.open_index yerine)."""
+    provider = embedding_index.LsaProvider.fit(style_model.vectorizer, style_model.tfidf_matrix, dim=8)
+    matrix = provider.embed_rows(style_model.tfidf_matrix).astype(np.float16)
+    embedding_index.INDEX = {'header': {'provider': 'lsa'}, 'matrix': matrix, 'provider': provider}
+    embedding_index.sync_rows()
+
+def test_search_mode_lexical(client):
+    data = client.post('/api/search', json={'query': 'wool', 'mode': 'lexical', 'limit': 5}).get_json()
+    assert data['mode'] == 'lexical'
+    assert data['count'] == 5
+    assert all('wool' in item['name'] for item in data['items'])
+    assert 'facets' in data
+
+def test_search_mode_dense_falls_back_without_index(client):
+    data = client.get('/api/search?query=wool&mode=dense&limit=5').get_json()
+    assert data['mode'] == 'lexical'
+    assert data['count'] == 5
+
+@pytest.mark.parametrize('mode', ['dense', 'hybrid'])
+def test_search_mode_uses_vector_index(client, mode):
+    open_small_index()
+    data = client.post('/api/search', json={'query': 'wool', 'mode': mode, 'limit': 5}).get_json()
+    assert data['mode'] == mode
+    assert data['count'] == 5
+    scores = [item['score'] for item in data['items']]
+    assert scores == sorted(scores, reverse=True)
+
+def test_unknown_search_mode(client):
+    response = client.post('/api/search', json={'query': 'jean', 'mode': 'semantic'})
+    assert response.status_code == 400
+
+def ranked_pages(client, query, limit):
+    items, cursor = [], None
+    while True:
+        body = {'query': query, 'mode': 'lexical', 'limit': limit, 'facets': False}
+        if cursor: body['cursor'] = cursor
+        data = client.post('/api/search', json=body).get_json()
+        items += data['items']
+        cursor = data['next_cursor']
+        if cursor is None: return items
+
+def test_ranked_search_pages_through_served_route(client):
+    single = client.post('/api/search', json={'query': 'wool', 'mode': 'lexical', 'limit': 1000}).get_json()
+    items = ranked_pages(client, 'wool', 7)
+    assert [item['item_id'] for item in items] == [item['item_id'] for item in single['items']]
+    assert len(items) > 7
+
+def test_stale_cursor_is_rejected_after_compaction(client):
+    first = client.post('/api/search', json={'query': 'wool', 'mode': 'lexical', 'limit': 5}).get_json()
+    catalog_updates.retire_items([first['items'][0]['item_id']])
+    catalog_updates.compact_now()
+    response = client.post('/api/search', json={'query': 'wool', 'mode': 'lexical', 'limit': 5,
+                                                'cursor': first['next_cursor']})
+    assert response.status_code == 400
+    assert 'eski' in response.get_json()['error']
+
+def test_batch_search_matches_single_searches(client):
+    queries = ['wool', {'query': 'floral', 'limit': 3, 'season': 'kış'}, {'query': 'leather siyah', 'has_color_keyword': True}, '']
+    response = client.post('/api/search/batch', json={'queries': queries})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['count'] == len(queries)
+
+    for entry, result in zip(queries[:3], data['results']):
+        body = {'query': entry} if isinstance(entry, str) else dict(entry)
+        single = client.post('/api/search', json={**body, 'mode': 'lexical', 'facets': False}).get_json()
+        assert result['count'] == single['count'] > 0
+        assert [item['item_id'] for item in result['items']] == [item['item_id'] for item in single['items']]
+    assert data['results'][3]['error'] == 'Query gerekli'
+
+def test_batch_search_limits(client):
+    assert client.post('/api/search/batch', json={'queries': []}).status_code == 400
+    too_many = ['wool'] * (recommend.MAX_BATCH_QUERIES + 1)
+    assert client.post('/api/search/batch', json={'queries': too_many}).status_code == 400
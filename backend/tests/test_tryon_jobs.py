@@ -0,0 +1,217 @@
+import os
+import time
+import threading
+
+import pytest
+
+import tryon_jobs
+from tryon_jobs import TryOnJobQueue, QueueFullError, BUSY_MESSAGE
+from image_cache import GeneratedImageCache
+
+class FakeGenerator:
+    """generate_try_on_image yerine sırayla verilen sonuçları döndürür (True / False / Exception)."""
+    def __init__(self, outcomes, release=None):
+        self.outcomes = list(outcomes)
+        self.release = release
+        self.calls = []
+
+    def generate_try_on_image(self, model_image_path, clothing_image_paths, output_path,
+                              aspect_ratio, prompt_text, resolution):
+        self.calls.append(time.monotonic())
+        if self.release is not None: self.release.wait(5)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception): raise outcome
+        if outcome:
+            with open(output_path, 'wb') as f:
+                f.write(b'png')
+        return outcome
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+    def make(generator, **kwargs):
+        kwargs.setdefault('base_delay', 0.01)
+        kwargs.setdefault('max_delay', 0.05)
+        queue = TryOnJobQueue(generator, str(tmp_path), **kwargs)
+        queues.append(queue)
+        return queue
+    yield make
+    for queue in queues: queue.shutdown()
+
+def submit(queue, paths=('a.jpg',)):
+    return queue.submit('model.jpg', list(paths))
+
+def test_success(make_queue, tmp_path):
+    queue = make_queue(FakeGenerator([True]))
+    job = queue.wait(submit(queue)['job_id'], 5)
+    assert job['status'] == 'success'
+    assert job['attempts'] == 1
+    assert job['error'] is None
+    assert job['image_url'] == f"/static/generated/kombin_{job['job_id']}.png"
+    assert os.path.exists(tmp_path / f"kombin_{job['job_id']}.png")
+    assert queue.stats()['completed'] == 1
+
+def test_overloaded_then_success_retries_with_backoff(make_queue, monkeypatch):
+    monkeypatch.setattr(tryon_jobs.random, 'uniform', lambda a, b: 1.0)  # jitter yok
+    generator = FakeGenerator([Exception('503 UNAVAILABLE'), Exception('model is overloaded'), True])
+    queue = make_queue(generator, max_retries=3, base_delay=0.05, max_delay=1.0)
+    job = queue.wait(submit(queue)['job_id'], 5)
+
+    assert job['status'] == 'success'
+    assert job['attempts'] == 3
+    assert queue.stats()['retries'] == 2
+    gaps = [b - a for a, b in zip(generator.calls, generator.calls[1:])]
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1  # base_delay * 2 ** attempt
+
+def test_overloaded_on_every_attempt_is_busy(make_queue):
+    queue = make_queue(FakeGenerator([Exception('503 UNAVAILABLE')]), max_retries=2)
+    job = queue.wait(submit(queue)['job_id'], 5)
+    assert (job['status'], job['error'], job['message']) == ('error', 'overloaded', BUSY_MESSAGE)
+    assert job['attempts'] == 2
+    assert queue.stats()['failures']['overloaded'] == 1
+
+def test_permanent_error_fails_on_first_attempt(make_queue):
+    generator = FakeGenerator([ValueError('400 INVALID_ARGUMENT: bad image'), True])
+    queue = make_queue(generator, max_retries=3)
+    job = queue.wait(submit(queue)['job_id'], 5)
+
+    assert job['status'] == 'error'
+    assert job['error'] == 'permanent'
+    assert job['attempts'] == 1
+    assert 'INVALID_ARGUMENT' in job['message']
+    assert len(generator.calls) == 1
+    assert queue.stats()['retries'] == 0
+
+def test_queue_full_raises(make_queue):
+    queue = make_queue(FakeGenerator([True]), workers=0, max_queue=1)
+    submit(queue)
+    with pytest.raises(QueueFullError):
+        submit(queue, ('b.jpg',))
+    assert queue.stats()['rejected'] == 1
+
+def test_same_request_is_deduplicated_while_inflight(make_queue, tmp_path):
+    model, clothing = tmp_path / 'model.jpg', tmp_path / 'shirt.jpg'
+    model.write_bytes(b'model')
+    clothing.write_bytes(b'shirt')
+    release = threading.Event()
+    generator = FakeGenerator([True], release=release)
+    cache = GeneratedImageCache(str(tmp_path / 'generated'))
+    queue = make_queue(generator, image_cache=cache)
+
+    first = queue.submit(str(model), [str(clothing)])
+    second = queue.submit(str(model), [str(clothing)])
+    assert second['job_id'] == first['job_id']
+    assert queue.stats()['deduplicated'] == 1
+
+    release.set()
+    job = queue.wait(first['job_id'], 5)
+    assert job['status'] == 'success'
+    assert len(generator.calls) == 1
+    assert not queue._inflight
+
+    # Bittikten sonra aynı istek önbellekten döner
+    cached = queue.submit(str(model), [str(clothing)])
+    assert cached['cached'] and cached['image_url'] == job['image_url']
+
+def test_wait_returns_unfinished_job_after_timeout(make_queue):
+    release = threading.Event()
+    queue = make_queue(FakeGenerator([True], release=release))
+    job_id = submit(queue)['job_id']
+
+    start = time.monotonic()
+    job = queue.wait(job_id, 0.2)
+    assert time.monotonic() - start >= 0.2
+    assert job['status'] in ('queued', 'running')
+
+    release.set()
+    assert queue.wait(job_id, 5)['status'] == 'success'
+    assert queue.wait('missing', 0.01) is None
+
+def test_workers_start_on_first_submit(make_queue):
+    queue = make_queue(FakeGenerator([True]), workers=2)
+    assert queue.stats()['workers'] == 0
+    queue.wait(submit(queue)['job_id'], 5)
+    assert queue.stats()['workers'] == 2
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork yok')
+def test_forked_process_runs_jobs(make_queue):
+    # gunicorn --preload: kuyruk ana süreçte kurulur, işler fork edilen süreçte gönderilir
+    queue = make_queue(FakeGenerator([True]), workers=1)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 'crash'
+        try:
+            status = queue.wait(submit(queue)['job_id'], 5)['status']
+        finally:
+            os.write(write_fd, status.encode())
+            os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 64) == b'success'
+    os.close(read_fd)
+    assert queue.stats()['workers'] == 0
+
+def test_job_state_is_shared_between_processes(make_queue, tmp_path):
+    # İki kuyruk aynı state_dir'i paylaşan iki worker süreci gibi davranır
+    release = threading.Event()
+    state_dir = str(tmp_path / 'jobs')
+    owner = make_queue(FakeGenerator([True], release=release), state_dir=state_dir)
+    other = make_queue(FakeGenerator([True]), workers=0, state_dir=state_dir)
+
+    job_id = submit(owner)['job_id']
+    assert other.get(job_id)['status'] in ('queued', 'running')
+    assert other.wait(job_id, 0.1)['status'] in ('queued', 'running')
+
+    release.set()
+    job = other.wait(job_id, 5)
+    assert job['status'] == 'success'
+    assert job['image_url'] == owner.get(job_id)['image_url']
+    assert 'params' not in job and 'cache_key' not in job
+    assert other.get('missing') is None
+    assert other.get('../' + job_id) is None
+
+def test_cache_key_covers_preparation_settings(make_queue, tmp_path, monkeypatch):
+    import gemini_tryon
+    model, clothing = tmp_path / 'model.jpg', tmp_path / 'shirt.jpg'
+    model.write_bytes(b'model')
+    clothing.write_bytes(b'shirt')
+    cache = GeneratedImageCache(str(tmp_path / 'generated'))
+    generator = gemini_tryon.GeminiTryOnGenerator(backend=gemini_tryon.LocalStubBackend(latency=0.01))
+
+    def key():
+        return cache.make_key(str(model), [str(clothing)], 'prompt', '3:4', '2K', generator.cache_settings())
+    base = key()
+    assert key() == base
+    for name, value in (('MAX_MODEL_SIDE', 512), ('MAX_CLOTHING_SIDE', 256), ('JPEG_QUALITY', 70), ('PREPARED_FORMAT', 'PNG')):
+        with monkeypatch.context() as m:
+            m.setattr(gemini_tryon, name, value)
+            assert key() != base, name
+
+@pytest.fixture
+def app_module(monkeypatch, tmp_path):
+    monkeypatch.setenv('TRYON_BACKEND', 'stub')
+    import app
+    images = tmp_path / 'images'
+    images.mkdir()
+    (images / 'shirt.jpg').write_bytes(b'shirt')
+    monkeypatch.setattr(app, 'DATASET_IMAGES_DIR', str(images))
+    queue = TryOnJobQueue(FakeGenerator([True]), str(tmp_path), workers=0, max_queue=1)
+    monkeypatch.setattr(app, 'try_on_jobs', queue)
+    return app
+
+def test_full_queue_returns_429_with_retry_after(app_module):
+    client = app_module.app.test_client()
+    first = client.post('/api/generate-outfit', json={'products': ['/images/shirt.jpg']})
+    assert first.status_code == 202
+
+    second = client.post('/api/generate-outfit', json={'products': ['/images/shirt.jpg']})
+    assert second.status_code == 429
+    assert second.headers['Retry-After'] == '10'
+    assert second.json['status'] == 'error'
+
+def test_missing_base_model_returns_503(app_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, 'BASE_MODEL_PATH', str(tmp_path / 'missing.jpg'))
+    response = app_module.app.test_client().post('/api/generate-outfit', json={'products': ['/images/shirt.jpg']})
+    assert response.status_code == 503
+    assert response.json['status'] == 'error'
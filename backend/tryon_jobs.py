@@ -0,0 +1,365 @@
+import os
+import re
+import json
+import time
+import uuid
+import random
+import weakref
+import threading
+from collections import deque
+
+# Varsayılan kuyruk ayarları (.env ile değiştirilebilir)
+DEFAULT_WORKERS = int(os.getenv('TRYON_WORKERS', '2'))
+DEFAULT_MAX_QUEUE = int(os.getenv('TRYON_MAX_QUEUE', '20'))
+DEFAULT_MAX_RETRIES = int(os.getenv('TRYON_MAX_RETRIES', '3'))
+
+FINISHED_STATES = ('success', 'error')
+BUSY_MESSAGE = "Sunucular çok yoğun."
+EMPTY_MESSAGE = "Görsel üretilemedi."
+
+# Başka bir süreçteki işin durum dosyası bu aralıkla tekrar okunur (uzun sorgulama)
+STATE_POLL_SECONDS = 0.25
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+# Başarısız işlerin hata türleri (job['error']):
+#   overloaded: tüm denemeler 503 / overloaded ile bitti (HTTP 503)
+#   empty:      üretici tüm denemelerde görsel döndürmedi
+#   permanent:  kalıcı hata (400, eksik giriş ...); tekrar denenmez
+ERROR_KINDS = ('overloaded', 'empty', 'permanent')
+
+class QueueFullError(Exception):
+    """Bekleyen iş sayısı sınırı aşıldığında fırlatılır (HTTP 429)."""
+    pass
+
+def is_overloaded_error(error):
+    text = str(error).lower()
+    return '503' in text or 'overloaded' in text or 'unavailable' in text
+
+class TryOnJobQueue:
+    """
+    Sanal manken üretimi için arka plan iş kuyruğu.
+    - submit() işi kuyruğa ekleyip hemen job id döndürür
+    - Sabit sayıda worker thread GeminiTryOnGenerator.generate_try_on_image çağırır
+    - Sadece geçici hatalar (503 / overloaded veya görsel dönmemesi) üstel geri çekilme
+      (backoff + jitter) ile tekrarlanır; diğer hatalar işi ilk denemede bitirir
+    - get() / wait() ile durum sorgulanır (wait uzun sorgulama içindir)
+    - Worker thread'ler her süreçte ilk submit()'te başlar: gunicorn --preload ile ana süreçte
+      kurulan kuyruk fork edilince thread'ler çocuğa geçmez, çocuk kendi worker'larını başlatır
+    - state_dir verilirse işlerin durumu orada JSON dosyası olarak da tutulur; iş başka bir
+      worker sürecinde çalışıyor olsa bile get() / wait() durumu bu dosyadan okur
+
+    generator: generate_try_on_image(model_image_path, clothing_image_paths, output_path,
+               aspect_ratio, prompt_text, resolution) metoduna sahip herhangi bir nesne (testte sahte üretici)
+    image_cache: Verilirse (GeneratedImageCache) aynı girişler için üretilmiş görsel tekrar kullanılır
+                 ve aynı anda gelen aynı istekler tek bir işte birleştirilir
+    """
+    def __init__(self, generator, output_dir, url_prefix='/static/generated',
+                 workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE, max_retries=DEFAULT_MAX_RETRIES,
+                 base_delay=2.0, max_delay=16.0, job_ttl=3600, image_cache=None, state_dir=None):
+        self.generator = generator
+        self.image_cache = image_cache
+        self.output_dir = output_dir
+        self.url_prefix = url_prefix
+        self.workers = workers
+        self.state_dir = state_dir
+        if state_dir: os.makedirs(state_dir, exist_ok=True)
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.job_ttl = job_ttl
+        self._stopped = False
+        self._reset()
+
+        # fork sonrası çocuk süreç ana süreçten kalan kilitleri / kuyruğu kullanmaz
+        if hasattr(os, 'register_at_fork'):
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() and ref()._reset())
+
+    def _reset(self):
+        """Sürece ait kuyruk durumu (kurulumda ve fork sonrası çocuk süreçte)."""
+        self._jobs = {}
+        self._inflight = {}  # önbellek anahtarı -> bekleyen/çalışan job id
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        if self._stopped: self._stop_event.set()
+        self._busy = 0
+        self.completed = 0
+        self.failed = 0
+        self.failures = dict.fromkeys(ERROR_KINDS, 0)
+        self.rejected = 0
+        self.retries = 0
+        self.deduplicated = 0
+        self._threads = []
+        self._pid = None  # worker'ların başlatıldığı süreç
+
+    def _ensure_workers(self):
+        """Bu süreçte worker thread'ler henüz yoksa başlatır (ilk submit'te)."""
+        if self._pid == os.getpid(): return
+        with self._start_lock:
+            if self._pid == os.getpid(): return
+            self._pid = os.getpid()
+            self._remove_stale_states()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker_loop, name=f"tryon-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    # --- İstemci tarafı ---
+
+    def submit(self, model_image_path, clothing_image_paths, aspect_ratio="3:4", prompt_text=None, resolution="2K"):
+        self._ensure_workers()
+        cache_key = None
+        if self.image_cache:
+            settings = self.generator.cache_settings() if hasattr(self.generator, 'cache_settings') else None
+            cache_key = self.image_cache.make_key(model_image_path, clothing_image_paths,
+                                                  prompt_text, aspect_ratio, resolution, settings)
+            cached_url = self.image_cache.lookup(cache_key)
+            if cached_url:
+                with self._cond:
+                    job = self._new_job(cache_key, None)
+                    job.update({'status': 'success', 'cached': True, 'image_url': cached_url,
+                                'started_at': job['created_at'], 'finished_at': job['created_at']})
+                    self._save(job)
+                    return self._snapshot(job)
+
+        with self._cond:
+            self._prune()
+            # Aynı kombin zaten kuyrukta / üretiliyorsa o işe bağlan
+            if cache_key in self._inflight:
+                self.deduplicated += 1
+                return self._snapshot(self._jobs[self._inflight[cache_key]])
+            if len(self._pending) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f"Kuyruk dolu ({len(self._pending)} iş bekliyor)")
+
+            job = self._new_job(cache_key, {
+                'model_image_path': model_image_path,
+                'clothing_image_paths': list(clothing_image_paths),
+                'aspect_ratio': aspect_ratio,
+                'prompt_text': prompt_text,
+                'resolution': resolution
+            })
+            if cache_key: self._inflight[cache_key] = job['job_id']
+            self._pending.append(job['job_id'])
+            self._cond.notify_all()
+            return self._snapshot(job)
+
+    def _new_job(self, cache_key, params):
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'cached': False,
+            'attempts': 0,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'image_url': None,
+            'message': None,
+            'error': None,
+            'cache_key': cache_key,
+            'params': params
+        }
+        self._jobs[job_id] = job
+        self._save(job)
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job: return self._snapshot(job)
+        job = self._load(job_id)
+        return self._snapshot(job) if job else None
+
+    def wait(self, job_id, timeout):
+        """İş bitene veya timeout dolana kadar bekler (uzun sorgulama)."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            job = self._jobs.get(job_id)
+            while job and job['status'] not in FINISHED_STATES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: break
+                self._cond.wait(remaining)
+            if job: return self._snapshot(job)
+
+        # Başka bir süreçteki iş: durum dosyası bitene veya süre dolana kadar tekrar okunur
+        job = self._load(job_id)
+        while job and job['status'] not in FINISHED_STATES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            time.sleep(min(STATE_POLL_SECONDS, remaining))
+            job = self._load(job_id) or job
+        return self._snapshot(job) if job else None
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pid': os.getpid(),
+                'workers': len(self._threads),
+                'busy_workers': self._busy,
+                'queue_depth': len(self._pending),
+                'max_queue': self.max_queue,
+                'completed': self.completed,
+                'failed': self.failed,
+                'failures': dict(self.failures),
+                'rejected': self.rejected,
+                'retries': self.retries,
+                'deduplicated': self.deduplicated,
+                'tracked_jobs': len(self._jobs),
+                'image_cache': self.image_cache.stats() if self.image_cache else None
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._stop_event.set()
+            self._cond.notify_all()
+
+    # --- Worker tarafı ---
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped: return
+                job = self._jobs[self._pending.popleft()]
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+                self._save(job)
+                self._busy += 1
+                self._cond.notify_all()
+
+            try:
+                status, image_url, message, error = self._run(job)
+            except Exception as e:
+                status, image_url, message, error = 'error', None, str(e), 'permanent'
+
+            with self._cond:
+                self._busy -= 1
+                job['status'] = status
+                job['image_url'] = image_url
+                job['message'] = message
+                job['error'] = error
+                job['finished_at'] = time.time()
+                self._save(job)
+                self._inflight.pop(job['cache_key'], None)
+                if status == 'success':
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                    self.failures[error] += 1
+                self._cond.notify_all()
+
+    def _run(self, job):
+        params = job['params']
+        cache_key = job['cache_key']
+        if cache_key:
+            # Önce geçici dosyaya yaz, başarılıysa içerik adresli isme taşı
+            filename = f"{cache_key}.{job['job_id']}.tmp.png"
+        else:
+            filename = f"kombin_{job['job_id']}.png"
+        output_path = os.path.join(self.output_dir, filename)
+
+        error = 'empty'
+        try:
+            for attempt in range(self.max_retries):
+                with self._cond:
+                    job['attempts'] = attempt + 1
+                    if attempt > 0: self.retries += 1
+                    self._save(job)
+                try:
+                    success = self.generator.generate_try_on_image(
+                        model_image_path=params['model_image_path'],
+                        clothing_image_paths=params['clothing_image_paths'],
+                        output_path=output_path,
+                        aspect_ratio=params['aspect_ratio'],
+                        prompt_text=params['prompt_text'],
+                        resolution=params['resolution']
+                    )
+                    if success:
+                        if cache_key:
+                            return 'success', self.image_cache.store(cache_key, output_path), None, None
+                        return 'success', f"{self.url_prefix}/{filename}", None, None
+                    error = 'empty'
+                except Exception as e:
+                    # Sadece geçici (503 / overloaded) hatalar tekrar denenir
+                    if not is_overloaded_error(e):
+                        return 'error', None, str(e), 'permanent'
+                    error = 'overloaded'
+
+                if attempt + 1 < self.max_retries:
+                    self._backoff(attempt)
+
+            return 'error', None, BUSY_MESSAGE if error == 'overloaded' else EMPTY_MESSAGE, error
+        finally:
+            if cache_key and os.path.exists(output_path):
+                os.remove(output_path)
+
+    def _backoff(self, attempt):
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay *= random.uniform(0.5, 1.0)  # jitter: aynı anda düşen işler aynı anda tekrar denemesin
+        self._stop_event.wait(delay)
+
+    def _prune(self):
+        """Süresi dolan bitmiş işleri bellekten siler."""
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['status'] in FINISHED_STATES and job['finished_at'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._remove_state(job_id)
+
+    # --- Süreçler arası iş durumu (state_dir) ---
+
+    def _state_path(self, job_id):
+        if not self.state_dir or not JOB_ID_PATTERN.fullmatch(str(job_id)): return None
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _save(self, job):
+        """İş durumunu dosyaya yazar (geçici dosya + os.replace; okuyan yarım dosya görmez)."""
+        path = self._state_path(job['job_id'])
+        if path is None: return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({k: v for k, v in job.items() if k not in ('params', 'cache_key')}, f)
+        os.replace(tmp_path, path)
+
+    def _load(self, job_id):
+        path = self._state_path(job_id)
+        if path is None: return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remove_state(self, job_id):
+        path = self._state_path(job_id)
+        if path and os.path.exists(path): os.remove(path)
+
+    def _remove_stale_states(self):
+        """Kapanmış süreçlerden kalan, job_ttl'den eski durum dosyalarını siler."""
+        if not self.state_dir: return
+        cutoff = time.time() - self.job_ttl
+        for entry in os.scandir(self.state_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff: os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _snapshot(self, job):
+        """İşin API'ye dönen (dahili parametreler hariç) kopyası, süre ölçümleriyle."""
+        now = time.time()
+        started, finished = job['started_at'], job['finished_at']
+        timings = {
+            'queued_ms': round(((started or now) - job['created_at']) * 1000),
+            'run_ms': round(((finished or now) - started) * 1000) if started else None,
+            'total_ms': round(((finished or now) - job['created_at']) * 1000)
+        }
+        snapshot = {k: v for k, v in job.items() if k not in ('params', 'cache_key')}
+        snapshot['timings'] = timings
+        return snapshot
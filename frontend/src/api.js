@@ -34,16 +34,22 @@ export const api = {
     return response.json();
   },
 
-  // 3. Toplu Giydirme
+  // 3. Toplu Giydirme (iş kuyruğa alınır, bitene kadar uzun sorgulama yapılır)
   async generateOutfit(productPaths) {
     const response = await fetch(`${API_BASE_URL}/api/generate-outfit`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ 
-        products: productPaths 
+        products: productPaths,
+        wait: 25
       })
     });
-    return response.json();
+    let data = await response.json();
+    while (data.job_id && (data.status === 'queued' || data.status === 'running')) {
+      const poll = await fetch(`${API_BASE_URL}/api/generate-outfit/${data.job_id}?wait=25`);
+      data = await poll.json();
+    }
+    return data;
   },
 
   // 4. İstatistik
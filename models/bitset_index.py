@@ -0,0 +1,123 @@
+"""
+Kategori / renk / sezon filtreleri için sıkıştırılmış bit kümesi (bitset) indeksi.
+
+Her sütunun her benzersiz değeri için satır başına 1 bit tutulur (uint64 kelimeler).
+Filtreler satır satır metin karşılaştırması yerine kelime kelime AND / OR / NOT ile
+birleştirilir; sonuç sayısı popcount ile bulunur. Alt metin araması (contains) de sadece
+benzersiz değerler üzerinde yapılır, satırlara bitset'lerin OR'u ile yayılır.
+
+    index = BitsetIndex({'category': ..., 'color': ..., 'season': ...})
+    bits = index.eq('category', 'elbise') & index.isin('color', ['siyah', 'beyaz'])
+    bits = index.andnot(bits, index.eq('season', 'kış'))
+    index.count(bits), index.rows(bits), index.mask(bits)
+    index.value_counts('color', bits)   # {'siyah': 12, 'beyaz': 7, ...}
+"""
+import numpy as np
+import pandas as pd
+
+def _popcount(words):
+    if hasattr(np, 'bitwise_count'): return int(np.bitwise_count(words).sum())
+    return int(np.unpackbits(words.view(np.uint8)).sum())
+
+class BitsetIndex:
+    def __init__(self, columns):
+        """
+        Args:
+            columns: sütun adı -> değer dizisi (hepsi aynı uzunlukta); boş değerler indekslenmez
+        """
+        self.n = len(next(iter(columns.values()))) if columns else 0
+        self.words = (self.n + 63) // 64
+        self.values = {}  # sütun -> benzersiz değerler listesi
+        self.codes = {}   # sütun -> {değer: kod}
+        self.bits = {}    # sütun -> (değer sayısı x kelime) uint64 matris
+        for col, values in columns.items():
+            codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+            self.values[col] = list(uniques)
+            self.codes[col] = {v: i for i, v in enumerate(self.values[col])}
+            self.bits[col] = self._pack_codes(codes, len(uniques))
+        self._all = self.from_mask(np.ones(self.n, dtype=bool))
+
+    def _pack_codes(self, codes, size):
+        """Her kod için bit satırı: satırlar koda göre gruplanıp tek tek paketlenir."""
+        matrix = np.zeros((size, self.words), dtype=np.uint64)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(size + 1))
+        for code in range(size):
+            rows = order[bounds[code]:bounds[code + 1]]
+            np.bitwise_or.at(matrix[code], rows >> 6, np.uint64(1) << (rows & 63).astype(np.uint64))
+        return matrix
+
+    # --- KÜME OLUŞTURMA ---
+
+    def from_mask(self, mask):
+        padded = np.zeros(self.words * 64, dtype=bool)
+        padded[:self.n] = mask
+        return np.packbits(padded, bitorder='little').view(np.uint64)
+
+    def from_rows(self, rows):
+        return self.from_mask(np.isin(np.arange(self.n), rows))
+
+    def all(self):
+        return self._all.copy()
+
+    def none(self):
+        return np.zeros(self.words, dtype=np.uint64)
+
+    def eq(self, col, value):
+        """col == value olan satırlar."""
+        code = self.codes[col].get(value)
+        return self.bits[col][code].copy() if code is not None else self.none()
+
+    def isin(self, col, values):
+        """col değeri values içinde olan satırlar."""
+        lookup = self.codes[col]
+        codes = [lookup[v] for v in values if v in lookup]
+        if not codes: return self.none()
+        return np.bitwise_or.reduce(self.bits[col][codes], axis=0)
+
+    def contains(self, col, term, case=False):
+        """
+        Değeri term'ü içeren satırlar; str.contains(term, case=case, regex=False) ile aynı.
+        Karşılaştırma sadece benzersiz değerlerde yapılır.
+        """
+        if case:
+            matches = [term in str(v) for v in self.values[col]]
+        else:
+            term = term.upper()  # pandas case=False ile aynı (upper ile karşılaştırır)
+            matches = [term in str(v).upper() for v in self.values[col]]
+        codes = np.flatnonzero(matches)
+        if len(codes) == 0: return self.none()
+        return np.bitwise_or.reduce(self.bits[col][codes], axis=0)
+
+    # --- BİRLEŞTİRME ---
+
+    def invert(self, bits):
+        """NOT (dolgu bitleri temiz kalır)."""
+        return ~bits & self._all
+
+    def andnot(self, bits, other):
+        return bits & ~other
+
+    # --- SONUÇ ---
+
+    def count(self, bits):
+        return _popcount(bits)
+
+    def mask(self, bits):
+        return np.unpackbits(bits.view(np.uint8), count=self.n, bitorder='little').view(bool)
+
+    def rows(self, bits):
+        return np.flatnonzero(self.mask(bits))
+
+    def value_counts(self, col, bits=None):
+        """
+        bits içindeki satırların col değer sayıları (her değer için popcount(bits & değer)),
+        çoktan aza sıralı; sıfır olanlar dahil edilmez.
+        """
+        matrix = self.bits[col] if bits is None else self.bits[col] & bits
+        if hasattr(np, 'bitwise_count'):
+            counts = np.bitwise_count(matrix).sum(axis=1, dtype=np.int64)
+        else:
+            counts = np.unpackbits(matrix.view(np.uint8), axis=1).sum(axis=1, dtype=np.int64)
+        order = np.argsort(-counts, kind='stable')
+        return {self.values[col][i]: int(counts[i]) for i in order if counts[i] > 0}
@@ -0,0 +1,322 @@
+"""
+Süreç genelinde tek katalog deposu.
+
+app.py, style_model ve combin_model aynı items_df nesnesini kullanır; modüllerin ihtiyaç
+duyduğu dönüştürülmüş sütunlar (küçük harf, boşluk doldurma, str id...) sadece değer
+gerçekten değişiyorsa ve bir kez türetilir. view() değişmeyen sütunları kopyalamadan paylaşır.
+
+Çok worker'lı sunucuda (gunicorn --preload) katalog fork'tan önce yüklenir ve freeze()
+çağrılır: gc.freeze() kalıcı nesneleri çöp toplayıcının taramasından çıkarır, böylece
+GC sayaç yazmaları paylaşılan bellek sayfalarını kopyalatmaz (copy-on-write).
+Havuzlar Python sözlük listeleri yerine satır indeks dizileri olarak tutulur.
+
+Çalışma anında ürün ekleme / kaldırma (catalog_updates.py) bu modüldeki append_rows,
+retire_rows ve compact üzerinden yapılır; on_change ile kayıt olan modüller (arama, kombin,
+app havuzları) her değişiklikte kendi indekslerini günceller. Kaldırılan ürünler sıkıştırmaya
+kadar ACTIVE maskesinde False olarak (tombstone) kalır, satır numaraları değişmez.
+
+Dinleyiciler birden fazla modül değişkenini yeniden kurduğu için değişiklikler okuyucu /
+yazıcı kilidiyle uygulanır: indeksleri okuyan istekler begin_read() / end_read() (veya
+reading()) arasında çalışır; bir değişiklik devam eden okumaların bitmesini bekler ve
+uygulanırken yeni okuma başlamaz. Böylece bir istek yarısı eski yarısı yeni indeks görmez.
+
+Kullanım (N worker ile paylaşımı ölçmek için):
+    python catalog.py --workers 4
+"""
+import os
+import gc
+import argparse
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from catalog_snapshot import load_table, csv_path, categorical
+from result_cache import artifact_version
+
+items_df = None
+VERSION = None
+DERIVED_COLUMNS = {}  # (sütun, anahtar) -> türetilmiş sütun
+
+# Çalışma anı değişiklikleri
+ACTIVE = None          # Satır kaldırılmamışsa True (tombstone maskesi)
+ORIGIN = None          # Satırın diskteki katalogdaki satır numarası, sonradan eklenenler için -1
+REVISION = 0           # Her değişiklikte artar (önbellek sürümleri için)
+COMPACTION = 0         # Her sıkıştırmada artar (satır numaraları yeniden sıralanır)
+JOURNAL_OFFSET = 0     # Değişiklik günlüğünün (catalog_updates) bu süreçte uygulanmış kısmı
+LISTENERS = {}         # ad -> callback(event)
+UPDATE_LOCK = threading.RLock()
+
+# Okuyucu / yazıcı kilidi (değişiklikler zaten UPDATE_LOCK altında, tek yazıcı)
+_READ_COND = threading.Condition()
+_READERS = 0
+_WRITING = False
+_LOCAL = threading.local()  # thread başına iç içe okuma derinliği
+
+def load_catalog(reload=False):
+    """Kataloğu (snapshot veya CSV'den) bir kez yükler ve paylaşılan DataFrame'i döndürür."""
+    global items_df, VERSION, ACTIVE, ORIGIN, REVISION, COMPACTION, JOURNAL_OFFSET
+    if items_df is not None and not reload: return items_df
+    items_df = load_table('items')
+    VERSION = artifact_version([csv_path('items')])
+    ACTIVE = np.ones(len(items_df), dtype=bool)
+    ORIGIN = np.arange(len(items_df), dtype=np.int64)
+    REVISION = 0
+    COMPACTION = 0
+    JOURNAL_OFFSET = 0
+    DERIVED_COLUMNS.clear()
+    return items_df
+
+def cache_version():
+    """Sonuç önbellekleri için katalog sürümü (dosya imzası + çalışma anı revizyonu)."""
+    return (VERSION, REVISION)
+
+def row_generation():
+    """Satır numaralarının geçerli olduğu dönem: dosya imzası + sıkıştırma sayısı (ekleme / kaldırma değiştirmez)."""
+    return (VERSION, COMPACTION)
+
+def active_mask():
+    """Kaldırılmış satır yoksa None, varsa aktif satır maskesi."""
+    if ACTIVE is None or ACTIVE.all(): return None
+    return ACTIVE
+
+def begin_read():
+    """İndeks okuması başlar; uygulanmakta olan bir değişiklik varsa bitmesini bekler."""
+    global _READERS
+    depth = getattr(_LOCAL, 'reads', 0)
+    _LOCAL.reads = depth + 1
+    if depth > 0: return
+    with _READ_COND:
+        while _WRITING: _READ_COND.wait()
+        _READERS += 1
+
+def end_read():
+    global _READERS
+    _LOCAL.reads -= 1
+    if _LOCAL.reads > 0: return
+    with _READ_COND:
+        _READERS -= 1
+        _READ_COND.notify_all()
+
+@contextmanager
+def reading():
+    """Bu blok boyunca katalog ve dinleyici indeksleri değişmez."""
+    begin_read()
+    try:
+        yield
+    finally:
+        end_read()
+
+@contextmanager
+def _writing():
+    """Devam eden okumaların bitmesini bekler; blok boyunca yeni okuma başlamaz."""
+    global _WRITING
+    if getattr(_LOCAL, 'reads', 0) > 0:
+        raise RuntimeError("Katalog, okuma bloğu içinden değiştirilemez")
+    with UPDATE_LOCK:
+        if _WRITING:  # İç içe değişiklik (aynı thread)
+            yield
+            return
+        with _READ_COND:
+            _WRITING = True
+            while _READERS: _READ_COND.wait()
+        try:
+            yield
+        finally:
+            with _READ_COND:
+                _WRITING = False
+                _READ_COND.notify_all()
+
+def on_change(name, callback):
+    """Katalog değiştiğinde callback(event) çağrılır. event['op']: 'add', 'retire' veya 'compact'."""
+    LISTENERS[name] = callback
+
+def _notify(event):
+    global REVISION
+    REVISION += 1
+    DERIVED_COLUMNS.clear()
+    for name, callback in list(LISTENERS.items()):
+        try:
+            callback(event)
+        except Exception as e:
+            print(f"❌ Katalog güncellemesi '{name}' indeksine uygulanamadı: {e}")
+
+def append_rows(new_rows):
+    """Yeni satırları kataloğun sonuna ekler; mevcut satır numaraları değişmez."""
+    global items_df, ACTIVE, ORIGIN
+    with _writing():
+        start = len(items_df)
+        new_rows = new_rows[items_df.columns]
+        combined = pd.concat([items_df, new_rows], ignore_index=True)
+        for col in items_df.columns:
+            if isinstance(items_df[col].dtype, pd.CategoricalDtype):
+                combined[col] = _append_categorical(items_df[col], new_rows[col])
+        items_df = combined
+        ACTIVE = np.concatenate([ACTIVE, np.ones(len(new_rows), dtype=bool)])
+        ORIGIN = np.concatenate([ORIGIN, np.full(len(new_rows), -1, dtype=np.int64)])
+        _notify({'op': 'add', 'start': start, 'count': len(new_rows)})
+
+def _append_categorical(series, new_values):
+    """Categorical sütunun sonuna değer ekler; yeni değerler kategorilerin sonuna eklenir, eski kodlar değişmez."""
+    categories = series.cat.categories
+    values = pd.Index(pd.unique(new_values.dropna().to_numpy()))
+    categories = categories.append(values[~values.isin(categories)])
+    codes = np.concatenate([series.array.codes, categories.get_indexer(new_values)])
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def retire_rows(rows):
+    """Satırları tombstone olarak işaretler (sıkıştırmaya kadar yerinde kalırlar)."""
+    global ACTIVE
+    with _writing():
+        ACTIVE = ACTIVE.copy()  # fork sonrası paylaşılan sayfaya yazmamak için
+        ACTIVE[rows] = False
+        _notify({'op': 'retire', 'rows': np.asarray(rows)})
+
+def compact():
+    """Kaldırılmış satırları fiziksel olarak siler; satır numaraları yeniden sıralanır."""
+    global items_df, ACTIVE, ORIGIN, COMPACTION
+    with _writing():
+        keep = ACTIVE
+        if keep.all(): return 0
+        removed = int((~keep).sum())
+        items_df = items_df[keep].reset_index(drop=True)
+        ORIGIN = ORIGIN[keep]
+        ACTIVE = np.ones(len(items_df), dtype=bool)
+        COMPACTION += 1
+        _notify({'op': 'compact', 'keep': keep})
+        return removed
+
+def derived_column(col, func, key):
+    """
+    func'ı sadece sütunun benzersiz değerlerine uygular (boş değerler için func(nan) çağrılır).
+    Hiçbir değer değişmiyorsa orijinal sütun döner, kopya oluşmaz. Categorical (snapshot)
+    sütunlarda sadece kategoriler dönüştürülür; kod dizisi mümkünse paylaşılır.
+    """
+    cache_key = (col, key)
+    if cache_key in DERIVED_COLUMNS: return DERIVED_COLUMNS[cache_key]
+
+    series = items_df[col]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        DERIVED_COLUMNS[cache_key] = _derived_categorical(series, func)
+        return DERIVED_COLUMNS[cache_key]
+    codes, uniques = pd.factorize(series)
+    uniques = list(uniques)
+    mapped = [func(v) for v in uniques]
+    has_missing = bool((codes < 0).any())
+    missing_value = func(np.nan) if has_missing else None
+
+    changed = has_missing or any(type(a) is not type(b) or a != b for a, b in zip(uniques, mapped))
+    if changed:
+        vocab = np.array(mapped + [missing_value], dtype=object)
+        series = pd.Series(vocab[codes], index=series.index, name=col)
+    DERIVED_COLUMNS[cache_key] = series
+    return series
+
+def _derived_categorical(series, func):
+    codes = series.array.codes
+    uniques = list(series.cat.categories)
+    mapped = [func(v) for v in uniques]
+    has_missing = bool((codes < 0).any())
+    if not has_missing and all(type(a) is type(b) and a == b for a, b in zip(uniques, mapped)):
+        return series
+    values = categorical(codes, mapped + [func(np.nan) if has_missing else np.nan])
+    return pd.Series(values, index=series.index, name=series.name)
+
+def text_column(col, missing='', lower=False):
+    """fillna(missing).astype(str)(.str.lower()) ile aynı sonuç, sözlük üzerinden."""
+    def convert(value):
+        text = missing if pd.isna(value) else str(value)
+        return text.lower() if lower else text
+    return derived_column(col, convert, ('text', missing, lower))
+
+def view(text_columns=(), missing='', lower=False, **columns):
+    """
+    Paylaşılan kataloğun sığ kopyası; sadece text_columns ve verilen sütunlar değiştirilir,
+    diğer sütunların verisi paylaşılır.
+    """
+    df = items_df.copy(deep=False)
+    for col in text_columns:
+        df[col] = text_column(col, missing, lower)
+    for col, values in columns.items():
+        df[col] = values
+    return df
+
+def freeze():
+    """Yükleme sonrası (fork'tan önce) kalıcı nesneleri GC taramasından çıkarır."""
+    gc.collect()
+    if hasattr(gc, 'freeze'): gc.freeze()
+
+def memory_usage():
+    """
+    Bu sürecin bellek kullanımı (MB). Linux'ta smaps_rollup'tan PSS ve paylaşılan/özel
+    ayrımı da okunur; PSS paylaşılan sayfaları süreç sayısına böler.
+    """
+    usage = {'pid': os.getpid()}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+        usage.update({
+            'rss_mb': round(fields.get('Rss', 0), 1),
+            'pss_mb': round(fields.get('Pss', 0), 1),
+            'shared_mb': round(fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0), 1),
+            'private_mb': round(fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0), 1)
+        })
+    except OSError:
+        import resource
+        usage['rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return usage
+
+def _worker(conn, queries):
+    """Fork edilmiş worker: tipik istekleri çalıştırıp bellek raporunu gönderir."""
+    import style_model
+    import combin_model
+    ids = combin_model.items_df['item_id'].to_numpy()
+    for i, query in enumerate(queries):
+        style_model.search_by_text(query, top_k=20)
+        combin_model.get_combin_recommendations(ids[i * 7919 % len(ids)])
+    conn.send(memory_usage())
+    conn.close()
+
+def worker_report(workers=4, requests=200):
+    """Modelleri yükler, fork eder ve her worker'ın RSS/PSS/paylaşılan/özel belleğini yazdırır."""
+    import multiprocessing as mp
+    import style_model
+    import combin_model
+
+    style_model.load_style_model()
+    combin_model.load_combin_model()
+    freeze()
+    parent = memory_usage()
+    print(f"Ana süreç (yükleme sonrası): {parent}")
+
+    ctx = mp.get_context('fork')
+    words = ['siyah elbise', 'mavi pantolon', 'beyaz gömlek', 'kırmızı etek', 'deri ceket', 'spor ayakkabı']
+    queries = [words[i % len(words)] for i in range(requests)]
+    reports = []
+    for _ in range(workers):
+        recv, send = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=_worker, args=(send, queries))
+        process.start()
+        reports.append((process, recv))
+
+    print(f"{'pid':>8} {'rss_mb':>8} {'pss_mb':>8} {'shared_mb':>10} {'private_mb':>11}")
+    total_pss = parent.get('pss_mb', 0)
+    for process, recv in reports:
+        usage = recv.recv()
+        process.join()
+        total_pss += usage.get('pss_mb', 0)
+        print(f"{usage['pid']:>8} {usage.get('rss_mb', 0):>8} {usage.get('pss_mb', 0):>8} "
+              f"{usage.get('shared_mb', 0):>10} {usage.get('private_mb', 0):>11}")
+    print(f"Toplam PSS ({workers} worker + ana süreç): {total_pss:.1f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fork edilmiş worker'ların katalog belleğini paylaşımını raporlar.")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help="Worker başına istek sayısı")
+    args = parser.parse_args()
+    worker_report(args.workers, args.requests)
@@ -0,0 +1,189 @@
+"""
+Katalog ve co-occurrence kurallarının ikili sütunsal anlık görüntüsü (snapshot).
+
+items_processed.csv ve outfit_cooccurrence_rules.csv her süreç başlangıcında metin olarak
+ayrıştırılmak yerine bir kez tipli .npy dosyalarına yazılır:
+    - Metin sütunları sözlük kodlanır: <sütun>.codes.npy (-1 = boş) + <sütun>.vocab.json
+    - Id sütunları uint32 (sığmazsa int64), diğer sayısal sütunlar kendi tipinde
+    - manifest.json kaynak CSV'lerin (mtime, boyut) imzasını tutar; CSV değişmişse
+      snapshot eski sayılır ve CSV'den okunur
+
+Okurken dosyalar bellek eşlemeli (mmap) açılır ve satırlara açılmaz: metin sütunları
+pandas Categorical (kod dizisi mmap'ten, sözlük kategoriler), id sütunları dar tipleriyle
+(uint32) DataFrame'e kopyasız konur. Aynı makinedeki worker'lar bu sayfaları işletim
+sisteminin sayfa önbelleğinden paylaşır. Küçük harfe çevirme / boşluk doldurma gibi işlemler
+sadece sözlük üzerinde (benzersiz değerler) yapılır; kodlar sadece iki değer aynı kategoriye
+düşerse (ör. 'Siyah' / 'siyah') veya boşlar doldurulursa yeniden yazılır.
+
+Kullanım:
+    python catalog_snapshot.py
+"""
+import os
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from result_cache import artifact_version
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(MODEL_DIR, 'data')
+SNAPSHOT_DIR = os.path.join(DATA_DIR, 'snapshot')
+
+TABLES = {
+    'items': {'csv': 'items_processed.csv', 'id_columns': ('item_id',)},
+    'rules': {'csv': 'outfit_cooccurrence_rules.csv', 'id_columns': ('antecedent', 'consequent')},
+}
+FORMAT_VERSION = 1
+
+def csv_path(name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, TABLES[name]['csv'])
+
+def _id_dtype(values):
+    if len(values) == 0 or (values.min() >= 0 and values.max() <= np.iinfo(np.uint32).max):
+        return np.uint32
+    return np.int64
+
+def _code_dtype(vocab_size):
+    for dtype in (np.int8, np.int16, np.int32):
+        if vocab_size < np.iinfo(dtype).max: return dtype
+    return np.int64
+
+# --- YAZMA ---
+
+def write_table(name, df, out_dir=SNAPSHOT_DIR, source=None):
+    """Bir DataFrame'i sütun sütun .npy dosyalarına yazar ve tablo bilgisini döndürür."""
+    table_dir = os.path.join(out_dir, name)
+    os.makedirs(table_dir, exist_ok=True)
+
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        if col in TABLES[name]['id_columns'] and pd.api.types.is_integer_dtype(series):
+            values = series.to_numpy()
+            np.save(os.path.join(table_dir, f"{col}.npy"), values.astype(_id_dtype(values)))
+            columns.append({'name': col, 'kind': 'id', 'dtype': str(series.dtype)})
+        elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            np.save(os.path.join(table_dir, f"{col}.npy"), series.to_numpy())
+            columns.append({'name': col, 'kind': 'numeric'})
+        else:
+            codes, vocab = pd.factorize(series)
+            np.save(os.path.join(table_dir, f"{col}.codes.npy"), codes.astype(_code_dtype(len(vocab))))
+            with open(os.path.join(table_dir, f"{col}.vocab.json"), 'w', encoding='utf-8') as f:
+                json.dump([str(v) for v in vocab], f, ensure_ascii=False)
+            columns.append({'name': col, 'kind': 'dict', 'size': len(vocab)})
+
+    return {'rows': len(df), 'columns': columns, 'source': source}
+
+def build_snapshot(data_dir=DATA_DIR, out_dir=SNAPSHOT_DIR):
+    """CSV'leri okuyup snapshot'ı yazar; manifest en son yazılır (yarım snapshot okunmaz)."""
+    start_time = time.time()
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    if os.path.exists(manifest_path): os.remove(manifest_path)
+
+    manifest = {'format': FORMAT_VERSION, 'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'tables': {}}
+    for name in TABLES:
+        path = csv_path(name, data_dir)
+        if not os.path.exists(path):
+            print(f"⚠️ {path} bulunamadı, '{name}' tablosu atlandı.")
+            continue
+        df = pd.read_csv(path)
+        manifest['tables'][name] = write_table(name, df, out_dir, source=artifact_version([path]))
+        print(f"   {name}: {len(df)} satır, {len(df.columns)} sütun")
+
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+    print(f"✅ Katalog snapshot'ı yazıldı: {out_dir} ({time.time() - start_time:.1f} sn)")
+    return manifest
+
+# --- OKUMA ---
+
+def read_manifest(out_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(out_dir, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        return manifest if manifest.get('format') == FORMAT_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+def snapshot_info(name, data_dir=DATA_DIR, out_dir=SNAPSHOT_DIR):
+    """Tablonun snapshot bilgisi; snapshot yoksa veya CSV ondan sonra değiştiyse None."""
+    manifest = read_manifest(out_dir)
+    if not manifest or name not in manifest['tables']: return None
+    info = manifest['tables'][name]
+    path = csv_path(name, data_dir)
+    # CSV hiç yoksa (sadece snapshot dağıtılmışsa) snapshot geçerli sayılır
+    if os.path.exists(path) and json.loads(json.dumps(artifact_version([path]))) != info['source']:
+        print(f"⚠️ '{name}' snapshot'ı eski (CSV değişmiş), CSV'den okunacak.")
+        return None
+    return info
+
+def categorical(codes, values):
+    """
+    Kod dizisi ve kod başına değerlerden (kod -1 -> values[-1]) Categorical kurar.
+    Değerler benzersizse ve values[-1] boşsa (NaN) kod dizisi kopyalanmadan kullanılır.
+    """
+    remap, categories = pd.factorize(pd.Series(values, dtype=object))
+    if remap[-1] != -1 or not np.array_equal(remap[:-1], np.arange(len(values) - 1)):
+        codes = remap.astype(_code_dtype(len(categories)))[codes]
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def _text_values(table_dir, col, missing, lower):
+    """Sözlük kodlu sütun (Categorical); boşluk doldurma ve küçük harf sadece sözlükte yapılır."""
+    codes = np.load(os.path.join(table_dir, f"{col}.codes.npy"), mmap_mode='r')
+    with open(os.path.join(table_dir, f"{col}.vocab.json"), encoding='utf-8') as f:
+        vocab = json.load(f)
+    vocab.append(missing)  # kod -1 -> son eleman
+    if lower: vocab = [v.lower() if isinstance(v, str) else v for v in vocab]
+    return categorical(codes, vocab)
+
+def read_snapshot(name, info, text_columns=(), missing=np.nan, lower=False, out_dir=SNAPSHOT_DIR):
+    table_dir = os.path.join(out_dir, name)
+    data = {}
+    for column in info['columns']:
+        col, kind = column['name'], column['kind']
+        if kind == 'dict':
+            fill = missing if col in text_columns else np.nan
+            data[col] = _text_values(table_dir, col, fill, lower and col in text_columns)
+        else:
+            # Id sütunları dar tipte (uint32) kalır
+            data[col] = np.load(os.path.join(table_dir, f"{col}.npy"), mmap_mode='r')
+    df = pd.DataFrame(data, copy=False)
+
+    # Sayısal tipte okunmuş metin sütunları (ör. tamamen boş) CSV yoluyla aynı şekilde çevrilir
+    dict_columns = {c['name'] for c in info['columns'] if c['kind'] == 'dict'}
+    for col in text_columns:
+        if col in df.columns and col not in dict_columns:
+            df[col] = _as_text(df[col], missing, lower)
+    return df
+
+def _as_text(series, missing, lower):
+    series = series.fillna(missing).astype(str)
+    return series.str.lower() if lower else series
+
+def load_table(name, text_columns=(), missing=np.nan, lower=False, data_dir=DATA_DIR, out_dir=SNAPSHOT_DIR):
+    """
+    Tabloyu snapshot'tan, yoksa CSV'den okur. İki yol da aynı DataFrame'i üretir.
+
+    Args:
+        text_columns: Boş değerleri `missing` ile doldurulup str yapılacak sütunlar
+        lower: True ise text_columns küçük harfe çevrilir
+    """
+    info = snapshot_info(name, data_dir, out_dir)
+    if info is not None:
+        try:
+            return read_snapshot(name, info, text_columns, missing, lower, out_dir)
+        except Exception as e:
+            print(f"⚠️ '{name}' snapshot'ı okunamadı ({e}), CSV'den okunacak.")
+
+    df = pd.read_csv(csv_path(name, data_dir))
+    for col in text_columns:
+        df[col] = _as_text(df[col], missing, lower)
+    return df
+
+if __name__ == "__main__":
+    build_snapshot()
@@ -0,0 +1,243 @@
+"""
+Çalışma anında katalog güncellemesi: ürün ekleme, kaldırma (tombstone) ve sıkıştırma.
+
+Yeni ürünler mevcut vectorizer ile dönüştürülüp TF-IDF matrisine eklenir (yeniden eğitim yok);
+arama, kombin ve havuz indeksleri catalog.on_change ile kendini günceller.
+
+Her değişiklik önce paylaşılan bir günlük dosyasına (catalog_journal.jsonl) yazılır, sonra
+sync() ile uygulanır. Böylece aynı makinedeki tüm worker süreçleri değişiklikleri aynı
+sırayla uygular ve yeniden başlatılan süreç günlüğü baştan oynatarak aynı duruma gelir.
+
+Kullanım (bakım, sunucular durdurulmuşken):
+    python catalog_updates.py --rewrite   # günlüğü CSV + TF-IDF dosyalarına yazar, günlüğü siler
+"""
+import os
+import json
+import time
+import argparse
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import catalog
+
+try:
+    import fcntl
+except ImportError:  # Windows: dosya kilidi yok, tek süreçli kullanım varsayılır
+    fcntl = None
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(MODEL_DIR, 'data')
+JOURNAL_PATH = os.path.join(DATA_DIR, 'catalog_journal.jsonl')
+
+REQUIRED_FIELDS = ('item_id', 'name', 'category', 'color', 'season', 'image')
+# Kaldırılan satırların oranı bunu aşınca bellekteki katalog sıkıştırılır
+COMPACT_RATIO = float(os.getenv('CATALOG_COMPACT_RATIO', '0.1'))
+# sync() en fazla bu sıklıkla günlük dosyasına bakar (maybe_sync)
+SYNC_INTERVAL = float(os.getenv('CATALOG_SYNC_INTERVAL', '1.0'))
+
+_last_sync = 0.0
+_lock_depth = 0  # journal_lock iç içe çağrılabilir; dosya kilidi sadece en dışta alınır
+
+class CatalogUpdateError(ValueError):
+    """Geçersiz ürün ekleme / kaldırma isteği."""
+    pass
+
+@contextmanager
+def journal_lock():
+    """Günlüğe yazma ve okuma sırasında süreçler arası kilit."""
+    global _lock_depth
+    with catalog.UPDATE_LOCK:
+        if fcntl is None or _lock_depth > 0:
+            _lock_depth += 1
+            try:
+                yield
+            finally:
+                _lock_depth -= 1
+            return
+        with open(JOURNAL_PATH + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _lock_depth += 1
+            try:
+                yield
+            finally:
+                _lock_depth -= 1
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def item_text(df):
+    """Eğitimdeki ile aynı arama metni (style_model __main__)."""
+    return (
+        df['name'].fillna('') + ' ' +
+        df['category'].fillna('') + ' ' +
+        df['color'].fillna('') + ' ' +
+        df['season'].fillna('')
+    ).str.lower()
+
+def coerce_ids(item_ids):
+    """Id'leri katalogdaki item_id tipine çevirir."""
+    dtype = catalog.items_df['item_id'].dtype
+    # Snapshot id'leri dar tipte (uint32) tutar; yeni id'ler int64 olarak doğrulanır
+    if pd.api.types.is_integer_dtype(dtype): dtype = np.int64
+    try:
+        return pd.Series(list(item_ids)).astype(dtype).to_numpy()
+    except (TypeError, ValueError):
+        raise CatalogUpdateError(f"item_id değerleri {dtype} tipine çevrilemedi")
+
+# --- GÜNLÜK ---
+
+def _append_journal(entry):
+    entry['at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    with open(JOURNAL_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+def _apply(entry):
+    if entry['op'] == 'add':
+        _apply_add(entry['items'])
+    elif entry['op'] == 'retire':
+        _apply_retire(entry['item_ids'])
+    if COMPACT_RATIO > 0 and (~catalog.ACTIVE).mean() > COMPACT_RATIO:
+        removed = catalog.compact()
+        print(f"🔄 Katalog sıkıştırıldı: {removed} kaldırılmış satır silindi.")
+
+def sync():
+    """Günlükte bu süreçte henüz uygulanmamış değişiklikleri uygular; uygulanan kayıt sayısını döner."""
+    global _last_sync
+    _last_sync = time.monotonic()
+    if catalog.items_df is None or not os.path.exists(JOURNAL_PATH): return 0
+
+    with journal_lock():
+        size = os.path.getsize(JOURNAL_PATH)
+        if size < catalog.JOURNAL_OFFSET:
+            print("⚠️ Katalog günlüğü sıfırlanmış (--rewrite); güncel katalog için süreci yeniden başlatın.")
+            catalog.JOURNAL_OFFSET = size
+            return 0
+        if size == catalog.JOURNAL_OFFSET: return 0
+
+        applied = 0
+        with open(JOURNAL_PATH, 'rb') as f:
+            f.seek(catalog.JOURNAL_OFFSET)
+            for line in f:
+                if not line.endswith(b'\n'): break  # yarım yazılmış satır
+                catalog.JOURNAL_OFFSET += len(line)
+                if line.strip():
+                    _apply(json.loads(line))
+                    applied += 1
+        return applied
+
+def maybe_sync():
+    """İstek başına çağrılabilir; günlüğe en fazla SYNC_INTERVAL saniyede bir bakar."""
+    if time.monotonic() - _last_sync >= SYNC_INTERVAL:
+        return sync()
+    return 0
+
+# --- EKLEME / KALDIRMA ---
+
+def _new_rows(items):
+    new_rows = pd.DataFrame(items)
+    for col in catalog.items_df.columns:
+        if col not in new_rows.columns: new_rows[col] = np.nan
+    new_rows['item_id'] = coerce_ids(new_rows['item_id'])
+    new_rows['text'] = item_text(new_rows)
+    return new_rows
+
+def _apply_add(items):
+    catalog.append_rows(_new_rows(items))
+
+def _apply_retire(item_ids):
+    ids = coerce_ids(item_ids)
+    rows = np.flatnonzero(catalog.items_df['item_id'].isin(ids).to_numpy() & catalog.ACTIVE)
+    if len(rows): catalog.retire_rows(rows)
+
+def add_items(items):
+    """
+    Ürünleri kataloğa ekler. Her ürün en az REQUIRED_FIELDS alanlarını içermelidir.
+    Katalogda zaten bulunan (kaldırılmış olsa bile, sıkıştırmadan önce) id'ler reddedilir.
+    """
+    if catalog.items_df is None: raise CatalogUpdateError("Katalog yüklü değil")
+    if not items: raise CatalogUpdateError("Eklenecek ürün yok")
+
+    records = []
+    for item in items:
+        missing = [f for f in REQUIRED_FIELDS if item.get(f) in (None, '')]
+        if missing: raise CatalogUpdateError(f"Eksik alan(lar): {', '.join(missing)}")
+        records.append({k: v for k, v in item.items() if k in catalog.items_df.columns})
+
+    start = time.perf_counter()
+    with journal_lock():
+        sync()  # Diğer süreçlerin değişiklikleri üzerinden doğrula
+        ids = coerce_ids([r['item_id'] for r in records])
+        if len(set(ids.tolist())) != len(ids): raise CatalogUpdateError("Aynı item_id birden fazla kez verildi")
+        existing = catalog.items_df['item_id'].isin(ids).to_numpy()
+        if existing.any():
+            duplicates = catalog.items_df['item_id'][existing].unique().tolist()[:10]
+            raise CatalogUpdateError(f"Katalogda zaten var: {duplicates}")
+
+        _append_journal({'op': 'add', 'items': [{**r, 'item_id': i} for r, i in zip(records, ids.tolist())]})
+        sync()
+    return {'added': len(records), 'rows': len(catalog.items_df), 'seconds': round(time.perf_counter() - start, 3)}
+
+def retire_items(item_ids):
+    """Ürünleri kaldırır (tombstone); bulunamayan id'ler 'not_found' ile döner."""
+    if catalog.items_df is None: raise CatalogUpdateError("Katalog yüklü değil")
+    if not item_ids: raise CatalogUpdateError("Kaldırılacak ürün yok")
+
+    start = time.perf_counter()
+    with journal_lock():
+        sync()
+        ids = coerce_ids(item_ids)
+        found = catalog.items_df['item_id'][catalog.ACTIVE].isin(ids)
+        found_ids = set(catalog.items_df['item_id'][catalog.ACTIVE][found].tolist())
+        not_found = [i for i in ids.tolist() if i not in found_ids]
+        if found_ids:
+            _append_journal({'op': 'retire', 'item_ids': sorted(found_ids)})
+            sync()
+    return {'retired': len(found_ids), 'not_found': not_found, 'seconds': round(time.perf_counter() - start, 3)}
+
+def compact_now():
+    """Kaldırılmış satırları eşik beklemeden bellekten siler (sadece bu süreçte)."""
+    with journal_lock():
+        sync()
+        return {'removed': catalog.compact(), 'rows': len(catalog.items_df)}
+
+def stats():
+    active = catalog.ACTIVE
+    return {
+        'rows': len(catalog.items_df) if catalog.items_df is not None else 0,
+        'active': int(active.sum()) if active is not None else 0,
+        'retired': int((~active).sum()) if active is not None else 0,
+        'added': int((catalog.ORIGIN < 0).sum()) if catalog.ORIGIN is not None else 0,
+        'revision': catalog.REVISION,
+        'journal_bytes': os.path.getsize(JOURNAL_PATH) if os.path.exists(JOURNAL_PATH) else 0,
+        'journal_applied': catalog.JOURNAL_OFFSET,
+        'compact_ratio': COMPACT_RATIO
+    }
+
+# --- BAKIM ---
+
+def rewrite():
+    """Günlüğü uygulayıp kataloğu ve TF-IDF matrisini diske yazar, günlüğü siler, snapshot'ı yeniler."""
+    import scipy.sparse
+    import style_model
+    from catalog_snapshot import build_snapshot, csv_path
+
+    style_model.load_style_model()
+    applied = sync()
+    removed = catalog.compact()
+    with journal_lock():
+        items_path = csv_path('items')
+        tmp_csv, tmp_npz = items_path + '.tmp', os.path.join(DATA_DIR, 'tfidf_matrix.tmp.npz')
+        catalog.items_df.to_csv(tmp_csv, index=False)
+        scipy.sparse.save_npz(tmp_npz, style_model.tfidf_matrix)
+        os.replace(tmp_csv, items_path)
+        os.replace(tmp_npz, os.path.join(DATA_DIR, 'tfidf_matrix.npz'))
+        if os.path.exists(JOURNAL_PATH): os.remove(JOURNAL_PATH)
+    print(f"✅ Katalog diske yazıldı: {len(catalog.items_df)} ürün ({applied} günlük kaydı, {removed} kaldırılan satır)")
+    if os.path.isdir(os.path.join(DATA_DIR, 'snapshot')): build_snapshot()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Katalog değişiklik günlüğü bakımı.")
+    parser.add_argument('--rewrite', action='store_true', help="Günlüğü kalıcı dosyalara yazıp sil")
+    args = parser.parse_args()
+    if args.rewrite: rewrite()
+    else: parser.print_help()
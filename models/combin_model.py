@@ -2,10 +2,49 @@ import pandas as pd
 import numpy as np
 import os
 import random
+from result_cache import ResultCache, artifact_version, cache_seed
+import combin_table
+import catalog
+from catalog_snapshot import load_table
+from bitset_index import BitsetIndex
 
 items_df = None
 rules_df = None
 
+# Co-occurrence komşuluk indeksi (CSR)
+# ID_TO_ROW: item_id -> items_df satır numarası
+# Bir satırın komşuları NEIGHBOR_ROWS[NEIGHBOR_OFFSETS[r]:NEIGHBOR_OFFSETS[r + 1]]
+# aralığındadır ve cooccurrence_count'a göre azalan sıradadır.
+ID_TO_ROW = {}
+ID_INDEX, ID_ROWS = None, None  # Toplu çözümleme için: ID_ROWS[ID_INDEX.get_indexer(ids)]
+NEIGHBOR_OFFSETS = None
+NEIGHBOR_ROWS = None
+NEIGHBOR_COUNTS = None
+
+# Fallback aday havuzları (yükleme anında bir kez hesaplanır)
+# POOL_INDEX: kategori / renk / sezon bitset indeksi (bitset_index)
+# CATEGORY_POOLS: hedef kategori -> kategorisi bu kelimeyi içeren satırların bitset'i
+# SEASON_POOLS: (hedef kategori, sezon, season_match) -> sezona uyan satırlar
+POOL_INDEX = None
+ACTIVE_BITS = None
+CATEGORY_POOLS = {}
+SEASON_POOLS = {}
+CATEGORY_CODES, CATEGORY_VOCAB = None, None
+CATEGORY_LOWER = None  # CATEGORY_VOCAB'ın küçük harfli hali
+CATEGORY_CODE = {}     # Kategori adı -> CATEGORY_VOCAB kodu
+TARGET_VOCAB = {}      # Hedef kategori -> CATEGORY_VOCAB'ta onu içeren (küçük harf) kategorilerin maskesi
+COLOR_CODES, COLOR_VOCAB = None, None
+SEASON_VALUES = None
+CANONICAL_ROW = None  # Her satır için aynı item_id'ye sahip ilk satır
+ITEM_COLUMNS = {}     # Öneri kayıtlarını pandas'a girmeden oluşturmak için sütun dizileri
+
+# Renk kodu -> renk kodu uyum puanı matrisi
+COLOR_INDEX = {}
+COLOR_MATRIX = None
+
+# get_combin_recommendations sonuç önbelleği (kurallar yeniden yüklenince boşaltılır)
+COMBIN_CACHE = ResultCache('get_combin_recommendations')
+
 MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(MODEL_DIR, 'data')
 
@@ -22,20 +61,201 @@ KNOWN_CATEGORIES = [
     "çizme", "çanta", "şort", "tulum", "yelek", "hırka"
 ]
 
-def load_combin_model():
+# Tamamlayıcı kategori eşleşmeleri
+COMPLEMENTARY = {
+    'pantolon': ['tişört', 'gömlek', 'kazak', 'bluz', 'ceket', 'mont', 'ayakkabı', 'çanta'],
+    'etek': ['tişört', 'gömlek', 'kazak', 'bluz', 'ceket', 'mont', 'ayakkabı', 'çizme', 'çanta'],
+    'şort': ['tişört', 'gömlek', 'bluz', 'ayakkabı', 'çanta'],
+    'tişört': ['pantolon', 'etek', 'şort', 'ayakkabı', 'ceket', 'gömlek', 'çanta'],
+    'gömlek': ['pantolon', 'etek', 'şort', 'ceket', 'ayakkabı', 'çanta'],
+    'kazak': ['pantolon', 'etek', 'mont', 'ayakkabı', 'çanta'],
+    'bluz': ['pantolon', 'etek', 'ceket', 'ayakkabı'],
+    'elbise': ['ayakkabı', 'çanta', 'ceket', 'mont', 'takı'],
+    'ayakkabı': ['pantolon', 'etek', 'elbise', 'şort', 'tişört', 'gömlek', 'çanta'],
+    'mont': ['pantolon', 'etek', 'elbise', 'tişört', 'kazak', 'ayakkabı', 'bot'],
+    'ceket': ['pantolon', 'etek', 'elbise', 'tişört', 'gömlek', 'ayakkabı'],
+    'çanta': ['elbise', 'pantolon', 'etek', 'tişört', 'ayakkabı', 'mont']
+}
+# Renk uyum tablosu
+COMPATIBILITY = {
+    'pembe': {'beyaz': 9, 'gri': 8, 'siyah': 7, 'mor': 8, 'kırmızı': 6, 'bej': 7, 'pembe': 10},
+    'siyah': {'beyaz': 10, 'gri': 9, 'kırmızı': 8, 'pembe': 7, 'mavi': 7, 'mor': 7, 'siyah': 10},
+    'beyaz': {'siyah': 10, 'gri': 9, 'mavi': 9, 'lacivert': 8, 'pembe': 9, 'kırmızı': 8, 'kahverengi': 7, 'bej': 9, 'mor': 9, 'beyaz': 10},
+    'mavi': {'beyaz': 9, 'gri': 8, 'lacivert': 9, 'siyah': 7, 'kahverengi': 6, 'mavi': 10},
+    'kırmızı': {'siyah': 8, 'beyaz': 8, 'pembe': 6, 'bordo': 7, 'gri': 6, 'kırmızı': 10},
+    'gri': {'siyah': 9, 'beyaz': 9, 'mavi': 8, 'pembe': 8, 'mor': 7, 'kırmızı': 6, 'lacivert': 7, 'gri': 10},
+    'kahverengi': {'bej': 9, 'turuncu': 7, 'yeşil': 7, 'beyaz': 7, 'mavi': 6, 'kahverengi': 10},
+    'yeşil': {'kahverengi': 7, 'siyah': 6, 'beyaz': 7, 'bej': 6, 'yeşil': 10},
+    'sarı': {'turuncu': 8, 'beyaz': 7, 'kahverengi': 6, 'sarı': 10},
+    'mor': {'siyah': 8, 'beyaz': 9, 'pembe': 8, 'gri': 7, 'mor': 10, 'lila': 9},
+    'lacivert': {'beyaz': 9, 'gri': 8, 'mavi': 9, 'siyah': 7, 'lacivert': 10},
+    'bej': {'kahverengi': 9, 'beyaz': 9, 'pembe': 7, 'yeşil': 6, 'bej': 10}
+}
+
+
+COOCCURRENCE_REASON = 'Birlikte Alınan'
+AGGREGATE_REASON = 'Listenle Uyumlu'
+RECORD_COLUMNS = ('item_id', 'name', 'category', 'color', 'season', 'image')
+
+DEFAULT_TARGET_CATEGORIES = ['pantolon', 'tişört', 'ayakkabı']
+
+FALLBACK_STRATEGIES = [
+    {'season_match': True, 'min_color': 6.0, 'score_boost': 20, 'reason': 'Mükemmel Uyum'},
+    {'season_match': True, 'min_color': 4.0, 'score_boost': 15, 'reason': 'Mevsim Uyumu'},
+    {'season_match': True, 'min_color': 0.0, 'score_boost': 10, 'reason': 'Sezon Önerisi'},
+    {'season_match': False, 'min_color': 0.0, 'score_boost': 5, 'reason': 'Alternatif'}
+]
+MIN_ITEMS_PER_CAT = 8
+# Öneri nedenleri; diziler nedeni bu listedeki indeksle taşır (combin_table ile aynı sıra)
+REASON_NAMES = np.array([COOCCURRENCE_REASON] + [s['reason'] for s in FALLBACK_STRATEGIES], dtype=object)
+# get_combin_recommendations_batch tek istekte en fazla bu kadar kaynak ürün
+MAX_BATCH_ITEMS = 50
+
+def model_files():
+    return [os.path.join(DATA_DIR, name) for name in ('items_processed.csv', 'outfit_cooccurrence_rules.csv')]
+
+def load_combin_model(reload=False):
     global items_df, rules_df
-    if items_df is not None: return
+    if items_df is not None and not reload: return
 
     try:
-        items_df = pd.read_csv(os.path.join(DATA_DIR, 'items_processed.csv'))
-        items_df['name'] = items_df['name'].astype(str)
-        items_df['category'] = items_df['category'].astype(str)
-        items_df['color'] = items_df['color'].astype(str)
-        rules_df = pd.read_csv(os.path.join(DATA_DIR, 'outfit_cooccurrence_rules.csv'))
+        # Paylaşılan kataloğun sığ kopyası (zaten str olan sütunlarda astype veri kopyalamaz)
+        catalog.load_catalog(reload)
+        items_df = catalog_view()
+        rules_df = load_table('rules')
+        build_indexes()
+        combin_table.open_table(items_df, artifact_version(model_files()), catalog.ORIGIN, catalog.active_mask())
+        catalog.on_change('combin_model', on_catalog_change)
         # Başarılı yükleme mesajını kapattık, app.py zaten genel bilgi veriyor
     except Exception as e:
         print(f"❌ Model Yükleme Hatası: {e}")
 
+def catalog_view():
+    # astype(str) ile aynı sonuç (boş -> 'nan'); değişmeyen sütunlar ve Categorical kodları paylaşılır
+    return catalog.view(text_columns=('name', 'category', 'color'), missing='nan')
+
+def build_indexes():
+    build_neighbor_index()
+    build_candidate_pools()
+    build_color_table()
+    COMBIN_CACHE.set_version((artifact_version(model_files()), catalog.REVISION))
+
+def on_catalog_change(event):
+    """Katalog değişince indeksler yeniden kurulur; kombin tablosu kapatılmaz, satır eşlemesi yenilenir."""
+    global items_df
+    items_df = catalog_view()
+    build_indexes()
+    combin_table.remap(catalog.ORIGIN, catalog.active_mask())
+
+def active_rows(mask):
+    """Maskeden kaldırılmamış satırların indeksleri."""
+    active = catalog.active_mask()
+    return np.flatnonzero(mask if active is None else mask & active)
+
+def build_neighbor_index():
+    """
+    rules_df'i simetrik bir CSR komşuluk indeksine çevirir.
+    Her kural (a, c) hem a'nın hem c'nin komşu listesine eklenir; böylece bir ürünün
+    kuralları tüm tabloyu taramadan, derecesiyle orantılı sürede okunur.
+    """
+    global ID_TO_ROW, ID_INDEX, ID_ROWS, NEIGHBOR_OFFSETS, NEIGHBOR_ROWS, NEIGHBOR_COUNTS
+
+    ids = items_df['item_id'].to_numpy()
+    candidates = active_rows(np.ones(len(ids), dtype=bool))  # Kaldırılan ürünler indekse girmez
+    first = ~pd.Index(ids[candidates]).duplicated()  # Aynı id birden fazlaysa ilk satır geçerli
+    first_rows = candidates[first]
+    id_index = pd.Index(ids[first_rows])
+    ID_TO_ROW = dict(zip(id_index.tolist(), first_rows.tolist()))
+    ID_INDEX, ID_ROWS = id_index, first_rows
+
+    ant = id_index.get_indexer(rules_df['antecedent'].to_numpy())
+    con = id_index.get_indexer(rules_df['consequent'].to_numpy())
+    counts = rules_df['cooccurrence_count'].to_numpy()
+
+    # Katalogda olmayan ürünlere ait kurallar zaten önerilemez
+    valid = (ant >= 0) & (con >= 0)
+    rule_order = np.flatnonzero(valid)
+    ant_rows = first_rows[ant[valid]]
+    con_rows = first_rows[con[valid]]
+    counts = counts[valid]
+
+    # Simetrik kenarlar; a == c olan kurallar tek kez eklenir
+    back = ant_rows != con_rows
+    src = np.concatenate([ant_rows, con_rows[back]])
+    dst = np.concatenate([con_rows, ant_rows[back]])
+    cnt = np.concatenate([counts, counts[back]])
+    order_key = np.concatenate([rule_order, rule_order[back]])
+
+    # Satıra göre grupla, grup içinde count azalan; eşitlikte dosyadaki kural sırası
+    order = np.lexsort((order_key, -cnt, src))
+    NEIGHBOR_ROWS = dst[order].astype(np.int32)
+    NEIGHBOR_COUNTS = cnt[order].astype(np.int32)
+    NEIGHBOR_OFFSETS = np.zeros(len(items_df) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(items_df)), out=NEIGHBOR_OFFSETS[1:])
+
+def get_neighbors(row):
+    """Bir satırın (komşu satırları, cooccurrence_count) dizilerini döndürür."""
+    start, end = NEIGHBOR_OFFSETS[row], NEIGHBOR_OFFSETS[row + 1]
+    return NEIGHBOR_ROWS[start:end], NEIGHBOR_COUNTS[start:end]
+
+def build_candidate_pools():
+    """
+    Fallback stratejilerinin ihtiyaç duyduğu aday havuzlarını indeks dizileri olarak hazırlar.
+    İstek anında 74k satırlık str.contains / sample(frac=1) / iterrows yerine
+    sadece ilgili havuz üzerinde dizi işlemleri yapılır.
+    """
+    global CATEGORY_POOLS, SEASON_POOLS, CATEGORY_CODES, CATEGORY_VOCAB, POOL_INDEX, ACTIVE_BITS
+    global COLOR_CODES, COLOR_VOCAB, SEASON_VALUES, CANONICAL_ROW, CATEGORY_LOWER, ITEM_COLUMNS
+    global CATEGORY_CODE, TARGET_VOCAB
+
+    CATEGORY_CODES, CATEGORY_VOCAB = pd.factorize(items_df['category'])
+    CATEGORY_LOWER = np.asarray(CATEGORY_VOCAB.str.lower())
+    CATEGORY_CODE = {c: i for i, c in enumerate(CATEGORY_VOCAB)}
+    COLOR_CODES, COLOR_VOCAB = pd.factorize(items_df['color'])
+    SEASON_VALUES = items_df['season'].to_numpy()
+    ITEM_COLUMNS = {col: items_df[col].to_numpy() for col in RECORD_COLUMNS}
+
+    ids = items_df['item_id'].to_numpy()
+    CANONICAL_ROW = np.array([ID_TO_ROW.get(i, -1) for i in ids.tolist()], dtype=np.int32)
+
+    terms = set(DEFAULT_TARGET_CATEGORIES)
+    for targets in COMPLEMENTARY.values(): terms.update(targets)
+    TARGET_VOCAB = {term: np.array([term in c for c in CATEGORY_LOWER], dtype=bool) for term in terms}
+
+    POOL_INDEX = BitsetIndex({col: items_df[col].to_numpy() for col in ('category', 'color', 'season')})
+    active = catalog.active_mask()
+    ACTIVE_BITS = POOL_INDEX.all() if active is None else POOL_INDEX.from_mask(active)
+    CATEGORY_POOLS = {term: category_bits(term) for term in terms}
+
+    SEASON_POOLS = {}
+    for season in pd.unique(SEASON_VALUES):
+        for term in terms:
+            for season_match in (True, False):
+                SEASON_POOLS[(term, season, season_match)] = _filter_pool(term, season, season_match)
+
+def candidate_pool(target_cat, season, season_match):
+    """Hedef kategori ve sezon uyumuna göre aday satır dizisi."""
+    pool = SEASON_POOLS.get((target_cat, season, season_match))
+    if pool is not None: return pool
+    # Katalogda olmayan bir sezon (enforce_season) istenirse anlık hesapla
+    return _filter_pool(target_cat, season, season_match)
+
+def category_bits(term):
+    """Kategorisi term'ü içeren (büyük/küçük harf duyarsız) aktif satırlar."""
+    return POOL_INDEX.contains('category', term) & ACTIVE_BITS
+
+def _filter_pool(target_cat, season, season_match):
+    bits = CATEGORY_POOLS.get(target_cat)
+    if bits is None: bits = category_bits(target_cat)
+
+    if season_match:
+        bits = bits & POOL_INDEX.isin('season', [season, 'dört mevsim'])
+    elif season == 'yaz':
+        bits = POOL_INDEX.andnot(bits, POOL_INDEX.eq('season', 'kış'))
+    elif season == 'kış':
+        bits = POOL_INDEX.andnot(bits, POOL_INDEX.eq('season', 'yaz'))
+    return POOL_INDEX.rows(bits)
+
 def search_products(query_text):
     global items_df
     if items_df is None: return pd.DataFrame()
@@ -52,148 +272,304 @@ def search_products(query_text):
         elif word in KNOWN_CATEGORIES: detected_category = word
         else: other_keywords.append(word)
 
-    filtered_df = items_df.copy()
-    if detected_category:
-        filtered_df = filtered_df[filtered_df['category'].str.contains(detected_category, case=False, na=False)]
-    if detected_color:
-        filtered_df = filtered_df[filtered_df['color'].str.contains(detected_color, case=False, na=False)]
+    bits = ACTIVE_BITS
+    if detected_category: bits = bits & POOL_INDEX.contains('category', detected_category)
+    if detected_color: bits = bits & POOL_INDEX.contains('color', detected_color)
+    filtered_df = items_df.iloc[POOL_INDEX.rows(bits)]
     if other_keywords:
         keyword_search = " ".join(other_keywords)
         filtered_df = filtered_df[filtered_df['name'].str.contains(keyword_search, case=False, na=False)]
 
     return filtered_df
 
-def color_compatibility_score(color1, color2):
+def _pair_color_score(color1, color2):
     if str(color1) == str(color2): return 10.0
     if color1 == 'karışık' or color2 == 'karışık': return 7.0
     
-    COMPATIBILITY = {
-        'pembe': {'beyaz': 9, 'gri': 8, 'siyah': 7, 'mor': 8, 'kırmızı': 6, 'bej': 7, 'pembe': 10},
-        'siyah': {'beyaz': 10, 'gri': 9, 'kırmızı': 8, 'pembe': 7, 'mavi': 7, 'mor': 7, 'siyah': 10},
-        'beyaz': {'siyah': 10, 'gri': 9, 'mavi': 9, 'lacivert': 8, 'pembe': 9, 'kırmızı': 8, 'kahverengi': 7, 'bej': 9, 'mor': 9, 'beyaz': 10},
-        'mavi': {'beyaz': 9, 'gri': 8, 'lacivert': 9, 'siyah': 7, 'kahverengi': 6, 'mavi': 10},
-        'kırmızı': {'siyah': 8, 'beyaz': 8, 'pembe': 6, 'bordo': 7, 'gri': 6, 'kırmızı': 10},
-        'gri': {'siyah': 9, 'beyaz': 9, 'mavi': 8, 'pembe': 8, 'mor': 7, 'kırmızı': 6, 'lacivert': 7, 'gri': 10},
-        'kahverengi': {'bej': 9, 'turuncu': 7, 'yeşil': 7, 'beyaz': 7, 'mavi': 6, 'kahverengi': 10},
-        'yeşil': {'kahverengi': 7, 'siyah': 6, 'beyaz': 7, 'bej': 6, 'yeşil': 10},
-        'sarı': {'turuncu': 8, 'beyaz': 7, 'kahverengi': 6, 'sarı': 10},
-        'mor': {'siyah': 8, 'beyaz': 9, 'pembe': 8, 'gri': 7, 'mor': 10, 'lila': 9},
-        'lacivert': {'beyaz': 9, 'gri': 8, 'mavi': 9, 'siyah': 7, 'lacivert': 10},
-        'bej': {'kahverengi': 9, 'beyaz': 9, 'pembe': 7, 'yeşil': 6, 'bej': 10}
-    }
-    
     c1, c2 = str(color1).lower(), str(color2).lower()
     if c1 in COMPATIBILITY and c2 in COMPATIBILITY[c1]: return float(COMPATIBILITY[c1][c2])
     if c2 in COMPATIBILITY and c1 in COMPATIBILITY[c2]: return float(COMPATIBILITY[c2][c1])
     return 3.0
 
+def build_color_table():
+    """
+    Katalogdaki her renk çifti için uyum puanını önceden hesaplar.
+    COLOR_MATRIX[kaynak_kod, aday_kod] tek bir indeksleme ile bütün bir aday dizisini puanlar.
+    Tablo birkaç çiftte (siyah/mor, beyaz/lacivert, gri/lacivert) simetrik değil,
+    bu yüzden matris (kaynak, aday) yönünü korur.
+    """
+    global COLOR_MATRIX, COLOR_INDEX
+    COLOR_INDEX = {c: i for i, c in enumerate(COLOR_VOCAB)}
+    COLOR_MATRIX = np.array([[_pair_color_score(c1, c2) for c2 in COLOR_VOCAB] for c1 in COLOR_VOCAB])
+
+def color_compatibility_score(color1, color2):
+    i, j = COLOR_INDEX.get(color1), COLOR_INDEX.get(color2)
+    if i is not None and j is not None: return float(COLOR_MATRIX[i, j])
+    return _pair_color_score(color1, color2)
+
+def item_records(rows, scores, reason):
+    """
+    Satırlar için öneri sözlükleri (item_id, name, category, color, season, image, score, reason).
+    reason tek bir metin veya satır başına neden dizisi olabilir.
+    """
+    columns = [ITEM_COLUMNS[col][rows].tolist() for col in RECORD_COLUMNS]
+    reasons = reason.tolist() if isinstance(reason, np.ndarray) else [reason] * len(rows)
+    return [
+        {**dict(zip(RECORD_COLUMNS, values)), 'score': score, 'reason': reason}
+        for *values, score, reason in zip(*columns, scores.tolist(), reasons)
+    ]
+
 def get_combin_recommendations(item_id, top_k=8, enforce_season=None, source_category=None):
+    """
+    Varsayılan parametrelerle gelen istekler önce önceden hesaplanmış kombin tablosundan
+    (combin_table) okunur; tabloda olmayanlar canlı hesaplanıp COMBIN_CACHE'te tutulur.
+    Fallback adımındaki rastgele seçim önbellek anahtarından türetilen tohumla yapılır;
+    aynı giriş her zaman aynı öneri listesini verir.
+    """
     global items_df, rules_df
     if items_df is None or rules_df is None: return pd.DataFrame()
     
     try:
-        source_item = items_df[items_df['item_id'] == item_id]
-        if len(source_item) == 0: return pd.DataFrame()
-        
-        source_item = source_item.iloc[0]
-        source_cat = str(source_category or source_item['category']).lower()
-        source_season = enforce_season or source_item['season']
-        source_color = source_item['color']
+        if isinstance(item_id, np.generic): item_id = item_id.item()
+        if enforce_season is None and source_category is None:
+            source_row = ID_TO_ROW.get(item_id)
+            if source_row is not None:
+                materialized = combin_table.lookup(source_row, items_df)
+                if materialized is not None: return materialized
         
-        # Gereksiz detay logu kaldırıldı
-
-        COMPLEMENTARY = {
-            'pantolon': ['tişört', 'gömlek', 'kazak', 'bluz', 'ceket', 'mont', 'ayakkabı', 'çanta'],
-            'etek': ['tişört', 'gömlek', 'kazak', 'bluz', 'ceket', 'mont', 'ayakkabı', 'çizme', 'çanta'],
-            'şort': ['tişört', 'gömlek', 'bluz', 'ayakkabı', 'çanta'],
-            'tişört': ['pantolon', 'etek', 'şort', 'ayakkabı', 'ceket', 'gömlek', 'çanta'],
-            'gömlek': ['pantolon', 'etek', 'şort', 'ceket', 'ayakkabı', 'çanta'],
-            'kazak': ['pantolon', 'etek', 'mont', 'ayakkabı', 'çanta'],
-            'bluz': ['pantolon', 'etek', 'ceket', 'ayakkabı'],
-            'elbise': ['ayakkabı', 'çanta', 'ceket', 'mont', 'takı'],
-            'ayakkabı': ['pantolon', 'etek', 'elbise', 'şort', 'tişört', 'gömlek', 'çanta'],
-            'mont': ['pantolon', 'etek', 'elbise', 'tişört', 'kazak', 'ayakkabı', 'bot'],
-            'ceket': ['pantolon', 'etek', 'elbise', 'tişört', 'gömlek', 'ayakkabı'],
-            'çanta': ['elbise', 'pantolon', 'etek', 'tişört', 'ayakkabı', 'mont']
-        }
-        
-        target_categories = COMPLEMENTARY.get(source_cat, [])
-        if not target_categories: target_categories = ['pantolon', 'tişört', 'ayakkabı']
+        key = (item_id, enforce_season, source_category)
+        return COMBIN_CACHE.get_or_compute(
+            key, lambda: compute_combin_recommendations(item_id, enforce_season, source_category))
+    except Exception as e:
+        print(f"❌ Kombin Hatası: {e}")
+        return pd.DataFrame()
+
+def compute_combin_recommendations(item_id, enforce_season=None, source_category=None):
+    """Önbellek ve tablo kullanmadan hesaplar (combin_table ön hesaplaması bunu çağırır)."""
+    if isinstance(item_id, np.generic): item_id = item_id.item()
+    rng = np.random.default_rng(cache_seed((item_id, enforce_season, source_category)))
+    return _compute_combin_recommendations(item_id, enforce_season, source_category, rng)
+
+def _compute_combin_recommendations(item_id, enforce_season, source_category, rng):
+    source_row = ID_TO_ROW.get(item_id)
+    if source_row is None: return pd.DataFrame()
+    rows, scores, codes = _rank_recommendations(*score_sources([(source_row, enforce_season, source_category, rng)])[0])
+    if len(rows) == 0: return pd.DataFrame()
+    return recommendation_frame(rows, scores, codes)
+
+def recommendation_frame(rows, scores, codes):
+    """Öneri dizilerinden get_combin_recommendations DataFrame'i."""
+    columns = {col: ITEM_COLUMNS[col][rows].tolist() for col in RECORD_COLUMNS}
+    return pd.DataFrame({**columns, 'score': scores.tolist(), 'reason': REASON_NAMES[codes].tolist()})
+
+def _rank_recommendations(rows, scores, codes):
+    """Skora göre azalan (eşitlikte ekleme sırası) sıralar ve skorları 0-10 aralığına ölçekler."""
+    order = np.argsort(-scores, kind='stable')
+    rows, scores, codes = rows[order], scores[order], codes[order]
+    if len(scores):
+        max_s = scores[0]
+        scores = scores / max_s * 10 if max_s > 0 else np.full(len(scores), 5.0)
+    return rows, scores, codes
+
+def _gather_neighbors(source_rows):
+    """Kaynak satırların komşu listelerini tek seferde toplar: (kaynak sırası, komşu satırları, sayılar)."""
+    starts = NEIGHBOR_OFFSETS[source_rows]
+    lengths = NEIGHBOR_OFFSETS[source_rows + 1] - starts
+    owner = np.repeat(np.arange(len(source_rows)), lengths)
+    positions = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return owner, NEIGHBOR_ROWS[positions], NEIGHBOR_COUNTS[positions]
+
+def score_sources(sources):
+    """
+    Birden fazla kaynak ürünün önerilerini birlikte puanlar (sıralama / ölçekleme yapılmaz).
+    Komşu listeleri tek seferde toplanıp hepsi birlikte filtrelenir ve puanlanır; fallback
+    havuzlarının dizileri aynı (kategori, sezon) isteyen kaynaklar arasında paylaşılır.
+
+    Args:
+        sources: (kaynak satır, enforce_season, source_category, rng) listesi
+    Returns:
+        Her kaynak için (satırlar, ham skorlar, REASON_NAMES kodları)
+    """
+    source_rows = np.array([source[0] for source in sources], dtype=np.int64)
+    source_cats = [str(cat).lower() if cat else CATEGORY_LOWER[CATEGORY_CODES[row]]
+                   for row, _, cat, _ in sources]
+    source_seasons = np.array([season or SEASON_VALUES[row] for row, season, _, _ in sources], dtype=object)
+    source_colors = COLOR_CODES[source_rows]
+
+    # 1. CO-OCCURRENCE (tüm kaynaklar birlikte)
+    owner, neighbor_rows, neighbor_counts = _gather_neighbors(source_rows)
+    keep = CATEGORY_LOWER[CATEGORY_CODES[neighbor_rows]] != np.array(source_cats, dtype=object)[owner]
+    neighbor_seasons, owner_seasons = SEASON_VALUES[neighbor_rows], source_seasons[owner]
+    keep &= ~((owner_seasons == 'yaz') & (neighbor_seasons == 'kış'))
+    keep &= ~((owner_seasons == 'kış') & (neighbor_seasons == 'yaz'))
+    owner, neighbor_rows, neighbor_counts = owner[keep], neighbor_rows[keep], neighbor_counts[keep]
+    neighbor_scores = (np.minimum(10, neighbor_counts / 5) * 5) + (COLOR_MATRIX[source_colors[owner], COLOR_CODES[neighbor_rows]] * 2)
+    bounds = np.searchsorted(owner, np.arange(len(sources) + 1))
+
+    # 2. FALLBACK STRATEGIES (kaynak başına kendi rng'si ile; havuz dizileri paylaşılır)
+    pools = {}
+    def pool_arrays(target_cat, season, season_match):
+        key = (target_cat, season, season_match)
+        if key not in pools:
+            pool = candidate_pool(target_cat, season, season_match)
+            pools[key] = (pool, COLOR_CODES[pool], CATEGORY_CODES[pool], CANONICAL_ROW[pool])
+        return pools[key]
+
+    results = []
+    taken = np.zeros(len(CANONICAL_ROW), dtype=bool)  # Kaynağa önerilmiş ürünler (kanonik satır), kaynaklar arasında sıfırlanır
+    for i, (source_row, _, _, rng) in enumerate(sources):
+        source_cat, source_season = source_cats[i], source_seasons[i]
+        target_categories = COMPLEMENTARY.get(source_cat, []) or DEFAULT_TARGET_CATEGORIES
+        color_scores = COLOR_MATRIX[source_colors[i]]
+        source_cat_code = CATEGORY_CODE.get(source_cat, -1)
+
+        rows = [neighbor_rows[bounds[i]:bounds[i + 1]]]
+        scores = [neighbor_scores[bounds[i]:bounds[i + 1]]]
+        codes = [np.zeros(len(rows[0]), dtype=np.uint8)]
+        taken_rows = [CANONICAL_ROW[rows[0]]]
+        taken[taken_rows[0]] = True
 
-        scored_recommendations = []
-        
-        # 1. CO-OCCURRENCE
-        product_rules = rules_df[(rules_df['antecedent'] == item_id) | (rules_df['consequent'] == item_id)].copy()
-        if len(product_rules) > 0:
-            product_rules = product_rules.sort_values('cooccurrence_count', ascending=False)
-            for _, rule in product_rules.iterrows():
-                related_id = rule['consequent'] if rule['antecedent'] == item_id else rule['antecedent']
-                related = items_df[items_df['item_id'] == related_id]
-                if len(related) > 0:
-                    item = related.iloc[0]
-                    if str(item['category']).lower() == source_cat: continue
-                    if (source_season == 'yaz' and item['season'] == 'kış') or \
-                       (source_season == 'kış' and item['season'] == 'yaz'): continue
-
-                    c_score = color_compatibility_score(source_color, item['color'])
-                    score = (min(10, rule['cooccurrence_count']/5) * 5) + (c_score * 2)
-                    scored_recommendations.append({
-                        'item_id': item['item_id'], 'name': item['name'], 'category': item['category'], 
-                        'color': item['color'], 'season': item['season'], 'image': item['image'],
-                        'score': score, 'reason': 'Birlikte Alınan'
-                    })
-
-        # 2. FALLBACK STRATEGIES
-        MIN_ITEMS_PER_CAT = 8
         for target_cat in target_categories:
-            current_count = sum(1 for r in scored_recommendations if target_cat in str(r['category']).lower())
+            vocab_mask = TARGET_VOCAB.get(target_cat)
+            if vocab_mask is None: vocab_mask = np.array([target_cat in c for c in CATEGORY_LOWER], dtype=bool)
+            current_count = sum(int(vocab_mask[CATEGORY_CODES[r]].sum()) for r in rows)
             if current_count >= MIN_ITEMS_PER_CAT: continue
             needed = MIN_ITEMS_PER_CAT - current_count
-            
-            strategies = [
-                {'season_match': True, 'min_color': 6.0, 'score_boost': 20, 'reason': 'Mükemmel Uyum'},
-                {'season_match': True, 'min_color': 4.0, 'score_boost': 15, 'reason': 'Mevsim Uyumu'},
-                {'season_match': True, 'min_color': 0.0, 'score_boost': 10, 'reason': 'Sezon Önerisi'},
-                {'season_match': False, 'min_color': 0.0, 'score_boost': 5, 'reason': 'Alternatif'}
-            ]
-            
-            for strategy in strategies:
+
+            for code, strategy in enumerate(FALLBACK_STRATEGIES, 1):
                 if needed <= 0: break
-                candidates = items_df[(items_df['category'].str.contains(target_cat, case=False, na=False)) & (items_df['category'] != source_cat)]
-                if strategy['season_match']:
-                    candidates = candidates[(candidates['season'] == source_season) | (candidates['season'] == 'dört mevsim')]
-                else:
-                    if source_season == 'yaz': candidates = candidates[candidates['season'] != 'kış']
-                    elif source_season == 'kış': candidates = candidates[candidates['season'] != 'yaz']
-                
-                if len(candidates) > 0: candidates = candidates.sample(frac=1).reset_index(drop=True)
-                
-                for _, item in candidates.iterrows():
-                    if needed <= 0: break
-                    if any(r['item_id'] == item['item_id'] for r in scored_recommendations): continue
-                    c_score = color_compatibility_score(source_color, item['color'])
-                    if c_score < strategy['min_color']: continue
-                    
-                    final_score = c_score * 2 + strategy['score_boost']
-                    scored_recommendations.append({
-                        'item_id': item['item_id'], 'name': item['name'], 'category': item['category'], 
-                        'color': item['color'], 'season': item['season'], 'image': item['image'],
-                        'score': final_score, 'reason': strategy['reason']
-                    })
-                    needed -= 1
-                    current_count += 1
-
-        scored_recommendations = sorted(scored_recommendations, key=lambda x: x['score'], reverse=True)
-        if scored_recommendations:
-            max_s = max(r['score'] for r in scored_recommendations)
-            for r in scored_recommendations:
-                r['score'] = (r['score'] / max_s * 10) if max_s > 0 else 5.0
-
-        return pd.DataFrame(scored_recommendations)
+                pool, pool_colors, pool_cats, pool_canonical = pool_arrays(target_cat, source_season, strategy['season_match'])
+                if len(pool) == 0: continue
 
-    except Exception as e:
-        print(f"❌ Kombin Hatası: {e}")
-        return pd.DataFrame()
+                pool_scores = color_scores[pool_colors]
+                eligible = np.flatnonzero((pool_cats != source_cat_code) & (pool_scores >= strategy['min_color'])
+                                          & ~taken[pool_canonical])
+                if len(eligible) == 0: continue
+
+                # Tüm havuzu karıştırmadan sadece gereken kadar rastgele seç
+                picks = eligible[rng.choice(len(eligible), size=min(needed, len(eligible)), replace=False)]
+                rows.append(pool[picks])
+                scores.append(pool_scores[picks] * 2 + strategy['score_boost'])
+                codes.append(np.full(len(picks), code, dtype=np.uint8))
+                taken_rows.append(pool_canonical[picks])
+                taken[taken_rows[-1]] = True
+                needed -= len(picks)
+
+        for taken_part in taken_rows: taken[taken_part] = False
+        results.append((np.concatenate(rows), np.concatenate(scores).astype(np.float64), np.concatenate(codes)))
+    return results
+
+# --- TOPLU ÖNERİ (sepet / gardırop) ---
+
+def resolve_rows(item_ids):
+    """item_id listesini tek bir indeks aramasıyla satırlara çevirir; bulunamayanlar -1."""
+    if len(item_ids) == 0: return np.array([], dtype=np.int64)
+    positions = ID_INDEX.get_indexer(list(item_ids))
+    return np.where(positions >= 0, ID_ROWS[np.maximum(positions, 0)], -1)
+
+def _batch_arrays(item_id, row, enforce_season, source_category):
+    """Tek kaynağın sıralı öneri dizileri: önce kombin tablosu, sonra önbellek; yoksa None."""
+    if enforce_season is None and source_category is None:
+        materialized = combin_table.arrays(row)
+        if materialized is not None: return materialized
+    found, arrays = COMBIN_CACHE.get(('arrays', item_id, enforce_season, source_category))
+    return arrays if found else None
+
+def get_combin_recommendations_batch(item_ids, top_k=8, enforce_season=None, source_category=None,
+                                     exclude_sources=True, aggregate=False, records=True):
+    """
+    Birden fazla ürün (sepet, gardırop) için kombin önerileri.
+    Kaynaklar tek bir indeks aramasıyla çözülür; tabloda / önbellekte olmayanlar score_sources
+    ile birlikte hesaplanır. Kaynak başına sıralama get_combin_recommendations ile aynıdır.
+
+    Args:
+        exclude_sources: True ise listedeki ürünler birbirine önerilmez
+        aggregate: True ise ayrıca listenin çoğuna uyan ürünlerin ortak sıralaması döner
+        records: False ise öneriler sözlük listesi yerine (satırlar, skorlar, nedenler) dizileri
+                 olarak döner (hazır ürün kartlarıyla yanıt kurmak için); 'aggregated' ayrıca
+                 eşleşme sayılarını içerir: (satırlar, skorlar, nedenler, eşleşmeler)
+    Returns:
+        {'results': [{'item_id', 'found', 'recommendations': [...]}, ...], 'aggregated': [...] veya None}
+        Bir ürün birden fazla kaynağa önerilirse sadece en yüksek skorlu kaynağın listesinde kalır.
+    """
+    if items_df is None or rules_df is None: return {'results': [], 'aggregated': None}
+    item_ids = [i.item() if isinstance(i, np.generic) else i for i in item_ids][:MAX_BATCH_ITEMS]
+    source_rows = resolve_rows(item_ids)
+
+    # Aynı ürün birden fazla kez verilirse bir kez hesaplanır
+    unique = {}
+    for item_id, row in zip(item_ids, source_rows.tolist()):
+        if row >= 0 and item_id not in unique: unique[item_id] = row
+
+    arrays, missing = {}, []
+    for item_id, row in unique.items():
+        cached = _batch_arrays(item_id, row, enforce_season, source_category)
+        if cached is not None: arrays[item_id] = cached
+        else: missing.append(item_id)
+
+    if missing:
+        sources = [(unique[item_id], enforce_season, source_category,
+                    np.random.default_rng(cache_seed((item_id, enforce_season, source_category))))
+                   for item_id in missing]
+        for item_id, result in zip(missing, score_sources(sources)):
+            arrays[item_id] = _rank_recommendations(*result)
+            COMBIN_CACHE.put(('arrays', item_id, enforce_season, source_category), arrays[item_id])
+
+    return _merge_batch(item_ids, unique, arrays, top_k, exclude_sources, aggregate, records)
+
+def _empty_rows():
+    return np.array([], dtype=np.int64), np.array([], dtype=np.float64), np.array([], dtype=object)
+
+def _merge_batch(item_ids, unique, arrays, top_k, exclude_sources, aggregate, records=True):
+    """Kaynak listelerini birleştirir: çapraz tekilleştirme ve isteğe bağlı ortak sıralama."""
+    order = list(unique)
+    empty = [] if records else _empty_rows()
+    if not order:
+        results = [{'item_id': item_id, 'found': False, 'recommendations': empty} for item_id in item_ids]
+        aggregated = None
+        if aggregate: aggregated = [] if records else (*_empty_rows(), np.array([], dtype=np.int64))
+        return {'results': results, 'aggregated': aggregated}
+
+    parts = [arrays[item_id] for item_id in order]
+    owner = np.concatenate([np.full(len(p[0]), i) for i, p in enumerate(parts)])
+    rows, scores, codes = (np.concatenate([p[k] for p in parts]) for k in range(3))
+    canonical = CANONICAL_ROW[rows]
+
+    valid = np.ones(len(rows), dtype=bool)
+    if exclude_sources: valid &= ~np.isin(canonical, list(unique.values()))
+
+    # Her ürün sadece en yüksek skorlu kaynağında kalır (eşitlikte listede önce gelen kaynak)
+    candidates = np.flatnonzero(valid)
+    best = candidates[np.lexsort((owner[candidates], -scores[candidates], canonical[candidates]))]
+    first = np.ones(len(best), dtype=bool)
+    first[1:] = canonical[best][1:] != canonical[best][:-1]
+    keep = np.zeros(len(rows), dtype=bool)
+    keep[best[first]] = True
+
+    per_source = {}
+    for i, item_id in enumerate(order):
+        selected = np.flatnonzero(keep & (owner == i))[:top_k]
+        found = (rows[selected], scores[selected], REASON_NAMES[codes[selected]])
+        per_source[item_id] = item_records(*found) if records else found
+
+    results = [{'item_id': item_id, 'found': item_id in per_source, 'recommendations': per_source.get(item_id, empty)}
+               for item_id in item_ids]
+
+    aggregated = None
+    if aggregate:
+        # Listenin çoğuna uyan ürünler: kaynak başına skorların toplamı / kaynak sayısı
+        candidates = np.flatnonzero(valid)
+        candidate_codes, uniques = pd.factorize(canonical[candidates])
+        total = np.bincount(candidate_codes, weights=scores[candidates], minlength=len(uniques)) / len(order)
+        matches = np.bincount(candidate_codes, minlength=len(uniques))
+        ranked = np.lexsort((-matches, -total))[:top_k]
+        if not records:
+            reasons = np.full(len(ranked), AGGREGATE_REASON, dtype=object)
+            return {'results': results, 'aggregated': (uniques[ranked], total[ranked], reasons, matches[ranked])}
+        aggregated = item_records(uniques[ranked], total[ranked], AGGREGATE_REASON)
+        for record, count in zip(aggregated, matches[ranked].tolist()):
+            record['matches'] = count
+    return {'results': results, 'aggregated': aggregated}
 
 if __name__ == "__main__":
     load_combin_model()
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""
+Kombin önerilerinin önceden hesaplanmış (materialized) tablosu.
+
+Co-occurrence kuralları sadece yeniden eğitimde değiştiği için her ürünün önerileri
+bir kez hesaplanıp sabit genişlikli bir ikili dosyaya yazılır. Sunucu bu dosyayı
+mmap ile açar; bir ürünün önerileri satır numarasıyla O(1) okunur ve dosya tüm
+worker süreçleri arasında işletim sisteminin sayfa önbelleği üzerinden paylaşılır.
+
+Dosya düzeni (tüm diziler little-endian, 64 byte hizalı):
+    MAGIC (8 byte) | başlık uzunluğu (uint32) | JSON başlık
+    item_ids   int64   [n]        kaynak ürün id'leri (katalog satır sırası)
+    counts     int32   [n]        geçerli öneri sayısı, -1 = tabloda yok
+    rows       int32   [n * k]    önerilen ürünlerin katalog satırları
+    scores     float64 [n * k]    normalize skorlar (canlı hesaplamayla aynı hassasiyet)
+    reason_codes uint8 [n * k]    başlıktaki 'reasons' listesindeki indeks
+
+Kullanım:
+    python combin_table.py --k 128 --workers 8
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(MODEL_DIR, 'data')
+TABLE_PATH = os.path.join(DATA_DIR, 'combin_table.bin')
+
+MAGIC = b'CMBTBL02'  # 01: float32 skorlu eski biçim
+ALIGN = 64
+DEFAULT_K = 128
+CHUNK_SIZE = 512
+
+# Açık tablo (load_combin_model tarafından açılır)
+TABLE = None
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+def _layout(n, k, header_end):
+    """Her dizinin (dtype, shape, offset) bilgisi."""
+    layout = {}
+    offset = _align(header_end)
+    for name, dtype, shape in (('item_ids', np.int64, (n,)), ('counts', np.int32, (n,)),
+                               ('rows', np.int32, (n, k)), ('scores', np.float64, (n, k)),
+                               ('reason_codes', np.uint8, (n, k))):
+        layout[name] = (np.dtype(dtype).newbyteorder('<'), shape, offset)
+        offset = _align(offset + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    return layout, offset
+
+def _write_header(path, header):
+    payload = json.dumps(header).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint32(len(payload)).astype('<u4').tobytes())
+        f.write(payload)
+    return len(MAGIC) + 4 + len(payload)
+
+def _read_header(path):
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            if magic.startswith(MAGIC[:6]):
+                raise ValueError("Kombin tablosu eski biçimde, yeniden oluşturulmalı (python combin_table.py)")
+            raise ValueError("Geçersiz kombin tablosu dosyası")
+        length = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+        header = json.loads(f.read(length).decode('utf-8'))
+    return header, len(MAGIC) + 4 + length
+
+def _map_arrays(path, header, header_end, mode):
+    layout, _ = _layout(header['n'], header['k'], header_end)
+    return {name: np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=shape)
+            for name, (dtype, shape, offset) in layout.items()}
+
+# --- OKUMA ---
+
+def open_table(items_df, model_version, origin=None, active=None, path=TABLE_PATH):
+    """
+    Tabloyu mmap ile açar. Dosya yoksa, katalog değiştiyse veya kurallar tablodan sonra
+    güncellendiyse None döner ve öneriler canlı hesaplanır.
+
+    origin / active: catalog.ORIGIN ve catalog.ACTIVE; verilirse tablo diskteki katalog
+    satırlarına göre eşlenir, çalışma anında eklenen / kaldırılan ürünler tabloyu geçersiz kılmaz.
+    """
+    global TABLE
+    TABLE = None
+    if not os.path.exists(path): return None
+
+    try:
+        header, header_end = _read_header(path)
+        if header.get('model_version') != json.loads(json.dumps(model_version)):
+            print("⚠️ Kombin tablosu eski (kurallar değişmiş), canlı hesaplama kullanılacak.")
+            return None
+        arrays = _map_arrays(path, header, header_end, mode='r')
+        if origin is None: origin = np.arange(len(items_df), dtype=np.int64)
+        known = np.flatnonzero(origin >= 0)
+        if (len(known) and origin[known].max() >= header['n']) or not np.array_equal(
+                arrays['item_ids'][origin[known]], items_df['item_id'].to_numpy()[known]):
+            print("⚠️ Kombin tablosu katalogla eşleşmiyor, canlı hesaplama kullanılacak.")
+            return None
+        table = {'header': header, 'reason_names': np.array(header['reasons'], dtype=object), **arrays}
+        TABLE = _with_rows(table, origin, active)
+    except Exception as e:
+        print(f"⚠️ Kombin tablosu açılamadı: {e}")
+        TABLE = None
+    return TABLE
+
+def _with_rows(table, origin, active):
+    """
+    Tablonun satır eşlemeli kopyası:
+        source_rows: katalog satırı -> tablo satırı (sonradan eklenen ürünler -1)
+        catalog_rows: tablo satırı -> katalog satırı (kaldırılan / sıkıştırılan ürünler -1)
+    """
+    known = np.flatnonzero(origin >= 0)
+    if active is not None: known = known[active[known]]
+    catalog_rows = np.full(table['header']['n'], -1, dtype=np.int32)
+    catalog_rows[origin[known]] = known
+    return {**table, 'source_rows': np.where(origin >= 0, origin, -1).astype(np.int32), 'catalog_rows': catalog_rows}
+
+def remap(origin, active):
+    """
+    Katalog değişikliğinden sonra satır eşlemesini yeniler. Tablo kapatılmaz: yeni ürünler
+    tabloda olmadığı için canlı hesaplanır, kaldırılanlar önerilerden çıkarılır,
+    sıkıştırma sonrası satır numaraları ORIGIN üzerinden eşlenir. Tek atama ile değiştirilir.
+    """
+    global TABLE
+    table = TABLE
+    if table is not None: TABLE = _with_rows(table, origin, active)
+
+def arrays(row):
+    """
+    Katalog satırının önceden hesaplanmış (satırlar, skorlar, neden kodları) dizileri;
+    satırlar güncel katalog satırlarıdır. Tablo yoksa veya satır tabloda değilse None.
+    """
+    table = TABLE
+    if table is None or row >= len(table['source_rows']): return None
+    source = table['source_rows'][row]
+    if source < 0: return None
+    count = int(table['counts'][source])
+    if count < 0: return None
+
+    rows = table['catalog_rows'][np.asarray(table['rows'][source, :count])]
+    keep = rows >= 0  # Kaldırılan ürünler atlanır
+    return (rows[keep].astype(np.int64),
+            np.asarray(table['scores'][source, :count])[keep],
+            np.asarray(table['reason_codes'][source, :count], dtype=np.uint8)[keep])
+
+def lookup(row, items_df):
+    """
+    Satırın önceden hesaplanmış önerilerini get_combin_recommendations ile aynı biçimde döndürür.
+    Tablo yoksa veya satır tabloda değilse None döner.
+    """
+    table = TABLE
+    found = arrays(row)
+    if found is None: return None
+
+    rows, scores, codes = found
+    result = items_df.iloc[rows][['item_id', 'name', 'category', 'color', 'season', 'image']].reset_index(drop=True)
+    result['score'] = scores
+    result['reason'] = table['reason_names'][codes]
+    return result
+
+# --- YAZMA (toplu ön hesaplama) ---
+
+def _init_worker():
+    import combin_model
+    combin_model.load_combin_model()
+
+def _compute_chunk(args):
+    """Bir satır aralığı için önerileri hesaplar (worker sürecinde çalışır)."""
+    rows, k, reasons = args
+    import combin_model as cm
+
+    reason_index = {r: i for i, r in enumerate(reasons)}
+    counts = np.full(len(rows), -1, dtype=np.int32)
+    out_rows = np.zeros((len(rows), k), dtype=np.int32)
+    out_scores = np.zeros((len(rows), k), dtype=np.float64)
+    out_codes = np.zeros((len(rows), k), dtype=np.uint8)
+
+    item_ids = cm.items_df['item_id'].to_numpy()
+    for i, row in enumerate(rows):
+        result = cm.compute_combin_recommendations(item_ids[row])
+        if result.empty:
+            counts[i] = 0
+            continue
+        result = result.head(k)
+        counts[i] = len(result)
+        out_rows[i, :len(result)] = [cm.ID_TO_ROW[x] for x in result['item_id'].tolist()]
+        out_scores[i, :len(result)] = result['score'].to_numpy()
+        out_codes[i, :len(result)] = [reason_index[x] for x in result['reason'].tolist()]
+    return int(rows[0]), counts, out_rows, out_scores, out_codes
+
+def build_table(path=TABLE_PATH, k=DEFAULT_K, workers=None):
+    """Tüm katalog için get_combin_recommendations sonuçlarını süreç havuzuyla hesaplayıp yazar."""
+    import combin_model as cm
+    from result_cache import artifact_version
+
+    start_time = time.time()
+    cm.load_combin_model()
+    if cm.items_df is None:
+        print("❌ Katalog yüklenemedi, tablo oluşturulmadı.")
+        return False
+
+    n = len(cm.items_df)
+    reasons = [cm.COOCCURRENCE_REASON] + [s['reason'] for s in cm.FALLBACK_STRATEGIES]
+    header = {
+        'n': n, 'k': k, 'reasons': reasons,
+        'model_version': artifact_version(cm.model_files()),
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+    tmp_path = path + '.tmp'
+    header_end = _write_header(tmp_path, header)
+    _, total_size = _layout(n, k, header_end)
+    with open(tmp_path, 'r+b') as f:
+        f.truncate(total_size)
+    arrays = _map_arrays(tmp_path, header, header_end, mode='r+')
+    arrays['item_ids'][:] = cm.items_df['item_id'].to_numpy()
+    arrays['counts'][:] = -1
+
+    chunks = [(np.arange(s, min(s + CHUNK_SIZE, n)), k, reasons) for s in range(0, n, CHUNK_SIZE)]
+    print(f"🔄 {n} ürün için kombin tablosu hesaplanıyor ({workers or os.cpu_count()} süreç)...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for done, (start, counts, rows, scores, codes) in enumerate(executor.map(_compute_chunk, chunks), 1):
+            end = start + len(counts)
+            arrays['counts'][start:end] = counts
+            arrays['rows'][start:end] = rows
+            arrays['scores'][start:end] = scores
+            arrays['reason_codes'][start:end] = codes
+            if done % 20 == 0 or done == len(chunks):
+                print(f"   {end}/{n} ürün tamamlandı")
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+    os.replace(tmp_path, path)
+
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"✅ Kombin tablosu yazıldı: {path} ({size_mb:.1f} MB, {time.time() - start_time:.1f} sn)")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kombin önerilerini önceden hesaplayıp ikili tabloya yazar.")
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help="Ürün başına saklanacak en fazla öneri")
+    parser.add_argument('--workers', type=int, default=None, help="Süreç sayısı (varsayılan: tüm çekirdekler)")
+    parser.add_argument('--output', default=TABLE_PATH)
+    args = parser.parse_args()
+    build_table(path=args.output, k=args.k, workers=args.workers)
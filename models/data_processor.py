@@ -1,13 +1,59 @@
 # models/data_processor.py
 
 import json
-import pandas as pd
 import os
+import shutil
+import tempfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
 
 # Proje ana dizininden veri setine giden yol
 BASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)))
 DATA_PATH = os.path.join(BASE_PATH, 'dataset', 'raw')
 PROCESSED_PATH = os.path.join(BASE_PATH, 'dataset', 'processed')
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'outfit_cooccurrence_rules.csv')
+
+# Kural madenciliği ayarları
+SHARD_OUTFITS = 20000   # Bir worker'a tek seferde gönderilen kombin sayısı
+PARTITIONS = 16         # Çift sayaçları diske bu kadar parçaya bölünerek yazılır (birleştirme belleği ~ 1/PARTITIONS)
+READ_CHUNK = 1 << 20    # JSON dosyası bu boyutta parçalarla okunur
+
+def iter_outfits(path, chunk_size=READ_CHUNK):
+    """
+    Kombinleri dosyanın tamamını belleğe almadan tek tek döndürür.
+    Hem tek bir JSON listesi ([{...}, {...}]) hem de satır başına bir JSON (jsonl) desteklenir.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, pos, eof = '', 0, False
+        started = False
+        while True:
+            # Boşluk, virgül ve liste başlangıcını atla
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ',' or (buffer[pos] == '[' and not started)):
+                started = started or buffer[pos] == '['
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']': return
+            if pos >= len(buffer) and not eof:
+                more = f.read(chunk_size)
+                eof = not more
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            if pos >= len(buffer): return
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof: raise
+                # Nesne parçanın sonunda kesilmiş; bir parça daha oku
+                more = f.read(chunk_size)
+                eof = not more
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield obj
+            pos = end
+            if pos > chunk_size: buffer, pos = buffer[pos:], 0
 
 def load_polyvore_data(outfit_filename='train.json', item_filename='polyvore_item_metadata.json'):
     """
@@ -22,17 +68,10 @@ def load_polyvore_data(outfit_filename='train.json', item_filename='polyvore_ite
     outfit_file = os.path.join(DATA_PATH, outfit_filename)
     item_file = os.path.join(DATA_PATH, item_filename)
     
-    # 1. Outfit (Kombin) Verilerini Yükleme
-    try:
-        with open(outfit_file, 'r') as f:
-            outfits_data = json.load(f)
-    except FileNotFoundError:
+    # 1. Outfit (Kombin) dosyası akış halinde okunur (iter_outfits)
+    if not os.path.exists(outfit_file):
         print(f"Hata: Outfit dosyası bulunamadı. Lütfen '{outfit_filename}' dosyasını 'dataset/raw' klasörüne koyun.")
         return None
-    except json.JSONDecodeError:
-        print(f"Hata: Outfit dosyası JSON formatında değil veya bozuk.")
-        print("Lütfen dosyanın içeriğini kontrol edin veya satır satır JSON okuma (jsonlines) gerekip gerekmediğine bakın.")
-        return None
         
     # 2. Ürün ID - İsim/Kategori Eşleşmesini Yükleme (Item Mapping)
     try:
@@ -42,32 +81,34 @@ def load_polyvore_data(outfit_filename='train.json', item_filename='polyvore_ite
         print(f"Hata: Item mapping dosyası bulunamadı. Lütfen '{item_filename}' dosyasını 'dataset/raw' klasörüne koyun.")
         item_mapping = {}
         
-    print(f"Yüklenen Toplam Kombin Sayısı: {len(outfits_data)}")
-    
     # 3. Kombinleri İşleme: Kombin ID'si ve İçindeki Ürün ID'lerini ayırma
-    processed_list = []
+    # (satır başına sözlük yerine sütun listeleri)
+    outfit_ids, item_ids, item_names = [], [], []
+    outfit_count = 0
     
-    for outfit in outfits_data:
-        outfit_id = outfit.get('set_id') # Güvenli okuma
-        if not outfit_id:
-            continue
-
-        for item_info in outfit.get('items', []):
-            item_id = item_info.get('item_id')
-            if not item_id:
+    try:
+        for outfit in iter_outfits(outfit_file):
+            outfit_id = outfit.get('set_id') # Güvenli okuma
+            if not outfit_id:
                 continue
-            
-            # Metadata dosyasından ürün kategorisini çekme
-            item_data = item_mapping.get(item_id, {})
-            item_name = item_data.get('category_name', item_data.get('title', 'Bilinmeyen Ürün'))
-            
-            processed_list.append({
-                'outfit_id': outfit_id,
-                'item_id': item_id,
-                'item_name': item_name 
-            })
-            
-    df_combinations = pd.DataFrame(processed_list)
+            outfit_count += 1
+
+            for item_info in outfit.get('items', []):
+                item_id = item_info.get('item_id')
+                if not item_id:
+                    continue
+                
+                # Metadata dosyasından ürün kategorisini çekme
+                item_data = item_mapping.get(item_id, {})
+                outfit_ids.append(outfit_id)
+                item_ids.append(item_id)
+                item_names.append(item_data.get('category_name', item_data.get('title', 'Bilinmeyen Ürün')))
+    except json.JSONDecodeError:
+        print(f"Hata: Outfit dosyası JSON formatında değil veya bozuk.")
+        return None
+    
+    print(f"Yüklenen Toplam Kombin Sayısı: {outfit_count}")
+    df_combinations = pd.DataFrame({'outfit_id': outfit_ids, 'item_id': item_ids, 'item_name': item_names})
     
     # İşlenmiş veriyi kaydetme
     os.makedirs(PROCESSED_PATH, exist_ok=True)
@@ -80,5 +121,144 @@ def load_polyvore_data(outfit_filename='train.json', item_filename='polyvore_ite
     
     return df_combinations
 
+# --- CO-OCCURRENCE KURAL MADENCİLİĞİ ---
+
+def _partition_of(keys, partitions):
+    return ((keys ^ (keys >> np.uint64(32))) % np.uint64(partitions)).astype(np.int64)
+
+def _count_shard(codes, offsets, partitions):
+    """
+    Worker: bir parça kombindeki ürün çiftlerini sayar.
+    Çift (a < b) tek bir uint64 anahtarda tutulur: a << 32 | b.
+    Sonuç parçalara (partition) bölünmüş (anahtarlar, sayılar) listesidir.
+    """
+    keys = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        items = np.unique(codes[start:end])  # Aynı ürün bir kombinde iki kez sayılmaz
+        if len(items) < 2: continue
+        i, j = np.triu_indices(len(items), 1)
+        keys.append((items[i].astype(np.uint64) << np.uint64(32)) | items[j].astype(np.uint64))
+    if not keys: return []
+
+    keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+    part = _partition_of(keys, partitions)
+    order = np.argsort(part, kind='stable')
+    bounds = np.searchsorted(part[order], np.arange(partitions + 1))
+    return [(p, keys[order[bounds[p]:bounds[p + 1]]], counts[order[bounds[p]:bounds[p + 1]]].astype(np.uint32))
+            for p in range(partitions) if bounds[p + 1] > bounds[p]]
+
+def _iter_shards(outfit_file, item_codes, shard_outfits):
+    """Kombinleri ürün kodu dizilerine (CSR: codes + offsets) çevirip parça parça döndürür."""
+    codes, offsets = [], [0]
+    for outfit in iter_outfits(outfit_file):
+        if not outfit.get('set_id'): continue
+        for item_info in outfit.get('items', []):
+            item_id = item_info.get('item_id')
+            if not item_id: continue
+            code = item_codes.get(item_id)
+            if code is None:
+                code = item_codes[item_id] = len(item_codes)
+            codes.append(code)
+        offsets.append(len(codes))
+        if len(offsets) > shard_outfits:
+            yield np.array(codes, dtype=np.uint32), np.array(offsets, dtype=np.int64)
+            codes, offsets = [], [0]
+    if len(offsets) > 1:
+        yield np.array(codes, dtype=np.uint32), np.array(offsets, dtype=np.int64)
+
+def _spill(spill_dir, shard_result):
+    for p, keys, counts in shard_result:
+        with open(os.path.join(spill_dir, f"part_{p}.keys"), 'ab') as f: keys.tofile(f)
+        with open(os.path.join(spill_dir, f"part_{p}.counts"), 'ab') as f: counts.tofile(f)
+
+def _decode_ids(vocab):
+    """Polyvore id'leri sayısal metinse katalogdaki gibi int64'e çevrilir."""
+    try:
+        return np.array([int(v) for v in vocab], dtype=np.int64)
+    except (TypeError, ValueError):
+        return np.array(vocab, dtype=object)
+
+def mine_cooccurrence_rules(outfit_filename='train.json', output_path=RULES_PATH, workers=None,
+                            shard_outfits=SHARD_OUTFITS, partitions=PARTITIONS, min_count=1):
+    """
+    Kombinlerden outfit_cooccurrence_rules.csv'yi (antecedent, consequent, cooccurrence_count, support)
+    üretir. Dosya akış halinde okunur; kombinler parçalar halinde process havuzunda sayılır,
+    parça sonuçları anahtar aralığına göre diske yazılır ve her aralık ayrı birleştirilir.
+    Bellek kullanımı toplam çift sayısıyla değil, bir parça / bir aralık boyutuyla sınırlıdır.
+
+    support = cooccurrence_count / toplam kombin sayısı
+    """
+    outfit_file = outfit_filename if os.path.isabs(outfit_filename) else os.path.join(DATA_PATH, outfit_filename)
+    if not os.path.exists(outfit_file):
+        print(f"Hata: Outfit dosyası bulunamadı: {outfit_file}")
+        return None
+
+    workers = workers or os.cpu_count() or 1
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+    spill_dir = tempfile.mkdtemp(prefix='rules_', dir=output_dir)
+    item_codes = {}
+    outfit_count = 0
+
+    try:
+        # 1. Sayma: en fazla 2 * workers parça aynı anda bellekte
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for codes, offsets in _iter_shards(outfit_file, item_codes, shard_outfits):
+                outfit_count += len(offsets) - 1
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done: _spill(spill_dir, future.result())
+                pending.add(pool.submit(_count_shard, codes, offsets, partitions))
+            for future in pending: _spill(spill_dir, future.result())
+        print(f"🔄 {outfit_count} kombin, {len(item_codes)} ürün sayıldı; parçalar birleştiriliyor...")
+
+        # 2. Birleştirme: her anahtar aralığı ayrı okunur ve toplanır
+        vocab = _decode_ids(list(item_codes))
+        tmp_path = output_path + '.tmp'
+        rule_count = 0
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as out:
+            out.write('antecedent,consequent,cooccurrence_count,support\n')
+            for p in range(partitions):
+                keys_path = os.path.join(spill_dir, f"part_{p}.keys")
+                if not os.path.exists(keys_path): continue
+                keys = np.fromfile(keys_path, dtype=np.uint64)
+                counts = np.fromfile(os.path.join(spill_dir, f"part_{p}.counts"), dtype=np.uint32)
+                keys, inverse = np.unique(keys, return_inverse=True)
+                totals = np.bincount(inverse, weights=counts).astype(np.int64)
+                keep = totals >= min_count
+                keys, totals = keys[keep], totals[keep]
+
+                order = np.lexsort((keys, -totals))  # Önce en sık görülen çiftler
+                keys, totals = keys[order], totals[order]
+                pd.DataFrame({
+                    'antecedent': vocab[(keys >> np.uint64(32)).astype(np.int64)],
+                    'consequent': vocab[(keys & np.uint64(0xFFFFFFFF)).astype(np.int64)],
+                    'cooccurrence_count': totals,
+                    'support': totals / max(outfit_count, 1)
+                }).to_csv(out, header=False, index=False)
+                rule_count += len(keys)
+        os.replace(tmp_path, output_path)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    print(f"✅ {rule_count} kural '{output_path}' dosyasına yazıldı.")
+    print("   İkili kopya için: python catalog_snapshot.py")
+    return rule_count
+
 if __name__ == '__main__':
-    df = load_polyvore_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Polyvore verisini işler veya co-occurrence kurallarını üretir.")
+    parser.add_argument('--rules', action='store_true', help="outfit_cooccurrence_rules.csv'yi yeniden üret")
+    parser.add_argument('--outfits', default='train.json', help="Kombin dosyası (dataset/raw altında veya tam yol)")
+    parser.add_argument('--output', default=RULES_PATH)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shard-outfits', type=int, default=SHARD_OUTFITS)
+    parser.add_argument('--partitions', type=int, default=PARTITIONS)
+    parser.add_argument('--min-count', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.rules:
+        mine_cooccurrence_rules(args.outfits, args.output, args.workers, args.shard_outfits,
+                                args.partitions, args.min_count)
+    else:
+        df = load_polyvore_data(args.outfits)
\ No newline at end of file
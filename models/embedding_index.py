@@ -0,0 +1,234 @@
+"""
+Yoğun (dense) vektör arama indeksi.
+
+Ürün vektörleri bir sağlayıcıdan (provider) üretilir ve float16 .npy olarak diske yazılır;
+çalışma anında mmap ile açılır. Sayfalar işletim sistemi önbelleğinde tüm worker'lar
+arasında paylaşılır, seyrek TF-IDF matrisi her worker'a kopyalanmaz.
+
+Sağlayıcılar:
+    - lsa: TF-IDF matrisinin TruncatedSVD izdüşümü (çevrimdışı çalışır, ek bağımlılık yok)
+    - st:  Yerel bir sentence-transformers modeli (paket ve model varsa)
+
+Puanlama BLOCK_ROWS satırlık bloklar halinde yapılır: her blok float32'ye çevrilip tek bir
+matris çarpımıyla (BLAS) puanlanır, böylece float16 matrisin tamamı hiçbir zaman float32 kopyaya açılmaz.
+
+Kullanım:
+    python embedding_index.py --provider lsa --dim 256
+    python embedding_index.py --provider st --model /yol/model
+"""
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+import catalog
+from result_cache import artifact_version
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(MODEL_DIR, 'data')
+EMBEDDINGS_PATH = os.path.join(DATA_DIR, 'embeddings.npy')
+HEADER_PATH = os.path.join(DATA_DIR, 'embeddings.json')
+LSA_COMPONENTS_PATH = os.path.join(DATA_DIR, 'lsa_components.npy')
+
+BLOCK_ROWS = 16384
+DEFAULT_DIM = 256
+
+# Açık indeks (open_index)
+INDEX = None
+
+def model_files():
+    import style_model
+    return style_model.model_files()
+
+# --- SAĞLAYICILAR ---
+
+class LsaProvider:
+    """TF-IDF uzayından SVD bileşenlerine izdüşüm."""
+    name = 'lsa'
+
+    def __init__(self, vectorizer, components):
+        self.vectorizer = vectorizer
+        self.components_t = np.ascontiguousarray(components.T, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, vectorizer, tfidf_matrix, dim=DEFAULT_DIM, seed=42):
+        from sklearn.decomposition import TruncatedSVD
+        dim = min(dim, tfidf_matrix.shape[1] - 1)
+        svd = TruncatedSVD(n_components=dim, algorithm='randomized', random_state=seed)
+        svd.fit(tfidf_matrix)
+        return cls(vectorizer, svd.components_)
+
+    @classmethod
+    def load(cls, header):
+        import style_model
+        return cls(style_model.load_vectorizer(), np.load(LSA_COMPONENTS_PATH))
+
+    def save(self):
+        np.save(LSA_COMPONENTS_PATH, self.components_t.T)
+
+    def embed_rows(self, tfidf_rows):
+        return _normalize(np.asarray(tfidf_rows @ self.components_t, dtype=np.float32))
+
+    def embed_texts(self, texts):
+        return self.embed_rows(self.vectorizer.transform([str(t).lower() for t in texts]))
+
+class SentenceTransformerProvider:
+    """Yerel sentence-transformers modeli (ör. paraphrase-multilingual-MiniLM-L12-v2 klasörü)."""
+    name = 'st'
+
+    def __init__(self, model_path):
+        from sentence_transformers import SentenceTransformer
+        self.model_path = model_path
+        self.model = SentenceTransformer(model_path, device='cpu')
+
+    @classmethod
+    def load(cls, header):
+        return cls(header['model'])
+
+    def save(self):
+        pass
+
+    def embed_texts(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=256, normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+PROVIDERS = {'lsa': LsaProvider, 'st': SentenceTransformerProvider}
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+# --- OLUŞTURMA ---
+
+def build_index(provider='lsa', dim=DEFAULT_DIM, model=None, block_rows=BLOCK_ROWS):
+    """Katalogdaki tüm ürünlerin vektörlerini float16 olarak EMBEDDINGS_PATH'e yazar."""
+    import style_model
+    start_time = time.time()
+    style_model.load_style_model()
+    items_df, tfidf_matrix = style_model.items_df, style_model.tfidf_matrix.tocsr()
+
+    if provider == 'lsa':
+        engine = LsaProvider.fit(style_model.vectorizer, tfidf_matrix, dim)
+        embed_block = lambda start, end: engine.embed_rows(tfidf_matrix[start:end])
+    elif provider == 'st':
+        if not model: raise ValueError("sentence-transformers için --model (yerel model yolu) gerekli")
+        engine = SentenceTransformerProvider(model)
+        texts = catalog.text_column('text')
+        embed_block = lambda start, end: engine.embed_texts(texts.iloc[start:end].tolist())
+    else:
+        raise ValueError(f"Bilinmeyen sağlayıcı: {provider}")
+
+    n = len(items_df)
+    first = embed_block(0, min(block_rows, n))
+    out = np.lib.format.open_memmap(EMBEDDINGS_PATH + '.tmp', mode='w+', dtype=np.float16, shape=(n, first.shape[1]))
+    out[:len(first)] = first
+    for start in range(len(first), n, block_rows):
+        out[start:start + block_rows] = embed_block(start, min(start + block_rows, n))
+    out.flush()
+    del out
+    os.replace(EMBEDDINGS_PATH + '.tmp', EMBEDDINGS_PATH)
+    engine.save()
+
+    header = {
+        'provider': provider, 'model': model, 'dim': int(first.shape[1]), 'rows': n,
+        'model_version': artifact_version(model_files()),
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(HEADER_PATH, 'w', encoding='utf-8') as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+    size_mb = os.path.getsize(EMBEDDINGS_PATH) / 1024 / 1024
+    print(f"✅ Vektör indeksi yazıldı: {n} x {header['dim']} float16, {size_mb:.1f} MB ({time.time() - start_time:.1f} sn)")
+    return header
+
+# --- OKUMA ---
+
+def open_index(path=EMBEDDINGS_PATH):
+    """
+    İndeksi mmap ile açar. Dosya yoksa veya TF-IDF modeli indeksten sonra değiştiyse None döner
+    (yoğun arama kapalı kalır, sözcüksel arama etkilenmez).
+    """
+    global INDEX
+    INDEX = None
+    if not os.path.exists(path) or not os.path.exists(HEADER_PATH): return None
+
+    try:
+        with open(HEADER_PATH, encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('model_version') != json.loads(json.dumps(artifact_version(model_files()))):
+            print("⚠️ Vektör indeksi eski (model değişmiş), yoğun arama kapalı.")
+            return None
+        matrix = np.load(path, mmap_mode='r')
+        if matrix.shape[0] != header['rows']:
+            print("⚠️ Vektör indeksi bozuk, yoğun arama kapalı.")
+            return None
+        INDEX = {'header': header, 'matrix': matrix, 'provider': PROVIDERS[header['provider']].load(header)}
+        sync_rows()
+        catalog.on_change('embedding_index', lambda event: sync_rows())
+        print(f"✅ Vektör indeksi açıldı: {matrix.shape} ({header['provider']})")
+    except Exception as e:
+        print(f"⚠️ Vektör indeksi açılamadı: {e}")
+        INDEX = None
+    return INDEX
+
+def sync_rows():
+    """
+    Katalog satırlarını indeks satırlarına eşler (catalog.ORIGIN). Çalışma anında eklenen
+    ürünlerin vektörleri sağlayıcıyla hesaplanıp bellekte tutulur.
+    """
+    if INDEX is None: return
+    origin = catalog.ORIGIN
+    identity = len(origin) == INDEX['matrix'].shape[0] and np.array_equal(origin, np.arange(len(origin)))
+    INDEX['row_map'] = None if identity else origin
+    added = np.flatnonzero(origin < 0)
+    INDEX['added_rows'] = added
+    INDEX['added'] = None
+    if len(added):
+        texts = catalog.items_df['text'].iloc[added].fillna('').astype(str).tolist()
+        INDEX['added'] = INDEX['provider'].embed_texts(texts).astype(np.float16)
+
+def is_available():
+    return INDEX is not None
+
+def embed_queries(queries):
+    return INDEX['provider'].embed_texts(queries)
+
+def score_all(query_vecs, block_rows=BLOCK_ROWS):
+    """
+    (sorgu x katalog) kosinüs skorları, float32. İndeks matrisi bloklar halinde float32'ye
+    çevrilip çarpılır.
+    """
+    matrix = INDEX['matrix']
+    q = np.ascontiguousarray(np.atleast_2d(query_vecs), dtype=np.float32)
+    scores = np.empty((len(q), matrix.shape[0]), dtype=np.float32)
+    for start in range(0, matrix.shape[0], block_rows):
+        block = np.asarray(matrix[start:start + block_rows], dtype=np.float32)
+        scores[:, start:start + len(block)] = q @ block.T
+
+    row_map = INDEX['row_map']
+    if row_map is None: return scores
+    # Çalışma anı değişiklikleri: satırları kataloğa hizala, eklenen ürünleri ayrıca puanla
+    aligned = scores[:, np.maximum(row_map, 0)]
+    if INDEX['added'] is not None:
+        aligned[:, INDEX['added_rows']] = q @ INDEX['added'].astype(np.float32).T
+    return aligned
+
+def stats():
+    if INDEX is None: return {'available': False}
+    matrix = INDEX['matrix']
+    return {
+        'available': True, 'provider': INDEX['header']['provider'], 'rows': int(matrix.shape[0]),
+        'dim': int(matrix.shape[1]), 'size_mb': round(matrix.nbytes / 1024 / 1024, 1),
+        'added': len(INDEX['added_rows'])
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Yoğun vektör arama indeksini oluşturur.")
+    parser.add_argument('--provider', choices=sorted(PROVIDERS), default='lsa')
+    parser.add_argument('--dim', type=int, default=DEFAULT_DIM, help="LSA boyutu")
+    parser.add_argument('--model', default=None, help="sentence-transformers yerel model yolu")
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS)
+    args = parser.parse_args()
+    build_index(args.provider, args.dim, args.model, args.block_rows)
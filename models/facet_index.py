@@ -0,0 +1,76 @@
+"""
+Kategori / renk / sezon facet sayıları (filtre kenar çubuğu için).
+
+Genel sayılar katalog yüklenirken bir kez hesaplanır ve catalog.on_change ile her ürün
+ekleme / kaldırmada sadece değişen satırlar üzerinden güncellenir; /api/stats her çağrıda
+value_counts çalıştırmaz.
+
+Sorgu sayıları arama sonucunun bitset'i (style_model.FILTER_INDEX) üzerinden popcount ile
+bulunur. Her facet sütunu kendi filtresi hariç diğer filtrelerle sayılır (disjunctive facet):
+"kategori = elbise" seçiliyken kategori listesi diğer kategorilerin sayılarını da gösterir.
+"""
+import catalog
+
+FACET_COLUMNS = ('category', 'color', 'season')
+
+# sütun -> {değer: aktif ürün sayısı}, çoktan aza sıralı; güncellemede sözlükler kopyalanıp yeniden atanır
+GLOBAL_COUNTS = {}
+TOTAL = 0
+
+def _value_counts(df):
+    # Categorical (snapshot) sütunlarda value_counts sıfır sayılı kategorileri de döndürür
+    counts = {col: df[col].value_counts() for col in FACET_COLUMNS}
+    return {col: values[values > 0].to_dict() for col, values in counts.items()}
+
+def build_facets():
+    """Genel facet sayılarını aktif satırlardan hesaplar ve katalog değişikliklerine abone olur."""
+    global GLOBAL_COUNTS, TOTAL
+    active = catalog.active_mask()
+    df = catalog.items_df if active is None else catalog.items_df[active]
+    GLOBAL_COUNTS = _value_counts(df)
+    TOTAL = len(df)
+    catalog.on_change('facet_index', on_catalog_change)
+
+def _apply_delta(rows_df, sign):
+    global GLOBAL_COUNTS, TOTAL
+    updated = {}
+    for col, delta in _value_counts(rows_df).items():
+        counts = dict(GLOBAL_COUNTS.get(col, {}))
+        for value, count in delta.items():
+            counts[value] = counts.get(value, 0) + sign * count
+            if counts[value] <= 0: del counts[value]
+        updated[col] = dict(sorted(counts.items(), key=lambda item: -item[1]))
+    GLOBAL_COUNTS = updated
+    TOTAL += sign * len(rows_df)
+
+def on_catalog_change(event):
+    """Sadece eklenen / kaldırılan satırların sayıları uygulanır; sıkıştırma sayıları değiştirmez."""
+    if event['op'] == 'add':
+        _apply_delta(catalog.items_df.iloc[event['start']:event['start'] + event['count']], 1)
+    elif event['op'] == 'retire':
+        _apply_delta(catalog.items_df.iloc[event['rows']], -1)
+
+def global_facets():
+    """{'total', 'category': {...}, 'color': {...}, 'season': {...}} — değerler çoktan aza sıralı."""
+    counts = GLOBAL_COUNTS
+    return {'total': TOTAL, **{col: dict(counts.get(col, {})) for col in FACET_COLUMNS}}
+
+def query_facets(index, match_bits, column_bits):
+    """
+    Arama sonucu için facet sayıları.
+
+    Args:
+        index: BitsetIndex (FACET_COLUMNS sütunlarıyla)
+        match_bits: Sorguyla eşleşen (aktif) satırlar, filtreler hariç
+        column_bits: sütun -> o sütunun filtre bitset'i (filtre yoksa sütun yer almaz)
+    """
+    selected = match_bits
+    for bits in column_bits.values():
+        selected = selected & bits
+    facets = {'total': index.count(selected)}
+    for col in FACET_COLUMNS:
+        base = match_bits
+        for other, bits in column_bits.items():
+            if other != col: base = base & bits
+        facets[col] = index.value_counts(col, base)
+    return facets
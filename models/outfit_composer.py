@@ -0,0 +1,202 @@
+"""
+Kombin tamamlayıcı: bir üründen başlayarak K adet tam kombin (üst / alt / ayakkabı / isteğe bağlı dış giyim) kurar.
+
+Kombin puanı, içindeki her ürün çiftinin puanlarının toplamıdır:
+    min(10, birlikte_alınma / 5) * 5 + renk_uyumu * 2 + sezon_uyumu (SEASON_MATCH_BONUS)
+Yaz / kış çakışan çiftler kombine giremez. Renk uyumu combin_model.COLOR_MATRIX'ten
+(color_compatibility_score ile aynı tablo), birlikte alınma sayıları combin_model'in
+komşuluk indeksinden okunur.
+
+Arama ışın (beam) aramasıdır: her slot için kaynak ürünle en uyumlu CANDIDATES_PER_SLOT aday
+seçilir, slot çiftleri arasındaki puanlar tek seferde (aday x aday) bloklar halinde hesaplanır;
+her adımda tüm ışın x aday genişlemesi tek bir dizi işlemiyle puanlanır.
+
+Slot havuzları (app.py POOLS) build_slots ile bir kez diziye çevrilir.
+"""
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+import catalog
+import combin_model
+from result_cache import ResultCache, artifact_version, cache_seed
+
+SLOT_ORDER = ('top', 'bottom', 'shoes', 'outerwear')
+REQUIRED_SLOTS = ('top', 'bottom', 'shoes')
+
+CANDIDATES_PER_SLOT = 48
+BEAM_WIDTH = 64
+MAX_OUTFITS = 50
+MAX_ITEM_REUSE = 3          # Bir ürün en fazla bu kadar kombinde yer alır (çeşitlilik)
+SEASON_MATCH_BONUS = 5.0    # Aynı sezon veya 'dört mevsim'
+
+# Sezon -> kod (build_slots içinde katalogdaki sezonlardan kurulur, boş sezon -1).
+# Çakışma / uyum karşılaştırmaları tamsayı dizileri üzerinde yapılır.
+SEASON_CODES = {}
+CONFLICTING_SEASONS = ('yaz', 'kış')
+ALL_SEASONS = 'dört mevsim'
+
+# slot -> {'rows', 'canonical', 'colors', 'seasons'} (build_slots içinde kurulur)
+SLOTS = {}
+COOCCURRENCE = None  # Birlikte alınma sayıları, (satır x satır) CSR (combin_model komşuluk dizileri üzerinde)
+
+OUTFIT_CACHE = ResultCache('compose_outfits')
+
+def season_codes(values):
+    return np.array([SEASON_CODES.get(v, -1) for v in values], dtype=np.int16)
+
+def opposite_season(season):
+    """Yaz için kış, kış için yaz; diğerleri için None."""
+    if season not in CONFLICTING_SEASONS: return None
+    return CONFLICTING_SEASONS[1 - CONFLICTING_SEASONS.index(season)]
+
+def build_slots(pools):
+    """
+    Args:
+        pools: slot adı -> aktif satır dizisi (app.py POOLS[...]['rows'])
+    """
+    global SLOTS, COOCCURRENCE, SEASON_CODES
+    if combin_model.NEIGHBOR_OFFSETS is None: return
+    seasons = [v for v in pd.unique(combin_model.SEASON_VALUES) if pd.notna(v)]
+    seasons += [v for v in (ALL_SEASONS, *CONFLICTING_SEASONS) if v not in seasons]
+    SEASON_CODES = {season: code for code, season in enumerate(seasons)}
+    n = len(combin_model.NEIGHBOR_OFFSETS) - 1
+    COOCCURRENCE = scipy.sparse.csr_matrix(
+        (combin_model.NEIGHBOR_COUNTS, combin_model.NEIGHBOR_ROWS, combin_model.NEIGHBOR_OFFSETS), shape=(n, n))
+    SLOTS = {}
+    for slot in SLOT_ORDER:
+        rows = np.asarray(pools.get(slot, []), dtype=np.int64)
+        SLOTS[slot] = {
+            'rows': rows,
+            'canonical': combin_model.CANONICAL_ROW[rows].astype(np.int64),
+            'colors': combin_model.COLOR_CODES[rows],
+            'seasons': season_codes(combin_model.SEASON_VALUES[rows])
+        }
+    OUTFIT_CACHE.set_version((artifact_version(combin_model.model_files()), catalog.REVISION))
+
+def pair_scores(a, b):
+    """
+    (len(a) x len(b)) çift puanı bloğu. a ve b: {'canonical', 'colors', 'seasons'} dizileri
+    (a kaynak tarafı; renk tablosu kaynak -> aday yönündedir).
+    """
+    counts = COOCCURRENCE[a['canonical']][:, b['canonical']].toarray()
+    scores = np.minimum(10, counts / 5) * 5 + combin_model.COLOR_MATRIX[np.ix_(a['colors'], b['colors'])] * 2
+    sa, sb = a['seasons'][:, None], b['seasons'][None, :]
+    every = SEASON_CODES[ALL_SEASONS]
+    summer, winter = (SEASON_CODES[s] for s in CONFLICTING_SEASONS)
+    scores += (((sa == sb) & (sa >= 0)) | (sa == every) | (sb == every)) * SEASON_MATCH_BONUS
+    scores[((sa == summer) & (sb == winter)) | ((sa == winter) & (sb == summer))] = -np.inf
+    return scores
+
+def _take(slot_arrays, index):
+    return {key: values[index] for key, values in slot_arrays.items()}
+
+def _slot_candidates(slot, source, season, rng):
+    """Kaynakla en uyumlu CANDIDATES_PER_SLOT aday ve kaynakla çift puanları."""
+    arrays = SLOTS[slot]
+    keep = arrays['canonical'] != source['canonical'][0]
+    # Kombin sezonuna ters sezondaki ürünler (yaz <-> kış) aday olmaz
+    if opposite_season(season): keep &= arrays['seasons'] != SEASON_CODES[opposite_season(season)]
+    candidates = _take(arrays, np.flatnonzero(keep))
+    unary = pair_scores(source, candidates)[0]
+
+    # Eşit puanlılar arasında sabit tohumlu rastgele sıra (aynı istek -> aynı kombinler)
+    order = np.lexsort((rng.permutation(len(unary)), -unary))
+    order = order[np.isfinite(unary[order])][:CANDIDATES_PER_SLOT]
+    return _take(candidates, order), unary[order]
+
+def _beam(unary, blocks, width):
+    """
+    Slotları sırayla genişletir. blocks[s][t]: s < t slotlarının aday çift puanları.
+    Returns:
+        (ışın x slot) aday indeksleri ve toplam puanlar (azalan)
+    """
+    states = np.zeros((1, 0), dtype=np.int64)
+    totals = np.zeros(1)
+    for t in range(len(unary)):
+        expanded = totals[:, None] + unary[t][None, :]
+        for s in range(t):
+            expanded = expanded + blocks[s][t][states[:, s]]
+        flat = expanded.ravel()
+        finite = np.flatnonzero(np.isfinite(flat))
+        if len(finite) > width:
+            finite = finite[np.argpartition(-flat[finite], width - 1)[:width]]
+        best = finite[np.lexsort((finite, -flat[finite]))]
+        beam_rows, cols = np.divmod(best, len(unary[t]))
+        states = np.column_stack([states[beam_rows], cols])
+        totals = flat[best]
+    return states, totals
+
+def _pick_diverse(states, count):
+    """Işından, her aday en fazla MAX_ITEM_REUSE kombinde olacak şekilde count kombin seçer."""
+    usage = {}
+    picked, skipped = [], []
+    for i, state in enumerate(states):
+        keys = list(enumerate(state.tolist()))
+        if all(usage.get(k, 0) < MAX_ITEM_REUSE for k in keys):
+            picked.append(i)
+            for k in keys: usage[k] = usage.get(k, 0) + 1
+        else:
+            skipped.append(i)
+        if len(picked) >= count: return picked
+    return picked + skipped[:count - len(picked)]
+
+def compose_outfits(item_id, count=10, outerwear=None, season=None):
+    """
+    item_id ürününü içeren en iyi count kombini döndürür.
+
+    Args:
+        outerwear: True / False; None ise kaynak dış giyimse veya sezon yaz değilse eklenir
+        season: Kombin sezonu (varsayılan kaynak ürünün sezonu)
+    Returns:
+        [{'score': çift başına ortalama puan, 'rows': {slot: satır}}, ...] — kaynak ürün kendi
+        slotunda yer alır; slotu yoksa (ör. 'other') sadece puanlamaya katılır
+    """
+    if not SLOTS: return []
+    if isinstance(item_id, np.generic): item_id = item_id.item()
+    count = max(1, min(int(count), MAX_OUTFITS))
+    key = (item_id, count, outerwear, season)
+    return OUTFIT_CACHE.get_or_compute(key, lambda: _compose_outfits(item_id, count, outerwear, season))
+
+def _compose_outfits(item_id, count, outerwear, season):
+    source_row = combin_model.ID_TO_ROW.get(item_id)
+    if source_row is None: return []
+    rows = np.array([source_row], dtype=np.int64)
+    source = {
+        'rows': rows, 'canonical': rows,
+        'colors': combin_model.COLOR_CODES[rows],
+        'seasons': season_codes(combin_model.SEASON_VALUES[rows])
+    }
+    season = season or combin_model.SEASON_VALUES[source_row]
+
+    source_slot = next((slot for slot in SLOT_ORDER
+                        if np.isin(source_row, SLOTS[slot]['canonical'])), None)
+    if outerwear is None: outerwear = source_slot == 'outerwear' or season != 'yaz'
+    slots = [slot for slot in SLOT_ORDER
+             if slot != source_slot and (slot in REQUIRED_SLOTS or outerwear)]
+
+    rng = np.random.default_rng(cache_seed(('outfits', item_id, season)))
+    candidates, unary = [], []
+    for slot in slots:
+        slot_candidates, slot_unary = _slot_candidates(slot, source, season, rng)
+        if len(slot_unary) == 0: return []
+        candidates.append(slot_candidates)
+        unary.append(slot_unary)
+
+    blocks = [[None] * len(slots) for _ in slots]
+    for s in range(len(slots)):
+        for t in range(s + 1, len(slots)):
+            blocks[s][t] = pair_scores(candidates[s], candidates[t])
+
+    states, totals = _beam(unary, blocks, max(BEAM_WIDTH, count * 8))
+    if len(states) == 0: return []
+
+    members = len(slots) + 1
+    pairs = members * (members - 1) / 2
+    outfits = []
+    for i in _pick_diverse(states, count):
+        outfit_rows = {slot: int(candidates[s]['rows'][states[i, s]]) for s, slot in enumerate(slots)}
+        if source_slot: outfit_rows[source_slot] = int(source_row)
+        ordered = {slot: outfit_rows[slot] for slot in SLOT_ORDER if slot in outfit_rows}
+        outfits.append({'score': round(float(totals[i]) / pairs, 3), 'rows': ordered})
+    return outfits
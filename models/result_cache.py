@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import zlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Varsayılan ayarlar (.env / ortam değişkenleriyle değiştirilebilir)
+# RESULT_CACHE_MAX_MB süreç genelindeki bütçedir: tüm önbelleklerin toplamı bu sınırı aşamaz
+DEFAULT_MAX_MB = float(os.getenv('RESULT_CACHE_MAX_MB', '64'))
+DEFAULT_TTL = float(os.getenv('RESULT_CACHE_TTL', '0'))  # 0 = süresiz
+
+# Oluşturulan tüm önbellekler (istatistik endpoint'i ve ortak bütçe için)
+CACHES = {}
+
+# Ortak bütçe: tüm önbellekler tek kilidi paylaşır, böylece bir önbellek diğerinden kayıt atabilir
+_LOCK = threading.RLock()
+_TOTAL_BYTES = 0
+TOTAL_MAX_BYTES = int(DEFAULT_MAX_MB * 1024 * 1024)
+
+def set_total_budget(max_mb):
+    """Tüm önbelleklerin toplam bütçesini değiştirir (aşan kısım hemen atılır)."""
+    global TOTAL_MAX_BYTES
+    with _LOCK:
+        TOTAL_MAX_BYTES = int(max_mb * 1024 * 1024)
+        _enforce_total_budget()
+
+def _enforce_total_budget():
+    """Toplam bütçe aşılmışsa en çok yer kaplayan önbelleğin en eski kaydı atılır (_LOCK altında)."""
+    while _TOTAL_BYTES > TOTAL_MAX_BYTES:
+        largest = max(CACHES.values(), key=lambda cache: cache._bytes)
+        if not largest._entries: break
+        largest._remove(next(iter(largest._entries)))
+        largest.evictions += 1
+
+def total_bytes():
+    with _LOCK:
+        return _TOTAL_BYTES
+
+def estimate_size(value):
+    """Önbellekteki bir değerin yaklaşık bellek boyutu (byte)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+def copy_value(value):
+    """Çağıran tarafın değiştirmesi önbellekteki kopyayı bozmasın."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, list):
+        return [dict(v) if isinstance(v, dict) else v for v in value]
+    if isinstance(value, tuple):
+        return tuple(copy_value(v) for v in value)
+    if isinstance(value, dict):
+        return {k: dict(v) if isinstance(v, dict) else v for k, v in value.items()}
+    return value
+
+def cache_seed(key):
+    """Anahtardan türetilen sabit bir rastgelelik tohumu (aynı giriş -> aynı rastgele seçim)."""
+    return zlib.crc32(repr(key).encode('utf-8'))
+
+def artifact_version(paths):
+    """Model dosyalarının (mtime, boyut) imzası; dosyalar değişince sürüm de değişir."""
+    version = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            version.append((os.path.basename(path), st.st_mtime_ns, st.st_size))
+        except OSError:
+            version.append((os.path.basename(path), None, None))
+    return tuple(version)
+
+def normalize_query(query):
+    return ' '.join(str(query).lower().split())
+
+class ResultCache:
+    """
+    Bellek bütçeli LRU sonuç önbelleği.
+    - Tüm önbellekler RESULT_CACHE_MAX_MB ortak bütçesini paylaşır; aşılınca en çok yer
+      kaplayan önbelleğin en eski kullanılan kayıtları atılır
+    - max_mb verilirse önbellek ayrıca kendi sınırını da aşamaz
+    - ttl > 0 ise kayıtlar ttl saniye sonra geçersiz olur
+    - set_version ile model sürümü değişince tüm kayıtlar silinir
+    """
+    def __init__(self, name, max_mb=None, ttl=DEFAULT_TTL):
+        self.name = name
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb is not None else None
+        self.ttl = ttl
+        self.version = None
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = _LOCK
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        CACHES[name] = self
+
+    def get(self, key):
+        """(bulundu_mu, değer) döndürür."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return True, copy_value(value)
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        if size > min(self.max_bytes or TOTAL_MAX_BYTES, TOTAL_MAX_BYTES): return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            if key in self._entries: self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._add_bytes(size)
+            while self.max_bytes is not None and self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            _enforce_total_budget()
+
+    def get_or_compute(self, key, compute):
+        found, value = self.get(key)
+        if found: return value
+        value = compute()
+        self.put(key, value)
+        return copy_value(value)
+
+    def set_version(self, version):
+        """Model dosyaları yeniden yüklendiğinde çağrılır; sürüm değiştiyse önbellek boşaltılır."""
+        with self._lock:
+            if version != self.version:
+                self._clear()
+                self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._add_bytes(-self._bytes)
+
+    def _add_bytes(self, size):
+        global _TOTAL_BYTES
+        self._bytes += size
+        _TOTAL_BYTES += size
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._add_bytes(-size)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'total_bytes': _TOTAL_BYTES,
+                'total_max_bytes': TOTAL_MAX_BYTES,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+def all_cache_stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
@@ -1,44 +1,227 @@
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
+from sklearn.preprocessing import normalize
 import pickle
 import os
+import json
+import time
+import base64
+import shutil
+import tempfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from result_cache import ResultCache, artifact_version, normalize_query, cache_seed
+import catalog
+import embedding_index
+import facet_index
+from bitset_index import BitsetIndex
 
 items_df = None
 tfidf_matrix = None
 vectorizer = None
 
+# Arama çekirdeği: satırları L2-normalize edilmiş float32 CSR matris.
+# Kosinüs benzerliği böylece tek bir seyrek matris-vektör çarpımına iner.
+search_matrix = None
+search_matrix_t = None  # Transpozu (terim -> satırlar), toplu sorgu çarpımı için
+# Kategori / renk / sezon filtreleri için bitset indeksi (build_search_matrix içinde kurulur)
+FILTER_INDEX = None
+ACTIVE_BITS = None  # Kaldırılmış ürün varsa aktif satırların bitset'i
+
+# search_by_text sonuç önbelleği (model dosyaları yeniden yüklenince boşaltılır)
+SEARCH_CACHE = ResultCache('search_by_text')
+
+# Filtre bu orandan az satır bırakıyorsa sadece o satırlar puanlanır
+SELECTIVE_FILTER_RATIO = 0.25
+
+# Arama modu: 'lexical' (TF-IDF), 'dense' (embedding_index) veya 'hybrid' (ikisinin ağırlıklı toplamı)
+# Vektör indeksi yoksa her mod sözcüksel aramaya düşer.
+SEARCH_MODES = ('lexical', 'dense', 'hybrid')
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'lexical')
+HYBRID_ALPHA = float(os.getenv('HYBRID_ALPHA', '0.5'))  # Hibrit skorda yoğun skorun ağırlığı
+
 MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(MODEL_DIR, 'data')
 
-def load_style_model():
+# Vectorizer ayarları; model dosyası olarak pickle yerine terim listesi (vocabulary.json) + idf.npy yazılır
+VECTORIZER_PARAMS = {'max_features': 5000, 'ngram_range': (1, 2), 'stop_words': 'english'}
+VOCABULARY_FILE = 'vocabulary.json'
+IDF_FILE = 'idf.npy'
+BUILD_CHUNK_ROWS = 50000
+
+def vectorizer_files(data_dir=DATA_DIR):
+    """Varsa sözlük dosyaları, yoksa eski vectorizer.pkl."""
+    if os.path.exists(os.path.join(data_dir, VOCABULARY_FILE)):
+        return [os.path.join(data_dir, VOCABULARY_FILE), os.path.join(data_dir, IDF_FILE)]
+    return [os.path.join(data_dir, 'vectorizer.pkl')]
+
+def model_files():
+    return [os.path.join(DATA_DIR, 'items_processed.csv'), *vectorizer_files(), os.path.join(DATA_DIR, 'tfidf_matrix.npz')]
+
+def vectorizer_from_vocabulary(terms, idf, params):
+    """Sabit sözlük ve idf ile eğitilmiş TfidfVectorizer (fit gerekmez)."""
+    vec = TfidfVectorizer(vocabulary=terms, ngram_range=tuple(params['ngram_range']), stop_words=params['stop_words'])
+    vec.idf_ = idf
+    return vec
+
+def load_vectorizer(data_dir=DATA_DIR):
+    vocab_path = os.path.join(data_dir, VOCABULARY_FILE)
+    if os.path.exists(vocab_path):
+        with open(vocab_path, encoding='utf-8') as f:
+            vocab = json.load(f)
+        return vectorizer_from_vocabulary(vocab['terms'], np.load(os.path.join(data_dir, IDF_FILE)), vocab['params'])
+    with open(os.path.join(data_dir, 'vectorizer.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+def load_style_model(reload=False):
+    """
+    Args:
+        reload: True ise model zaten yüklü olsa bile dosyalardan yeniden yüklenir
+    """
     global items_df, tfidf_matrix, vectorizer
     
-    if items_df is not None:
+    if items_df is not None and not reload:
         print("✅ Stil modeli zaten yüklü.")
         return
 
     try:
         print("🔄 Stil modeli yükleniyor...")
-        items_df = pd.read_csv(os.path.join(DATA_DIR, 'items_processed.csv'))
-        with open(os.path.join(DATA_DIR, 'vectorizer.pkl'), 'rb') as f:
-            vectorizer = pickle.load(f)
+        items_df = catalog.load_catalog(reload)
+        vectorizer = load_vectorizer()
         
         # TF-IDF matrisi yükle
         import scipy.sparse
-        tfidf_matrix = scipy.sparse.load_npz(os.path.join(DATA_DIR, 'tfidf_matrix.npz'))
+        tfidf_matrix = align_to_catalog(scipy.sparse.load_npz(os.path.join(DATA_DIR, 'tfidf_matrix.npz')))
+        build_search_matrix()
+        SEARCH_CACHE.set_version((artifact_version(model_files()), catalog.REVISION))
+        catalog.on_change('style_model', on_catalog_change)
+        facet_index.build_facets()
         
         print(f"✅ Stil modeli yüklendi: {tfidf_matrix.shape}")
+        if embedding_index.open_index() is None and SEARCH_MODE != 'lexical':
+            print(f"⚠️ SEARCH_MODE={SEARCH_MODE} için vektör indeksi yok, sözcüksel arama kullanılacak.")
     except Exception as e:
         print(f"❌ Stil modeli hatası: {e}")
 
-def search_by_text(query, top_k=20, category=None, color=None, season=None, exclude_mixed_colors=False):
+def align_to_catalog(disk_matrix):
+    """
+    Diskteki matrisi çalışma anında değişmiş kataloğa (catalog.ORIGIN) hizalar:
+    diskten gelen satırlar seçilir, sonradan eklenenler mevcut vectorizer ile dönüştürülür.
+    """
+    import scipy.sparse
+    origin = catalog.ORIGIN
+    if len(origin) == disk_matrix.shape[0] and np.array_equal(origin, np.arange(len(origin))):
+        return disk_matrix
+    added = np.flatnonzero(origin < 0)
+    new_rows = vectorizer.transform(items_df['text'].iloc[added].fillna('').astype(str))
+    rows = origin.copy()
+    rows[added] = disk_matrix.shape[0] + np.arange(len(added))
+    return scipy.sparse.vstack([disk_matrix, new_rows]).tocsr()[rows]
+
+def on_catalog_change(event):
+    """Katalog değişikliğini TF-IDF matrisine uygular (vectorizer yeniden eğitilmez)."""
+    global items_df, tfidf_matrix
+    import scipy.sparse
+    items_df = catalog.items_df
+    if event['op'] == 'add':
+        text = items_df['text'].iloc[event['start']:].fillna('').astype(str)
+        tfidf_matrix = scipy.sparse.vstack([tfidf_matrix, vectorizer.transform(text)]).tocsr()
+    elif event['op'] == 'compact':
+        tfidf_matrix = tfidf_matrix.tocsr()[event['keep']]
+    build_search_matrix()
+    SEARCH_CACHE.set_version((artifact_version(model_files()), catalog.REVISION))
+
+def build_search_matrix():
+    """Arama için normalize float32 matrisi ve filtre sütunlarını hazırlar."""
+    global search_matrix, search_matrix_t, FILTER_INDEX, ACTIVE_BITS
+    import scipy.sparse
+    search_matrix = normalize(tfidf_matrix.astype(np.float32).tocsr(), norm='l2', copy=False)
+    active = catalog.active_mask()
+    if active is not None:
+        # Kaldırılan ürünlerin satırları sıfırlanır; skorları 0 olduğu için sonuçlara girmezler
+        search_matrix = (scipy.sparse.diags(active.astype(np.float32)) @ search_matrix).tocsr()
+        search_matrix.eliminate_zeros()
+    search_matrix_t = search_matrix.T.tocsr()
+    FILTER_INDEX = BitsetIndex({col: items_df[col].to_numpy() for col in ('category', 'color', 'season')})
+    ACTIVE_BITS = None if active is None else FILTER_INDEX.from_mask(active)
+
+def column_filter_bits(category=None, color=None, season=None, exclude_mixed_colors=False, colors=None):
     """
-    Text araması
+    Filtreleri sütun bazında döndürür: sütun -> FILTER_INDEX bitset'i (filtresiz sütunlar yer almaz).
+    category / color / season tek değer veya değer listesi (herhangi biri) olabilir.
+    
+    Args:
+        colors: İzin verilen renkler listesi (ör. renk uyumu grubu)
+    """
+    columns = {}
+    for col, value in (('category', category), ('color', color), ('season', season), ('color', colors)):
+        if value:
+            col_bits = FILTER_INDEX.isin(col, value) if isinstance(value, (list, tuple, set)) else FILTER_INDEX.eq(col, value)
+            columns[col] = col_bits if col not in columns else columns[col] & col_bits
+    
+    # 🚨 YENİ: Karışık rengi filtrele
+    if exclude_mixed_colors:
+        mixed = FILTER_INDEX.eq('color', 'karışık')
+        columns['color'] = FILTER_INDEX.invert(mixed) if 'color' not in columns else FILTER_INDEX.andnot(columns['color'], mixed)
+    return columns
+
+def filter_bits(category=None, color=None, season=None, exclude_mixed_colors=False, colors=None):
+    """Filtre yoksa None, varsa tüm filtrelerin kesişimi (FILTER_INDEX bitset'i)."""
+    bits = None
+    for col_bits in column_filter_bits(category, color, season, exclude_mixed_colors, colors).values():
+        bits = col_bits if bits is None else bits & col_bits
+    return bits
+
+def filter_mask(category=None, color=None, season=None, exclude_mixed_colors=False, colors=None):
+    """Filtre yoksa None, varsa satır maskesi döndürür."""
+    bits = filter_bits(category, color, season, exclude_mixed_colors, colors)
+    return None if bits is None else FILTER_INDEX.mask(bits)
+
+def top_k_indices(scores, top_k):
+    """
+    En yüksek top_k skorun indekslerini (azalan sırada, sadece > 0) döndürür.
+    Tüm diziyi sıralamak yerine partition ile top_k'inci skor bulunur, sadece ondan büyük
+    veya eşit skorlar sıralanır. Eşit skorlarda eski argsort()[::-1] sıralamasındaki gibi büyük
+    indeks önce gelir; top_k sınırındaki eşitlikler de bu sırayla kesilir (cursor sayfaları
+    eşit skorlu ürün atlamaz).
+    """
+    top_k = min(top_k, len(scores))
+    if top_k <= 0: return np.array([], dtype=np.int64)
+    kth = np.partition(-scores, top_k - 1)[top_k - 1]
+    idx = np.flatnonzero(-scores <= kth) if kth < 0 else np.flatnonzero(scores > 0)
+    return idx[np.lexsort((-idx, -scores[idx]))][:top_k]
+
+def score_rows(query_vec, rows=None):
+    """Normalize sorgu vektörünün tüm (veya verilen) satırlarla kosinüs benzerliği."""
+    q = query_vec.toarray().ravel()
+    if rows is None: return search_matrix.dot(q)
+    return search_matrix[rows].dot(q)
+
+def search_mode(mode=None):
+    """İstenen (veya varsayılan) modu; vektör indeksi yoksa 'lexical' döndürür."""
+    mode = mode or SEARCH_MODE
+    if mode not in SEARCH_MODES: raise ValueError(f"Bilinmeyen arama modu: {mode}")
+    if mode != 'lexical' and not embedding_index.is_available(): return 'lexical'
+    return mode
+
+def dense_scores(query, query_vec, mode):
+    """Tüm satırların yoğun (veya hibrit) skoru; kaldırılmış satırlar 0."""
+    scores = embedding_index.score_all(embedding_index.embed_queries([query]))[0]
+    if mode == 'hybrid':
+        scores = HYBRID_ALPHA * scores + (1 - HYBRID_ALPHA) * score_rows(query_vec)
+    active = catalog.active_mask()
+    if active is not None: scores[~active] = 0
+    return scores
+
+def search_by_text(query, top_k=20, category=None, color=None, season=None, exclude_mixed_colors=False, mode=None, colors=None):
+    """
+    Text araması (sonuçlar SEARCH_CACHE'te tutulur)
     
     Args:
         exclude_mixed_colors: True ise "karışık" renk kategorisini sonuçlardan çıkar
+        mode: 'lexical', 'dense' veya 'hybrid' (varsayılan SEARCH_MODE)
+        colors: Sadece bu renklerdeki ürünler (puanlama maskesine eklenir)
     """
     global items_df, tfidf_matrix, vectorizer
     
@@ -46,71 +229,357 @@ def search_by_text(query, top_k=20, category=None, color=None, season=None, excl
         return pd.DataFrame()
     
     try:
-        query_vec = vectorizer.transform([query.lower()])
-        similarities = cosine_similarity(query_vec, tfidf_matrix)[0]
-        
-        mask = np.ones(len(items_df), dtype=bool)
-        
-        if category:
-            mask &= (items_df['category'] == category).values
-        
-        if color:
-            mask &= (items_df['color'] == color).values
-        
-        if season:
-            mask &= (items_df['season'] == season).values
-        
-        # 🚨 YENİ: Karışık rengi filtrele
-        if exclude_mixed_colors:
-            mask &= (items_df['color'] != 'karışık').values
-        
-        filtered_similarities = similarities * mask
-        top_indices = np.argsort(filtered_similarities)[-top_k:][::-1]
-        
-        results = items_df.iloc[top_indices].copy()
-        results['similarity_score'] = filtered_similarities[top_indices]
-        
-        return results[results['similarity_score'] > 0]
-        
+        mode = search_mode(mode)
+        key = (normalize_query(query), top_k, category, color, season, exclude_mixed_colors)
+        if mode != 'lexical': key += (mode,)
+        if colors: key += (tuple(sorted(colors)),)
+        return SEARCH_CACHE.get_or_compute(
+            key, lambda: _search_by_text(query, top_k, category, color, season, exclude_mixed_colors, mode, colors))
     except Exception as e:
         print(f"❌ Arama hatası: {e}")
         return pd.DataFrame()
 
+def _search_by_text(query, top_k, category, color, season, exclude_mixed_colors, mode='lexical', colors=None):
+    bits = filter_bits(category, color, season, exclude_mixed_colors, colors)
+    top_indices, top_scores = _rank(query, top_k, bits, mode)
+    
+    results = items_df.iloc[top_indices].copy()
+    results['similarity_score'] = top_scores
+    
+    return results
+
+def _after_cursor(scores, rows, after):
+    """Sıralamada (skor azalan, satır azalan) after=(skor, satır) konumundan sonra gelenler."""
+    score, row = np.float32(after[0]), after[1]
+    return (scores < score) | ((scores == score) & (rows < row))
+
+def _rank(query, top_k, bits, mode, after=None):
+    """
+    Filtreden (bits) geçen satırların en yüksek top_k skoru: (satırlar, skorlar).
+    after verilirse sadece o konumdan sonraki satırlar sıralanır (sayfalama).
+    """
+    query_vec = normalize(vectorizer.transform([query.lower()]).astype(np.float32))
+    
+    # Seçici filtre (popcount ile): sadece filtreden geçen satırları puanla
+    if bits is not None and mode == 'lexical' and FILTER_INDEX.count(bits) < SELECTIVE_FILTER_RATIO * FILTER_INDEX.n:
+        rows = FILTER_INDEX.rows(bits)
+        scores = score_rows(query_vec, rows)
+        if after is not None: scores[~_after_cursor(scores, rows, after)] = 0
+        local = top_k_indices(scores, top_k)
+        return rows[local], scores[local]
+    
+    scores = dense_scores(query, query_vec, mode) if mode != 'lexical' else score_rows(query_vec)
+    if bits is not None: scores[~FILTER_INDEX.mask(bits)] = 0
+    if after is not None: scores[~_after_cursor(scores, np.arange(len(scores)), after)] = 0
+    top_indices = top_k_indices(scores, top_k)
+    return top_indices, scores[top_indices]
+
+def _cursor_fingerprint(key):
+    return cache_seed(key) & 0xFFFFFFFF
+
+def _cursor_generation():
+    return cache_seed(catalog.row_generation()) & 0xFFFFFFFF
+
+def encode_cursor(key, score, row):
+    payload = json.dumps({'f': _cursor_fingerprint(key), 'g': _cursor_generation(), 's': float(score), 'r': int(row)},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(key, cursor):
+    """
+    Cursor'ı (skor, satır) olarak çözer; başka bir sorguya aitse, bozuksa veya katalog o
+    sayfadan sonra sıkıştırıldıysa (satır numaraları değişmiş) ValueError.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        after = (float(payload['s']), int(payload['r']))
+    except Exception:
+        raise ValueError("Geçersiz cursor")
+    if payload.get('f') != _cursor_fingerprint(key): raise ValueError("Cursor bu sorguya ait değil")
+    if payload.get('g') != _cursor_generation(): raise ValueError("Cursor eski (katalog sıkıştırıldı), arama baştan başlatılmalı")
+    return after
+
+def search_page(query, limit=20, cursor=None, category=None, color=None, season=None,
+                exclude_mixed_colors=False, mode=None, colors=None):
+    """
+    search_by_text'in sayfalı hali. Filtreler puanlama maskesinde uygulanır; her sayfa tek bir
+    puanlama + top_k seçimi (limit + 1) kadar iş yapar, filtreden geçen yeterli ürün varsa
+    sayfa her zaman limit kadar dolar.
+    
+    Sıralama (skor azalan, satır azalan) sabittir; cursor son ürünün (skor, satır) konumunu taşır.
+    Ürün ekleme / kaldırma cursor'ı bozmaz; sıkıştırma satırları yeniden numaralandırdığı için
+    önceki cursor'lar reddedilir (decode_cursor).
+    Returns:
+        (DataFrame, next_cursor) — son sayfada next_cursor None
+    """
+    if items_df is None or tfidf_matrix is None:
+        return pd.DataFrame(), None
+    
+    mode = search_mode(mode)
+    key = (normalize_query(query), category, color, season, exclude_mixed_colors, mode,
+           tuple(sorted(colors)) if colors else None)
+    after = decode_cursor(key, cursor) if cursor else None
+    
+    def compute():
+        bits = filter_bits(category, color, season, exclude_mixed_colors, colors)
+        rows, scores = _rank(query, limit + 1, bits, mode, after)
+        page = items_df.iloc[rows[:limit]].copy()
+        page['similarity_score'] = scores[:limit]
+        next_cursor = encode_cursor(key, scores[limit - 1], rows[limit - 1]) if len(rows) > limit else None
+        return page, next_cursor
+    
+    return SEARCH_CACHE.get_or_compute(key + ('page', limit, after), compute)
+
+def match_bits(query, mode='lexical'):
+    """
+    Sorguyla eşleşen (skoru > 0) aktif satırların bitset'i. Sözcüksel modda skor hesaplanmaz:
+    sorgu terimlerinin posting'leri (search_matrix_t satırları) birleştirilir.
+    """
+    query_vec = vectorizer.transform([query.lower()])
+    if mode != 'lexical':
+        return FILTER_INDEX.from_mask(dense_scores(query, normalize(query_vec.astype(np.float32)), mode) > 0)
+    mask = np.zeros(FILTER_INDEX.n, dtype=bool)
+    mask[search_matrix_t[query_vec.indices].indices] = True
+    return FILTER_INDEX.from_mask(mask)
+
+def search_facets(query, category=None, color=None, season=None, exclude_mixed_colors=False, mode=None, colors=None):
+    """
+    Arama sonucunun tamamı (sadece sayfa değil) için kategori / renk / sezon sayıları.
+    Her sütun kendi filtresi hariç diğer filtrelerle sayılır (bkz. facet_index.query_facets).
+    """
+    if items_df is None or tfidf_matrix is None:
+        return {}
+    
+    mode = search_mode(mode)
+    key = (normalize_query(query), category, color, season, exclude_mixed_colors, mode,
+           tuple(sorted(colors)) if colors else None, 'facets')
+    
+    def compute():
+        columns = column_filter_bits(category, color, season, exclude_mixed_colors, colors)
+        return facet_index.query_facets(FILTER_INDEX, match_bits(query, mode), columns)
+    
+    return SEARCH_CACHE.get_or_compute(key, compute)
+
+def search_by_text_batch(queries, top_k=20):
+    """
+    Birden fazla text aramasını tek seferde yapar.
+    Tüm sorgular birlikte vektörize edilir ve tek bir (sorgu x katalog) seyrek çarpımla
+    puanlanır; her sorgunun kendi filtreleri sadece sıfır olmayan skorlara uygulanır.
+    
+    Args:
+        queries: Sorgu metinleri veya search_by_text parametrelerini taşıyan sözlükler
+                 ({'query', 'top_k', 'category', 'color', 'season', 'exclude_mixed_colors', 'mode', 'colors'})
+                 Yoğun / hibrit moddaki sorgular tek tek search_by_text ile çalıştırılır.
+    Returns:
+        Her sorgu için search_by_text ile aynı biçimde bir DataFrame listesi
+    """
+    global items_df, tfidf_matrix, vectorizer
+    
+    if items_df is None or tfidf_matrix is None:
+        return [pd.DataFrame() for _ in queries]
+    
+    try:
+        specs = [{'query': q} if isinstance(q, str) else q for q in queries]
+        query_vecs = normalize(vectorizer.transform([str(spec.get('query', '')).lower() for spec in specs]).astype(np.float32))
+        similarities = (query_vecs @ search_matrix_t).tocsr()
+        similarities.sort_indices()  # Eşit skorlarda satır sırası korunsun
+        
+        results = []
+        for i, spec in enumerate(specs):
+            if search_mode(spec.get('mode')) != 'lexical':
+                results.append(search_by_text(
+                    str(spec.get('query', '')), spec.get('top_k', top_k), spec.get('category'), spec.get('color'),
+                    spec.get('season'), spec.get('exclude_mixed_colors', False), spec.get('mode'), spec.get('colors')))
+                continue
+            start, end = similarities.indptr[i], similarities.indptr[i + 1]
+            rows, scores = similarities.indices[start:end], similarities.data[start:end]
+            
+            mask = filter_mask(spec.get('category'), spec.get('color'), spec.get('season'),
+                               spec.get('exclude_mixed_colors', False), spec.get('colors'))
+            if mask is not None:
+                keep = mask[rows]
+                rows, scores = rows[keep], scores[keep]
+            
+            local = top_k_indices(scores, spec.get('top_k', top_k))
+            result = items_df.iloc[rows[local]].copy()
+            result['similarity_score'] = scores[local]
+            results.append(result)
+        return results
+        
+    except Exception as e:
+        print(f"❌ Toplu arama hatası: {e}")
+        return [pd.DataFrame() for _ in queries]
+
 def search_by_filters(category=None, color=None, season=None, limit=50):
     global items_df
     if items_df is None:
         return pd.DataFrame()
     
-    mask = np.ones(len(items_df), dtype=bool)
-    if category:
-        mask &= (items_df['category'] == category)
-    if color:
-        mask &= (items_df['color'] == color)
-    if season:
-        mask &= (items_df['season'] == season)
-    
-    return items_df[mask].head(limit)
+    bits = filter_bits(category, color, season)
+    if ACTIVE_BITS is not None:
+        bits = ACTIVE_BITS if bits is None else bits & ACTIVE_BITS
+    if bits is None:
+        return items_df.head(limit)
+    return items_df.iloc[FILTER_INDEX.rows(bits)[:limit]]
+
+# --- MODEL OLUŞTURMA (out-of-core) ---
+# Katalog parça parça okunur; parçalar worker süreçlerinde sayılır / dönüştürülür.
+# 1. geçiş: her parçada terim frekansı (tf) ve belge frekansı (df), birleştirilip sözlük seçilir
+#    (TfidfVectorizer ile aynı kural: en yüksek toplam tf'li max_features terim, alfabetik sırada)
+# 2. geçiş: sabit sözlük + idf ile her parça CSR'a çevrilir ve diske yazılır; sonra tek matriste birleştirilir
+
+def _item_text(df):
+    return (
+        df['name'].fillna('') + ' ' + 
+        df['category'].fillna('') + ' ' +
+        df['color'].fillna('') + ' ' +
+        df['season'].fillna('')
+    ).str.lower()
+
+def _count_chunk(texts, params):
+    """Worker: parçadaki terimlerin (terimler, tf, df) dizileri."""
+    counter = CountVectorizer(ngram_range=tuple(params['ngram_range']), stop_words=params['stop_words'])
+    try:
+        counts = counter.fit_transform(texts)
+    except ValueError:  # Parçada hiç terim yok
+        return np.array([], dtype=object), np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    tf = np.asarray(counts.sum(axis=0)).ravel()
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    return counter.get_feature_names_out(), tf, df
+
+_BUILD_VECTORIZER = None
+
+def _init_transform_worker(terms, idf, params):
+    global _BUILD_VECTORIZER
+    _BUILD_VECTORIZER = vectorizer_from_vocabulary(terms, idf, params)
+
+def _transform_chunk(index, texts, part_dir):
+    """Worker: parçayı TF-IDF CSR'a çevirip diske yazar; (parça no, satır, nnz) döner."""
+    import scipy.sparse
+    matrix = _BUILD_VECTORIZER.transform(texts).tocsr()
+    scipy.sparse.save_npz(os.path.join(part_dir, f"part_{index}.npz"), matrix, compressed=False)
+    return index, matrix.shape[0], matrix.nnz
+
+def _run_bounded(pool, tasks, on_result, workers):
+    """Görevleri havuza en fazla 2 * workers bekleyen iş olacak şekilde gönderir."""
+    pending = set()
+    for func, *args in tasks:
+        if len(pending) >= 2 * workers:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done: on_result(future.result())
+        pending.add(pool.submit(func, *args))
+    for future in pending: on_result(future.result())
+
+def _file_mb(path):
+    return round(os.path.getsize(path) / 1024 / 1024, 2) if os.path.exists(path) else 0
+
+def build_style_model(source_path=None, data_dir=DATA_DIR, chunk_rows=BUILD_CHUNK_ROWS, workers=None, params=None):
+    """
+    Kaynak CSV'den items_processed.csv, vocabulary.json + idf.npy ve tfidf_matrix.npz üretir.
+    Bellekte aynı anda en fazla 2 * workers parça ve son matris bulunur.
+    """
+    import scipy.sparse
+    params = dict(params or VECTORIZER_PARAMS)
+    source_path = source_path or os.path.join(data_dir, 'polyvore_items_with_color_season.csv')
+    workers = workers or os.cpu_count() or 1
+    items_path = os.path.join(data_dir, 'items_processed.csv')
+    report = {}
+    start_time = time.time()
+
+    # 1. Geçiş: kataloğu akış halinde işle, metin sütununu ekleyip yaz, terimleri say
+    term_stats = {}  # terim -> [tf, df]
+    n_docs = 0
+
+    def merge_counts(result):
+        for term, tf, df in zip(*(a.tolist() for a in result)):
+            stats = term_stats.get(term)
+            if stats is None: term_stats[term] = [tf, df]
+            else:
+                stats[0] += tf
+                stats[1] += df
+
+    def count_tasks():
+        nonlocal n_docs
+        with open(items_path + '.tmp', 'w', encoding='utf-8', newline='') as out:
+            for i, chunk in enumerate(pd.read_csv(source_path, chunksize=chunk_rows)):
+                chunk['text'] = _item_text(chunk)
+                chunk.to_csv(out, header=(i == 0), index=False)
+                n_docs += len(chunk)
+                yield _count_chunk, chunk['text'].tolist(), params
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        _run_bounded(pool, count_tasks(), merge_counts, workers)
+    os.replace(items_path + '.tmp', items_path)
+    report['count_seconds'] = round(time.time() - start_time, 1)
+
+    # Sözlük: en yüksek tf'li max_features terim (eşitlikte alfabetik), sonra alfabetik sıra
+    ranked = sorted(term_stats.items(), key=lambda kv: (-kv[1][0], kv[0]))
+    if params.get('max_features'): ranked = ranked[:params['max_features']]
+    ranked.sort(key=lambda kv: kv[0])
+    terms = [term for term, _ in ranked]
+    df = np.array([stats[1] for _, stats in ranked], dtype=np.float64)
+    idf = np.log((1 + n_docs) / (1 + df)) + 1  # smooth_idf=True
+    del term_stats, ranked
+
+    vocab_path = os.path.join(data_dir, VOCABULARY_FILE)
+    np.save(os.path.join(data_dir, IDF_FILE), idf)
+    with open(vocab_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'params': params, 'n_docs': n_docs, 'terms': terms}, f, ensure_ascii=False)
+    os.replace(vocab_path + '.tmp', vocab_path)
+
+    # 2. Geçiş: parçaları dönüştürüp diske yaz
+    phase_start = time.time()
+    part_dir = tempfile.mkdtemp(prefix='tfidf_', dir=data_dir)
+    parts = {}
+    try:
+        def transform_tasks():
+            for i, chunk in enumerate(pd.read_csv(items_path, usecols=['text'], chunksize=chunk_rows)):
+                yield _transform_chunk, i, chunk['text'].fillna('').astype(str).tolist(), part_dir
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_transform_worker,
+                                 initargs=(terms, idf, params)) as pool:
+            _run_bounded(pool, transform_tasks(), lambda r: parts.__setitem__(r[0], r[1:]), workers)
+        report['transform_seconds'] = round(time.time() - phase_start, 1)
+
+        # Parçaları önceden ayrılmış tek CSR dizilerine kopyala (ara kopyalar birikmez)
+        total_rows = sum(rows for rows, _ in parts.values())
+        total_nnz = sum(nnz for _, nnz in parts.values())
+        data = np.empty(total_nnz, dtype=np.float64)
+        indices = np.empty(total_nnz, dtype=np.int32)
+        indptr = np.zeros(total_rows + 1, dtype=np.int64)
+        row, pos = 0, 0
+        for i in range(len(parts)):
+            part = scipy.sparse.load_npz(os.path.join(part_dir, f"part_{i}.npz"))
+            data[pos:pos + part.nnz] = part.data
+            indices[pos:pos + part.nnz] = part.indices
+            indptr[row + 1:row + part.shape[0] + 1] = part.indptr[1:] + pos
+            row, pos = row + part.shape[0], pos + part.nnz
+            del part
+        matrix = scipy.sparse.csr_matrix((data, indices, indptr), shape=(total_rows, len(terms)))
+        scipy.sparse.save_npz(os.path.join(data_dir, 'tfidf_matrix.npz'), matrix)
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+    load_start = time.time()
+    load_vectorizer(data_dir)
+    report.update({
+        'rows': n_docs, 'vocabulary': len(terms), 'nnz': int(matrix.nnz),
+        'total_seconds': round(time.time() - start_time, 1),
+        'vectorizer_load_ms': round((time.time() - load_start) * 1000, 1),
+        'tfidf_matrix_mb': _file_mb(os.path.join(data_dir, 'tfidf_matrix.npz')),
+        'vocabulary_mb': _file_mb(vocab_path) + _file_mb(os.path.join(data_dir, IDF_FILE)),
+        'items_mb': _file_mb(items_path)
+    })
+    print(f"✅ Model hazır: {matrix.shape}")
+    print(f"📊 {report}")
+    return report
 
 if __name__ == "__main__":
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from scipy.sparse import save_npz
+    parser = argparse.ArgumentParser(description="Stil modelini (TF-IDF) parça parça, paralel oluşturur.")
+    parser.add_argument('--source', default=None, help="Kaynak katalog CSV (varsayılan: data/polyvore_items_with_color_season.csv)")
+    parser.add_argument('--chunk-rows', type=int, default=BUILD_CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
     
     print("🔄 Stil modeli eğitiliyor...")
-    items_df = pd.read_csv(os.path.join(DATA_DIR, 'polyvore_items_with_color_season.csv'))
-    
-    items_df['text'] = (
-        items_df['name'].fillna('') + ' ' + 
-        items_df['category'].fillna('') + ' ' +
-        items_df['color'].fillna('') + ' ' +
-        items_df['season'].fillna('')
-    ).str.lower()
-    
-    vectorizer = TfidfVectorizer(max_features=5000, ngram_range=(1, 2), stop_words='english')
-    tfidf_matrix = vectorizer.fit_transform(items_df['text'])
-    
-    save_npz(os.path.join(DATA_DIR, 'tfidf_matrix.npz'), tfidf_matrix)
-    with open(os.path.join(DATA_DIR, 'vectorizer.pkl'), 'wb') as f:
-        pickle.dump(vectorizer, f)
-    
-    items_df.to_csv(os.path.join(DATA_DIR, 'items_processed.csv'), index=False)
-    print(f"✅ Model hazır: {tfidf_matrix.shape}")
+    build_style_model(args.source, chunk_rows=args.chunk_rows, workers=args.workers)
@@ -0,0 +1,85 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, MODELS_DIR)
+
+import catalog
+import catalog_updates
+
+NAMES = ['slim jean', 'wool sweater', 'leather boots', 'floral dress', 'denim jacket', 'cotton shirt']
+CATEGORIES = ['pantolon', 'kazak', 'ayakkabı', 'elbise', 'ceket', 'gömlek', 'Tişört', 'ŞORT']
+COLORS = ['siyah', 'beyaz', 'mavi', 'kırmızı', 'karışık', np.nan]
+SEASONS = ['yaz', 'kış', 'dört mevsim', 'ilkbahar']
+
+def make_items(n=120, start_id=1000):
+    """Tekrarlanan değerli (eşit skorlu) küçük bir katalog."""
+    rows = np.arange(n)
+    df = pd.DataFrame({
+        'item_id': start_id + rows,
+        'name': [f"{NAMES[i % len(NAMES)]} {COLORS[i % 5]}" for i in rows],
+        'category': [CATEGORIES[i % len(CATEGORIES)] for i in rows],
+        'color': [COLORS[i % len(COLORS)] for i in rows],
+        'season': [SEASONS[i % len(SEASONS)] for i in rows],
+        'image': [f"images/{start_id + i}.jpg" for i in rows],
+    })
+    df['text'] = catalog_updates.item_text(df)
+    return df
+
+@pytest.fixture
+def small_catalog(monkeypatch, tmp_path):
+    """Paylaşılan kataloğu bellekteki küçük bir tabloyla değiştirir; günlük geçici dizinde."""
+    df = make_items()
+    monkeypatch.setattr(catalog, 'items_df', df)
+    monkeypatch.setattr(catalog, 'ACTIVE', np.ones(len(df), dtype=bool))
+    monkeypatch.setattr(catalog, 'ORIGIN', np.arange(len(df), dtype=np.int64))
+    monkeypatch.setattr(catalog, 'REVISION', 0)
+    monkeypatch.setattr(catalog, 'COMPACTION', 0)
+    monkeypatch.setattr(catalog, 'JOURNAL_OFFSET', 0)
+    monkeypatch.setattr(catalog, 'LISTENERS', {})
+    monkeypatch.setattr(catalog, 'DERIVED_COLUMNS', {})
+    monkeypatch.setattr(catalog_updates, 'JOURNAL_PATH', str(tmp_path / 'catalog_journal.jsonl'))
+    monkeypatch.setattr(catalog_updates, 'COMPACT_RATIO', 0.1)
+    return df
+
+@pytest.fixture
+def search_model(small_catalog, monkeypatch):
+    """style_model'i küçük katalog üzerinde eğitilmiş bir TF-IDF ile kurar."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    import style_model
+
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2)).fit(small_catalog['text'])
+    monkeypatch.setattr(style_model, 'items_df', catalog.items_df)
+    monkeypatch.setattr(style_model, 'vectorizer', vectorizer)
+    monkeypatch.setattr(style_model, 'tfidf_matrix', vectorizer.transform(small_catalog['text']))
+    for name in ('search_matrix', 'search_matrix_t', 'FILTER_INDEX', 'ACTIVE_BITS'):
+        monkeypatch.setattr(style_model, name, None)
+    monkeypatch.setattr(style_model, 'SEARCH_MODE', 'lexical')
+    style_model.build_search_matrix()
+    catalog.on_change('style_model', style_model.on_catalog_change)
+    style_model.SEARCH_CACHE.clear()
+    yield style_model
+    style_model.SEARCH_CACHE.clear()
+
+@pytest.fixture
+def combin_state(small_catalog, monkeypatch):
+    """combin_model indekslerini küçük katalog ve rastgele birlikte-alınma kurallarıyla kurar."""
+    import combin_model
+    import combin_table
+
+    rng = np.random.default_rng(1)
+    ids = small_catalog['item_id'].to_numpy()
+    pairs = rng.choice(ids, size=(300, 2))
+    rules = pd.DataFrame({'antecedent': pairs[:, 0], 'consequent': pairs[:, 1],
+                          'cooccurrence_count': rng.integers(1, 60, len(pairs))})
+    monkeypatch.setattr(combin_model, 'items_df', combin_model.catalog_view())
+    monkeypatch.setattr(combin_model, 'rules_df', rules)
+    monkeypatch.setattr(combin_table, 'TABLE', None)
+    combin_model.build_indexes()
+    combin_model.COMBIN_CACHE.clear()
+    yield combin_model
+    combin_model.COMBIN_CACHE.clear()
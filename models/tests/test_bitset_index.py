@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bitset_index import BitsetIndex
+
+VALUES = ['Tişört', 'TİŞÖRT', 'tişört', 'ŞORT', 'şort', 'Kazak', 'KIRMIZI', 'kırmızı', 'ayakkabı',
+          'AYAKKABI', 'Straße', 'STRASSE', 'dört mevsim', '', np.nan, 'ǅemal']
+
+@pytest.fixture
+def column():
+    rng = np.random.default_rng(0)
+    return pd.Series(np.array(VALUES, dtype=object)[rng.integers(0, len(VALUES), 131)])
+
+@pytest.fixture
+def index(column):
+    return BitsetIndex({'category': column.to_numpy()})
+
+@pytest.mark.parametrize('term', ['tişört', 'TİŞÖRT', 'şort', 'ŞOR', 'ırmız', 'IRMIZ', 'ayakkabı', 'AYAKKABI',
+                                  'ss', 'ß', 'strasse', 'ǆ', 'mevsim', 'x', ''])
+def test_contains_matches_pandas_case_insensitive(index, column, term):
+    expected = column.str.contains(term, case=False, regex=False, na=False).to_numpy()
+    assert np.array_equal(index.mask(index.contains('category', term)), expected)
+
+@pytest.mark.parametrize('term', ['tişört', 'ŞORT', 'ırmız'])
+def test_contains_case_sensitive_matches_pandas(index, column, term):
+    expected = column.str.contains(term, case=True, regex=False, na=False).to_numpy()
+    assert np.array_equal(index.mask(index.contains('category', term, case=True)), expected)
+
+def test_set_operations_match_masks(index, column):
+    values = column.to_numpy()
+    shirt = index.eq('category', 'Tişört')
+    shoes = index.isin('category', ['ayakkabı', 'AYAKKABI', 'yok'])
+    assert np.array_equal(index.mask(shirt), values == 'Tişört')
+    assert np.array_equal(index.mask(shoes), np.isin(values, ['ayakkabı', 'AYAKKABI']))
+    assert np.array_equal(index.mask(shirt | shoes), (values == 'Tişört') | np.isin(values, ['ayakkabı', 'AYAKKABI']))
+    assert np.array_equal(index.mask(index.andnot(index.all(), shirt)), values != 'Tişört')
+    assert np.array_equal(index.mask(index.invert(shirt)), values != 'Tişört')
+    assert index.count(index.invert(index.none())) == len(values)  # Dolgu bitleri sayılmaz
+    assert index.rows(shoes).tolist() == np.flatnonzero(np.isin(values, ['ayakkabı', 'AYAKKABI'])).tolist()
+    assert index.count(index.eq('category', 'yok')) == 0
+
+def test_value_counts_match_pandas(index, column):
+    bits = index.contains('category', 'ş')
+    expected = column[index.mask(bits)].value_counts()
+    counts = index.value_counts('category', bits)
+    assert counts == expected.to_dict()
+    assert list(counts.values()) == sorted(counts.values(), reverse=True)
+    assert index.value_counts('category') == column.value_counts().to_dict()
+
+def test_from_mask_and_rows_round_trip(index):
+    mask = np.zeros(index.n, dtype=bool)
+    mask[[0, 63, 64, 130]] = True
+    bits = index.from_mask(mask)
+    assert index.rows(bits).tolist() == [0, 63, 64, 130]
+    assert np.array_equal(index.from_rows([0, 63, 64, 130]), bits)
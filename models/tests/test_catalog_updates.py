@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import catalog
+import catalog_updates
+import combin_table
+from conftest import make_items
+
+def new_item(item_id, **fields):
+    return {'item_id': item_id, 'name': 'zz elbise', 'category': 'elbise', 'color': 'siyah',
+            'season': 'yaz', 'image': f'images/{item_id}.jpg', **fields}
+
+def restart(monkeypatch):
+    """Yeni bir süreci taklit eder: disk kataloğu yeniden yüklenir, günlük baştan okunur."""
+    df = make_items()
+    monkeypatch.setattr(catalog, 'items_df', df)
+    monkeypatch.setattr(catalog, 'ACTIVE', np.ones(len(df), dtype=bool))
+    monkeypatch.setattr(catalog, 'ORIGIN', np.arange(len(df), dtype=np.int64))
+    monkeypatch.setattr(catalog, 'JOURNAL_OFFSET', 0)
+
+def journal_lines():
+    with open(catalog_updates.JOURNAL_PATH, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_add_and_retire_are_journaled_and_applied(small_catalog):
+    events = []
+    catalog.on_change('test', events.append)
+
+    result = catalog_updates.add_items([new_item(5001), new_item(5002)])
+    assert result['added'] == 2 and result['rows'] == len(small_catalog) + 2
+    assert catalog.ORIGIN[-2:].tolist() == [-1, -1]
+    assert catalog.items_df['text'].iloc[-1] == 'zz elbise elbise siyah yaz'
+
+    result = catalog_updates.retire_items([5001, 1003, 424242])
+    assert result['retired'] == 2 and result['not_found'] == [424242]
+    assert not catalog.ACTIVE[3] and not catalog.ACTIVE[-2]
+
+    assert [e['op'] for e in events] == ['add', 'retire']
+    assert events[0]['start'] == len(small_catalog) and events[0]['count'] == 2
+    assert [e['op'] for e in journal_lines()] == ['add', 'retire']
+
+def test_duplicate_ids_are_rejected(small_catalog):
+    with pytest.raises(catalog_updates.CatalogUpdateError):
+        catalog_updates.add_items([new_item(1000)])
+    with pytest.raises(catalog_updates.CatalogUpdateError):
+        catalog_updates.add_items([new_item(5001), new_item(5001)])
+    with pytest.raises(catalog_updates.CatalogUpdateError):
+        catalog_updates.add_items([new_item(5001, name='')])
+
+def test_restarted_process_replays_journal_to_same_state(small_catalog, monkeypatch):
+    catalog_updates.add_items([new_item(5001), new_item(5002)])
+    catalog_updates.retire_items([1005, 5002])
+    expected_ids = catalog.items_df['item_id'].tolist()
+    expected_active = catalog.ACTIVE.copy()
+    offset = catalog.JOURNAL_OFFSET
+
+    restart(monkeypatch)
+    assert catalog_updates.sync() == 2
+    assert catalog.items_df['item_id'].tolist() == expected_ids
+    assert np.array_equal(catalog.ACTIVE, expected_active)
+    assert catalog.JOURNAL_OFFSET == offset
+    assert catalog_updates.sync() == 0
+
+def test_sync_applies_entries_written_by_other_processes(small_catalog):
+    catalog_updates.add_items([new_item(5001)])
+    catalog_updates._append_journal({'op': 'retire', 'item_ids': [5001]})
+    assert catalog.ACTIVE[-1]
+    assert catalog_updates.sync() == 1
+    assert not catalog.ACTIVE[-1]
+
+def test_half_written_line_waits_for_newline(small_catalog):
+    line = json.dumps({'op': 'add', 'items': [new_item(5001)]})
+    with open(catalog_updates.JOURNAL_PATH, 'w', encoding='utf-8') as f:
+        f.write(line[:20])
+    assert catalog_updates.sync() == 0
+    assert catalog.JOURNAL_OFFSET == 0
+
+    with open(catalog_updates.JOURNAL_PATH, 'w', encoding='utf-8') as f:
+        f.write(line + '\n')
+    assert catalog_updates.sync() == 1
+    assert catalog.items_df['item_id'].iloc[-1] == 5001
+
+def test_compaction_renumbers_rows_after_ratio(small_catalog):
+    events = []
+    catalog.on_change('test', events.append)
+    retired = list(range(1000, 1010))  # 120 satırın %8'i: eşiğin altında
+    catalog_updates.retire_items(retired)
+    assert len(catalog.items_df) == len(small_catalog)
+
+    catalog_updates.retire_items([1010, 1011, 1012, 1013])  # %11.7 > COMPACT_RATIO
+    assert len(catalog.items_df) == len(small_catalog) - 14
+    assert catalog.ACTIVE.all()
+    assert catalog.ORIGIN.tolist() == list(range(14, len(small_catalog)))
+    assert catalog.items_df['item_id'].iloc[0] == 1014
+    assert events[-1]['op'] == 'compact' and int((~events[-1]['keep']).sum()) == 14
+
+    assert catalog_updates.compact_now()['removed'] == 0  # Sıkıştırılacak satır kalmadı
+
+def test_replay_after_compaction_keeps_added_rows(small_catalog, monkeypatch):
+    catalog_updates.add_items([new_item(5001)])
+    catalog_updates.retire_items(list(range(1000, 1020)))
+    catalog_updates.add_items([new_item(5002)])
+    expected = catalog.items_df['item_id'].tolist()
+
+    restart(monkeypatch)
+    catalog_updates.sync()
+    assert catalog.items_df['item_id'].tolist() == expected
+    assert catalog.ORIGIN[-2:].tolist() == [-1, -1]
+
+def test_combin_table_survives_add_retire_and_compaction(small_catalog, monkeypatch):
+    n, k = len(small_catalog), 3
+    rows = np.array([[(r + 1) % n, (r + 2) % n, (r + 3) % n] for r in range(n)], dtype=np.int32)
+    table = {'header': {'n': n, 'k': k}, 'counts': np.full(n, k, dtype=np.int32), 'rows': rows,
+             'scores': np.tile(np.array([10.0, 8.0, 6.0]), (n, 1)),
+             'reason_codes': np.zeros((n, k), dtype=np.uint8)}
+    monkeypatch.setattr(combin_table, 'TABLE', combin_table._with_rows(table, catalog.ORIGIN, None))
+    catalog.on_change('combin_table', lambda event: combin_table.remap(catalog.ORIGIN, catalog.active_mask()))
+
+    catalog_updates.add_items([new_item(5001)])
+    assert combin_table.arrays(n) is None  # Yeni ürün tabloda yok, canlı hesaplanır
+    assert combin_table.arrays(0)[0].tolist() == [1, 2, 3]
+
+    catalog_updates.retire_items([1002])
+    found_rows, scores, _ = combin_table.arrays(0)
+    assert found_rows.tolist() == [1, 3] and scores.tolist() == [10.0, 6.0]
+
+    catalog_updates.retire_items(list(range(1003, 1015)))  # Sıkıştırma: satırlar yeniden numaralanır
+    ids = catalog.items_df['item_id'].to_numpy()
+    source = int(np.flatnonzero(ids == 1015)[0])
+    assert ids[combin_table.arrays(source)[0]].tolist() == [1016, 1017, 1018]
+    assert ids[combin_table.arrays(int(np.flatnonzero(ids == 1000)[0]))[0]].tolist() == [1001]
+
+def test_update_waits_for_active_readers(small_catalog):
+    applied = threading.Event()
+    catalog.begin_read()
+    try:
+        writer = threading.Thread(target=lambda: (catalog_updates.retire_items([1000]), applied.set()))
+        writer.start()
+        time.sleep(0.1)
+        assert not applied.is_set() and catalog.ACTIVE[0]
+    finally:
+        catalog.end_read()
+    writer.join(5)
+    assert applied.is_set() and not catalog.ACTIVE[0]
+
+    with catalog.reading():
+        with pytest.raises(RuntimeError):
+            catalog_updates.retire_items([1001])
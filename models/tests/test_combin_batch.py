@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+def record_key(record):
+    return (record['item_id'], record['score'], record['reason'])
+
+def test_results_follow_input_order_and_cap(combin_state):
+    ids = combin_state.items_df['item_id'].tolist()
+    requested = ids[5:8] + ['missing', ids[5]] + ids[20:80]
+    batch = combin_state.get_combin_recommendations_batch(requested, top_k=4)
+
+    assert len(batch['results']) == combin_state.MAX_BATCH_ITEMS
+    assert [r['item_id'] for r in batch['results']] == requested[:combin_state.MAX_BATCH_ITEMS]
+    assert batch['results'][3] == {'item_id': 'missing', 'found': False, 'recommendations': []}
+    assert batch['results'][4] == batch['results'][0]  # Tekrar eden ürün aynı listeyi alır
+    assert all(len(r['recommendations']) <= 4 for r in batch['results'])
+    assert batch['aggregated'] is None
+
+@pytest.mark.parametrize('exclude_sources', [True, False])
+def test_lists_are_ordered_subsequences_of_single_item_results(combin_state, exclude_sources):
+    ids = combin_state.items_df['item_id'].tolist()[10:25]
+    batch = combin_state.get_combin_recommendations_batch(ids, top_k=200, exclude_sources=exclude_sources)
+    for result in batch['results']:
+        single = [record_key(r) for r in combin_state.get_combin_recommendations(result['item_id']).to_dict('records')]
+        position = 0
+        for record in result['recommendations']:
+            position = single.index(record_key(record), position) + 1
+        scores = [r['score'] for r in result['recommendations']]
+        assert scores == sorted(scores, reverse=True)
+
+def test_items_appear_once_and_sources_are_excluded(combin_state):
+    ids = combin_state.items_df['item_id'].tolist()[:30]
+    batch = combin_state.get_combin_recommendations_batch(ids, top_k=50)
+    recommended = [r['item_id'] for result in batch['results'] for r in result['recommendations']]
+    assert len(recommended) == len(set(recommended))
+    assert not set(recommended) & set(ids)
+
+    kept = combin_state.get_combin_recommendations_batch(ids, top_k=50, exclude_sources=False)
+    recommended = [r['item_id'] for result in kept['results'] for r in result['recommendations']]
+    assert set(recommended) & set(ids)
+
+def test_aggregate_ranking(combin_state):
+    ids = combin_state.items_df['item_id'].tolist()[:12]
+    batch = combin_state.get_combin_recommendations_batch(ids, top_k=10, aggregate=True)
+    aggregated = batch['aggregated']
+    assert 0 < len(aggregated) <= 10
+    keys = [(-r['score'], -r['matches']) for r in aggregated]
+    assert keys == sorted(keys)
+    assert all(1 <= r['matches'] <= len(ids) for r in aggregated)
+    assert all(r['reason'] == combin_state.AGGREGATE_REASON for r in aggregated)
+    assert not {r['item_id'] for r in aggregated} & set(ids)
+
+def test_row_arrays_match_records(combin_state):
+    ids = combin_state.items_df['item_id'].tolist()[:8] + ['missing']
+    records = combin_state.get_combin_recommendations_batch(ids, top_k=6, aggregate=True)
+    arrays = combin_state.get_combin_recommendations_batch(ids, top_k=6, aggregate=True, records=False)
+    item_ids = combin_state.items_df['item_id'].to_numpy()
+    for by_record, by_rows in zip(records['results'], arrays['results']):
+        rows, scores, reasons = by_rows['recommendations']
+        assert [r['item_id'] for r in by_record['recommendations']] == item_ids[rows].tolist()
+        assert [r['score'] for r in by_record['recommendations']] == scores.tolist()
+        assert [r['reason'] for r in by_record['recommendations']] == reasons.tolist()
+    rows, scores, _, matches = arrays['aggregated']
+    assert [(r['item_id'], r['matches']) for r in records['aggregated']] == list(zip(item_ids[rows].tolist(), matches.tolist()))
+
+def test_empty_batch(combin_state):
+    batch = combin_state.get_combin_recommendations_batch(['missing'], aggregate=True)
+    assert batch == {'results': [{'item_id': 'missing', 'found': False, 'recommendations': []}], 'aggregated': []}
+
+def materialize_table(cm, k):
+    """Kombin tablosunu combin_table._compute_chunk ile bellekte kurar (dosyadaki dtype'larla)."""
+    import combin_table
+    n = len(cm.items_df)
+    reasons = [cm.COOCCURRENCE_REASON] + [s['reason'] for s in cm.FALLBACK_STRATEGIES]
+    _, counts, rows, scores, codes = combin_table._compute_chunk((np.arange(n), k, reasons))
+    layout, _ = combin_table._layout(n, k, 0)
+    table = {'header': {'n': n, 'k': k, 'reasons': reasons}, 'reason_names': np.array(reasons, dtype=object),
+             'counts': counts, 'rows': rows.astype(layout['rows'][0]),
+             'scores': scores.astype(layout['scores'][0]), 'reason_codes': codes.astype(layout['reason_codes'][0])}
+    return combin_table._with_rows(table, np.arange(n, dtype=np.int64), None)
+
+def test_table_and_live_paths_rank_identically(combin_state, monkeypatch):
+    import combin_table
+    ids = combin_state.items_df['item_id'].tolist()
+    live_single = {i: combin_state.compute_combin_recommendations(i) for i in ids}
+    live_batch = combin_state.get_combin_recommendations_batch(ids[:20], top_k=30, aggregate=True)
+
+    monkeypatch.setattr(combin_table, 'TABLE', materialize_table(combin_state, k=len(ids)))
+    combin_state.COMBIN_CACHE.clear()
+    for item_id in ids:
+        served = combin_state.get_combin_recommendations(item_id)
+        assert served['item_id'].tolist() == live_single[item_id]['item_id'].tolist()
+        assert served['score'].tolist() == live_single[item_id]['score'].tolist()  # Yuvarlama farkı yok
+    assert combin_state.get_combin_recommendations_batch(ids[:20], top_k=30, aggregate=True) == live_batch
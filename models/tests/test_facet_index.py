@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import catalog
+import catalog_updates
+import facet_index
+
+def brute_force():
+    df = catalog.items_df[catalog.ACTIVE]
+    return {'total': len(df), **{col: df[col].value_counts().to_dict() for col in facet_index.FACET_COLUMNS}}
+
+def assert_facets_equal(facets, expected):
+    assert facets['total'] == expected['total']
+    for col in facet_index.FACET_COLUMNS:
+        assert facets[col] == {k: v for k, v in expected[col].items() if v > 0}
+        assert list(facets[col].values()) == sorted(facets[col].values(), reverse=True)
+
+@pytest.fixture(params=['object', 'category'])
+def facets(request, small_catalog, monkeypatch):
+    if request.param == 'category':
+        # Snapshot yolu: metin sütunları Categorical
+        df = small_catalog.astype({col: 'category' for col in ('name', 'category', 'color', 'season')})
+        monkeypatch.setattr(catalog, 'items_df', df)
+    monkeypatch.setattr(facet_index, 'GLOBAL_COUNTS', {})
+    monkeypatch.setattr(facet_index, 'TOTAL', 0)
+    facet_index.build_facets()
+    return facet_index
+
+def test_incremental_updates_match_recount(facets):
+    assert_facets_equal(facets.global_facets(), brute_force())
+
+    catalog_updates.add_items([
+        {'item_id': 9001, 'name': 'a', 'category': 'elbise', 'color': 'yeşil', 'season': 'yaz', 'image': 'a.jpg'},
+        {'item_id': 9002, 'name': 'b', 'category': 'yeni kategori', 'color': 'siyah', 'season': 'kış', 'image': 'b.jpg'},
+    ])
+    assert_facets_equal(facets.global_facets(), brute_force())
+    assert facets.global_facets()['category']['yeni kategori'] == 1
+
+    catalog_updates.retire_items([9002, 1000, 1001, 1002])
+    assert_facets_equal(facets.global_facets(), brute_force())
+    assert 'yeni kategori' not in facets.global_facets()['category']
+
+    before = facets.global_facets()
+    catalog_updates.retire_items(list(range(1003, 1015)))  # Sıkıştırmayı tetikler
+    assert catalog.ACTIVE.all()
+    assert_facets_equal(facets.global_facets(), brute_force())
+    assert facets.global_facets()['total'] == before['total'] - 12
+
+def test_global_facets_returns_copies(facets):
+    counts = facets.global_facets()
+    counts['color'].clear()
+    assert facets.global_facets()['color']
+
+def test_query_facets_are_disjunctive(search_model):
+    filters = {'category': 'elbise', 'color': 'siyah'}
+    facets = search_model.search_facets('siyah', **filters)
+
+    matched = search_model.FILTER_INDEX.mask(search_model.match_bits('siyah'))
+    df = catalog.items_df[matched]
+    in_category, in_color = df['category'] == 'elbise', df['color'] == 'siyah'
+    assert facets['total'] == int((in_category & in_color).sum())
+    # Her sütun kendi filtresi hariç sayılır
+    assert facets['category'] == df[in_color]['category'].value_counts().to_dict()
+    assert facets['color'] == df[in_category]['color'].value_counts().to_dict()
+    assert facets['season'] == df[in_category & in_color]['season'].value_counts().to_dict()
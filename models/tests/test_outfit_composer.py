@@ -0,0 +1,66 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import outfit_composer
+from outfit_composer import _beam, _pick_diverse, MAX_ITEM_REUSE
+
+def random_problem(sizes, seed):
+    rng = np.random.default_rng(seed)
+    unary = [rng.integers(0, 20, size).astype(float) for size in sizes]
+    blocks = {s: {} for s in range(len(sizes))}
+    for s, t in itertools.combinations(range(len(sizes)), 2):
+        block = rng.integers(0, 20, (sizes[s], sizes[t])).astype(float)
+        block[rng.random(block.shape) < 0.15] = -np.inf  # Yaz / kış çakışması
+        blocks[s][t] = block
+    return unary, blocks
+
+def total(state, unary, blocks):
+    score = sum(unary[t][c] for t, c in enumerate(state))
+    return score + sum(blocks[s][t][state[s], state[t]] for s, t in itertools.combinations(range(len(state)), 2))
+
+@pytest.mark.parametrize('seed', range(5))
+def test_wide_beam_equals_exhaustive_search(seed):
+    sizes = (4, 5, 3, 2)
+    unary, blocks = random_problem(sizes, seed)
+    states, totals = _beam(unary, blocks, width=int(np.prod(sizes)))
+
+    expected = sorted((total(state, unary, blocks), state) for state in itertools.product(*map(range, sizes)))
+    expected = [(score, state) for score, state in expected if np.isfinite(score)]
+    assert sorted(totals.tolist()) == [score for score, _ in expected]
+    assert {tuple(s) for s in states.tolist()} == {state for _, state in expected}
+    for state, score in zip(states.tolist(), totals.tolist()):
+        assert score == total(state, unary, blocks)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_narrow_beam_is_sorted_and_finite(seed):
+    unary, blocks = random_problem((8, 8, 8), seed)
+    states, totals = _beam(unary, blocks, width=6)
+    assert len(states) <= 6
+    assert np.all(np.isfinite(totals))
+    assert totals.tolist() == sorted(totals.tolist(), reverse=True)
+    best = max(total(s, unary, blocks) for s in itertools.product(range(8), repeat=3))
+    assert totals[0] <= best
+
+def test_pick_diverse_limits_item_reuse():
+    # İlk 10 kombin aynı üstü (slot 0, aday 0) kullanıyor
+    states = np.array([[0, i, i] for i in range(10)] + [[i, i + 10, i + 10] for i in range(1, 10)])
+    picked = _pick_diverse(states, 8)
+    assert len(picked) == 8 and picked == sorted(picked)  # Işın sırası korunur
+    usage = {}
+    for state in states[picked]:
+        for key in enumerate(state.tolist()):
+            usage[key] = usage.get(key, 0) + 1
+    assert max(usage.values()) <= MAX_ITEM_REUSE
+    assert picked == list(range(MAX_ITEM_REUSE)) + list(range(10, 15))
+
+def test_pick_diverse_fills_from_skipped_when_beam_is_narrow():
+    states = np.zeros((6, 3), dtype=np.int64)  # Tek bir kombin tekrarlanıyor
+    assert _pick_diverse(states, 5) == [0, 1, 2, 3, 4]
+    assert _pick_diverse(states, 10) == [0, 1, 2, 3, 4, 5]
+
+def test_opposite_season():
+    assert outfit_composer.opposite_season('yaz') == 'kış'
+    assert outfit_composer.opposite_season('kış') == 'yaz'
+    assert outfit_composer.opposite_season('dört mevsim') is None
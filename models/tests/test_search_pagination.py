@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+import catalog_updates
+
+def all_pages(model, query, limit, **filters):
+    rows, scores, cursor = [], [], None
+    while True:
+        page, cursor = model.search_page(query, limit=limit, cursor=cursor, **filters)
+        assert len(page) <= limit
+        rows += page.index.tolist()
+        scores += page['similarity_score'].tolist()
+        if cursor is None: return rows, scores
+
+def full_ranking(model, query, **filters):
+    rows, scores = model._rank(query, model.FILTER_INDEX.n, model.filter_bits(**filters), 'lexical')
+    return rows.tolist(), scores.tolist()
+
+@pytest.mark.parametrize('query', ['slim jean', 'siyah', 'wool sweater mavi', 'boots'])
+@pytest.mark.parametrize('limit', [1, 7, 25])
+def test_pages_concatenate_to_full_ranking(search_model, query, limit):
+    rows, scores = all_pages(search_model, query, limit)
+    expected_rows, expected_scores = full_ranking(search_model, query)
+    assert rows == expected_rows
+    assert np.allclose(scores, expected_scores)
+    assert len(set(rows)) == len(rows)
+
+def test_ties_are_ordered_by_row(search_model):
+    # Aynı metinli ürünler eşit skor alır; sayfa sınırında satır numarası (büyükten küçüğe) sırayı belirler
+    rows, scores = all_pages(search_model, 'slim jean', 4)
+    for (r1, s1), (r2, s2) in zip(zip(rows, scores), zip(rows[1:], scores[1:])):
+        assert s1 > s2 or (s1 == s2 and r1 > r2)
+
+def test_filtered_pages_are_full(search_model):
+    filters = {'season': 'kış', 'exclude_mixed_colors': True}
+    rows, _ = all_pages(search_model, 'siyah', 3, **filters)
+    assert rows == full_ranking(search_model, 'siyah', **filters)[0]
+    page, cursor = search_model.search_page('siyah', limit=3, **filters)
+    assert len(page) == 3 and cursor is not None
+    assert set(page['season']) == {'kış'}
+
+def test_cursor_belongs_to_its_query(search_model):
+    _, cursor = search_model.search_page('siyah', limit=2)
+    with pytest.raises(ValueError):
+        search_model.search_page('boots', limit=2, cursor=cursor)
+    with pytest.raises(ValueError):
+        search_model.search_page('siyah', limit=2, cursor=cursor, season='yaz')
+    with pytest.raises(ValueError):
+        search_model.search_page('siyah', limit=2, cursor='not-a-cursor')
+
+def test_cursor_stays_valid_when_catalog_changes(search_model):
+    first, cursor = search_model.search_page('siyah', limit=5)
+    catalog_updates.add_items([{'item_id': 9001, 'name': 'siyah siyah', 'category': 'elbise',
+                                'color': 'siyah', 'season': 'yaz', 'image': 'images/9001.jpg'}])
+    catalog_updates.retire_items([int(search_model.items_df['item_id'].iloc[first.index[-1] + 1])])
+
+    rest, _ = all_pages(search_model, 'siyah', 5)
+    second, _ = search_model.search_page('siyah', limit=5, cursor=cursor)
+    # Yeni sayfa, güncel sıralamada cursor konumundan sonra gelenlerdir; ilk sayfa tekrar etmez
+    assert not set(second.index) & set(first.index)
+    last_score, last_row = first['similarity_score'].iloc[-1], first.index[-1]
+    after = [r for r, s in zip(*full_ranking(search_model, 'siyah'))
+             if s < last_score or (s == last_score and r < last_row)]
+    assert second.index.tolist() == after[:5]
+    assert rest[0] == len(search_model.items_df) - 1  # Eklenen ürün en üstte
+
+def test_cursor_is_rejected_after_compaction(search_model):
+    _, cursor = search_model.search_page('siyah', limit=5)
+    catalog_updates.retire_items([int(search_model.items_df['item_id'].iloc[0])])
+    search_model.search_page('siyah', limit=5, cursor=cursor)  # Kaldırma satırları yeniden numaralandırmaz
+
+    catalog_updates.compact_now()
+    with pytest.raises(ValueError, match='eski'):
+        search_model.search_page('siyah', limit=5, cursor=cursor)
+    rows, _ = all_pages(search_model, 'siyah', 5)
+    assert rows == full_ranking(search_model, 'siyah')[0]
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+
+def baseline_top_k(scores, top_k):
+    """Eski search_by_text sıralaması: argsort()[-top_k:][::-1], sadece > 0 (eşitlikte büyük satır önce)."""
+    top = np.argsort(scores, kind='stable')[-top_k:][::-1]
+    return top[scores[top] > 0]
+
+@pytest.mark.parametrize('top_k', [1, 3, 10, 50, 500])
+def test_top_k_matches_baseline_order_with_ties(search_model, top_k):
+    rng = np.random.default_rng(top_k)
+    scores = rng.integers(0, 6, 200).astype(np.float32) / 5  # çok sayıda eşit skor ve sıfır
+    assert search_model.top_k_indices(scores, top_k).tolist() == baseline_top_k(scores, top_k).tolist()
+
+def test_top_k_empty_and_all_zero(search_model):
+    assert search_model.top_k_indices(np.zeros(5, dtype=np.float32), 3).tolist() == []
+    assert search_model.top_k_indices(np.ones(5, dtype=np.float32), 0).tolist() == []
+
+@pytest.mark.parametrize('query', ['slim jean', 'siyah', 'wool sweater mavi', 'boots'])
+def test_search_matches_baseline_ranking(search_model, query):
+    # float32 çekirdek son basamaktaki (1e-17) farkları ayırt etmez; referans skorlar float32'ye yuvarlanır
+    similarities = cosine_similarity(search_model.vectorizer.transform([query]), search_model.tfidf_matrix)[0]
+    similarities = similarities.astype(np.float32)
+    expected = baseline_top_k(similarities, 20)
+
+    results = search_model.search_by_text(query, top_k=20)
+    batch = search_model.search_by_text_batch([query], top_k=20)[0]
+    assert results.index.tolist() == expected.tolist()
+    assert batch.index.tolist() == expected.tolist()
+    assert np.allclose(results['similarity_score'], similarities[expected], atol=1e-6)